@@ -1,75 +1,99 @@
-from typing import List
+from typing import List, Optional, Union
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from database.database import get_db
-from schemas.schemas import Account, AccountCreate, AccountUpdate
+from database.database import DBSession, get_session, run_db
+from database.write_queue import run_write
+from schemas.schemas import Account, AccountPage, AccountCreate, AccountUpdate, AccountCurrentBalance
 from crud.crud import (
-    get_accounts, get_account, create_account,
-    update_account, delete_account
+    get_accounts, get_accounts_page, get_account, create_account,
+    update_account, delete_account, get_account_balance
 )
+from crud.pagination import InvalidCursor
 from auth.auth import get_current_active_user
+from api.caching import etag_for
 from models.models import User
 
 router = APIRouter(prefix="/accounts", tags=["accounts"])
 
 
-@router.get("", response_model=List[Account])
-def read_accounts(
+@router.get("", response_model=Union[AccountPage, List[Account]], dependencies=[Depends(etag_for("accounts"))])
+async def read_accounts(
     skip: int = 0,
     limit: int = 100,
+    after: Optional[str] = None,
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: DBSession = Depends(get_session)
 ):
     """获取用户的所有账户"""
-    accounts = get_accounts(db, user_id=current_user.id, skip=skip, limit=limit)
+    # 游标分页，用法同 GET /transactions
+    if after is not None:
+        try:
+            items, next_cursor = await run_db(db, get_accounts_page, user_id=current_user.id, after=after, limit=limit)
+        except InvalidCursor:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        return {"items": items, "next_cursor": next_cursor}
+
+    accounts = await run_db(db, get_accounts, user_id=current_user.id, skip=skip, limit=limit)
     return accounts
 
 
 @router.post("", response_model=Account)
-def create_account_for_user(
+async def create_account_for_user(
     account: AccountCreate,
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: DBSession = Depends(get_session)
 ):
     """创建新账户"""
-    return create_account(db=db, account=account, user_id=current_user.id)
+    return await run_write(db, create_account, account=account, user_id=current_user.id)
 
 
-@router.get("/{account_id}", response_model=Account)
-def read_account(
+@router.get("/{account_id}", response_model=Account, dependencies=[Depends(etag_for("accounts"))])
+async def read_account(
     account_id: int,
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: DBSession = Depends(get_session)
 ):
     """获取特定账户"""
-    db_account = get_account(db, account_id=account_id, user_id=current_user.id)
+    db_account = await run_db(db, get_account, account_id=account_id, user_id=current_user.id)
     if db_account is None:
         raise HTTPException(status_code=404, detail="Account not found")
     return db_account
 
 
+@router.get("/{account_id}/balance", response_model=AccountCurrentBalance, dependencies=[Depends(etag_for("accounts"))])
+async def read_account_balance(
+    account_id: int,
+    current_user: User = Depends(get_current_active_user),
+    db: DBSession = Depends(get_session)
+):
+    """获取账户当前余额"""
+    balance = await run_db(db, get_account_balance, account_id=account_id, user_id=current_user.id)
+    if balance is None:
+        raise HTTPException(status_code=404, detail="Account not found")
+    return {"account_id": account_id, "balance": balance}
+
+
 @router.put("/{account_id}", response_model=Account)
-def update_account_for_user(
+async def update_account_for_user(
     account_id: int,
     account_update: AccountUpdate,
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: DBSession = Depends(get_session)
 ):
     """更新账户"""
-    db_account = update_account(db, account_id=account_id, user_id=current_user.id, account_update=account_update)
+    db_account = await run_write(db, update_account, account_id=account_id, user_id=current_user.id, account_update=account_update)
     if db_account is None:
         raise HTTPException(status_code=404, detail="Account not found")
     return db_account
 
 
 @router.delete("/{account_id}")
-def delete_account_for_user(
+async def delete_account_for_user(
     account_id: int,
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: DBSession = Depends(get_session)
 ):
     """删除账户"""
-    success = delete_account(db, account_id=account_id, user_id=current_user.id)
+    success = await run_write(db, delete_account, account_id=account_id, user_id=current_user.id)
     if not success:
         raise HTTPException(status_code=404, detail="Account not found")
     return {"message": "Account deleted successfully"}
@@ -1,21 +1,22 @@
 from datetime import timedelta
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
-from database.database import get_db
+from database.database import DBSession, get_session, run_db
 from schemas.schemas import Token, UserCreate, User as UserSchema
 from crud.crud import create_user, get_user_by_username, get_user_by_email
-from auth.auth import authenticate_user, create_access_token, ACCESS_TOKEN_EXPIRE_MINUTES, get_current_active_user
+from auth.auth import (
+    authenticate_user, create_access_token, hash_password, ACCESS_TOKEN_EXPIRE_MINUTES, get_current_active_user
+)
 from models.models import User
 
 router = APIRouter(prefix="/auth", tags=["authentication"])
 
 
 @router.post("/register/", response_model=UserSchema)
-def register(user: UserCreate, db: Session = Depends(get_db)):
+async def register(user: UserCreate, db: DBSession = Depends(get_session)):
     """用户注册"""
     # 检查用户名是否已存在
-    db_user = get_user_by_username(db, username=user.username)
+    db_user = await run_db(db, get_user_by_username, username=user.username)
     if db_user:
         raise HTTPException(
             status_code=400,
@@ -23,20 +24,22 @@ def register(user: UserCreate, db: Session = Depends(get_db)):
         )
     
     # 检查邮箱是否已存在
-    db_user = get_user_by_email(db, email=user.email)
+    db_user = await run_db(db, get_user_by_email, email=user.email)
     if db_user:
         raise HTTPException(
             status_code=400,
             detail="Email already registered"
         )
     
-    return create_user(db=db, user=user)
+    # 密码哈希在密码进程池中计算，不阻塞其他请求
+    hashed_password = await hash_password(user.password)
+    return await run_db(db, create_user, user=user, hashed_password=hashed_password)
 
 
 @router.post("/token/", response_model=Token)
-def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
+async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db: DBSession = Depends(get_session)):
     """用户登录获取访问令牌"""
-    user = authenticate_user(db, form_data.username, form_data.password)
+    user = await authenticate_user(db, form_data.username, form_data.password)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -45,15 +48,15 @@ def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db:
         )
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
-        data={"sub": user.username}, expires_delta=access_token_expires
+        data={"sub": user.username, "uid": user.id}, expires_delta=access_token_expires
     )
     return {"access_token": access_token, "token_type": "bearer"}
 
 
 @router.post("/login/", response_model=Token)
-def login_alternative(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
+async def login_alternative(form_data: OAuth2PasswordRequestForm = Depends(), db: DBSession = Depends(get_session)):
     """用户登录获取访问令牌（备用端点）"""
-    user = authenticate_user(db, form_data.username, form_data.password)
+    user = await authenticate_user(db, form_data.username, form_data.password)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -62,7 +65,7 @@ def login_alternative(form_data: OAuth2PasswordRequestForm = Depends(), db: Sess
         )
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
-        data={"sub": user.username}, expires_delta=access_token_expires
+        data={"sub": user.username, "uid": user.id}, expires_delta=access_token_expires
     )
     return {"access_token": access_token, "token_type": "bearer"}
 
@@ -0,0 +1,103 @@
+from datetime import date
+from typing import List, Optional, Union
+from fastapi import APIRouter, Depends, HTTPException, Query
+from database.database import DBSession, get_session, run_db
+from database.write_queue import run_write
+from schemas.schemas import Budget, BudgetPage, BudgetCreate, BudgetUpdate, BudgetProgress
+from crud.crud import (
+    get_budgets, get_budgets_page, get_budget, create_budget,
+    update_budget, delete_budget, get_budget_progress
+)
+from crud.pagination import InvalidCursor
+from auth.auth import get_current_active_user
+from models.models import User
+
+router = APIRouter(prefix="/budgets", tags=["budgets"])
+
+
+@router.get("", response_model=Union[BudgetPage, List[Budget]])
+async def read_budgets(
+    skip: int = 0,
+    limit: int = 100,
+    after: Optional[str] = None,
+    current_user: User = Depends(get_current_active_user),
+    db: DBSession = Depends(get_session)
+):
+    """获取用户的所有预算"""
+    # 游标分页，用法同 GET /transactions
+    if after is not None:
+        try:
+            items, next_cursor = await run_db(db, get_budgets_page, user_id=current_user.id, after=after, limit=limit)
+        except InvalidCursor:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        return {"items": items, "next_cursor": next_cursor}
+
+    return await run_db(db, get_budgets, user_id=current_user.id, skip=skip, limit=limit)
+
+
+@router.post("", response_model=Budget)
+async def create_budget_for_user(
+    budget: BudgetCreate,
+    current_user: User = Depends(get_current_active_user),
+    db: DBSession = Depends(get_session)
+):
+    """创建新预算"""
+    return await run_write(db, create_budget, budget=budget, user_id=current_user.id)
+
+
+@router.get("/progress", response_model=List[BudgetProgress])
+async def read_budget_progress(
+    history: int = Query(12, ge=0, le=120, description="除当前周期外，向前返回的周期数"),
+    on: Optional[date] = Query(None, description="以该日期所在周期为当前周期，默认今天"),
+    current_user: User = Depends(get_current_active_user),
+    db: DBSession = Depends(get_session)
+):
+    """所有预算在当前周期和历史周期内的实际支出
+
+    支持 weekly（周一开始）、monthly、yearly 三种周期，分类预算包含子分类的支出。
+    预算金额以用户的默认币种计，外币支出按交易当天的汇率换算。
+    """
+    return await run_db(
+        db, get_budget_progress, user_id=current_user.id, today=on, history=history,
+        currency=current_user.default_currency
+    )
+
+
+@router.get("/{budget_id}", response_model=Budget)
+async def read_budget(
+    budget_id: int,
+    current_user: User = Depends(get_current_active_user),
+    db: DBSession = Depends(get_session)
+):
+    """获取特定预算"""
+    db_budget = await run_db(db, get_budget, budget_id=budget_id, user_id=current_user.id)
+    if db_budget is None:
+        raise HTTPException(status_code=404, detail="Budget not found")
+    return db_budget
+
+
+@router.put("/{budget_id}", response_model=Budget)
+async def update_budget_for_user(
+    budget_id: int,
+    budget_update: BudgetUpdate,
+    current_user: User = Depends(get_current_active_user),
+    db: DBSession = Depends(get_session)
+):
+    """更新预算"""
+    db_budget = await run_write(db, update_budget, budget_id=budget_id, user_id=current_user.id, budget_update=budget_update)
+    if db_budget is None:
+        raise HTTPException(status_code=404, detail="Budget not found")
+    return db_budget
+
+
+@router.delete("/{budget_id}")
+async def delete_budget_for_user(
+    budget_id: int,
+    current_user: User = Depends(get_current_active_user),
+    db: DBSession = Depends(get_session)
+):
+    """删除预算"""
+    success = await run_write(db, delete_budget, budget_id=budget_id, user_id=current_user.id)
+    if not success:
+        raise HTTPException(status_code=404, detail="Budget not found")
+    return {"message": "Budget deleted successfully"}
@@ -0,0 +1,95 @@
+"""
+条件请求（ETag / If-None-Match）
+
+列表和详情接口通过 etag_for(*resources) 依赖，在执行查询之前先读取当前用户
+这些资源的数据版本号并生成弱 ETag。请求头 If-None-Match 与之匹配时抛出
+NotModified，由 app.main 中的处理器直接返回 304，不执行查询也不序列化响应。
+
+接口支持 ?expand= 展开关联对象时，由 expand 参数把展开的关联映射到各自的资源，
+只有实际展开的关联才计入 ETag，未展开时不因关联资源的写入而失效。
+
+接收交易筛选参数（api.filters）的接口传入 filters=True：按 category_id 筛选并包含子分类时，
+结果取决于分类树，分类也计入 ETag，子分类移动或删除后缓存随之失效。
+
+汇总接口的金额换算为用户的默认币种，通过 etag_for(..., currency=True) 把默认币种和
+汇率表版本也计入 ETag，修改默认币种或更新汇率文件后缓存随之失效。
+
+ETag 中包含用户 id，同一浏览器切换用户后不会误用其他用户的缓存。版本号必须在
+读取数据之前获取：两者之间发生写入时，客户端拿到的是旧 ETag 和新数据，下次请求
+会重新获取，而不会把旧数据当作最新。
+"""
+from typing import Callable, Dict, Optional
+from fastapi import Depends, Request, Response
+from database.database import DBSession, get_session, run_db
+from crud.crud import get_data_versions
+from crud.fx import get_fx_rates
+from auth.auth import get_current_active_user
+from models.models import User
+
+# 允许浏览器保存响应，但每次使用前都要用 If-None-Match 向服务端确认
+CACHE_CONTROL = "private, no-cache"
+
+
+class NotModified(Exception):
+    def __init__(self, etag: str):
+        self.etag = etag
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """按弱比较判断 If-None-Match 是否包含 etag"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag[2:] if etag.startswith("W/") else etag
+    for candidate in if_none_match.split(","):
+        candidate = candidate.strip()
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate == opaque:
+            return True
+    return False
+
+
+# pydantic 解析为 True 的布尔查询参数取值
+_TRUE_VALUES = ("1", "on", "t", "true", "y", "yes")
+
+
+def etag_for(
+    *resources: str, expand: Optional[Dict[str, str]] = None, filters: bool = False, currency: bool = False
+) -> Callable:
+    """生成依赖：响应内容取决于 resources 中的资源，任一资源写入后 ETag 随之变化
+
+    expand 为 {关联名: 资源}，请求的 expand 参数中包含该关联时，对应资源也计入 ETag。
+    filters 为 True 时请求按 category_id 筛选且 include_subcategories 为真，categories 也计入 ETag。
+    currency 为 True 时响应金额按汇率换算为用户的默认币种，默认币种和汇率表版本也计入 ETag。
+    """
+
+    async def check_etag(
+        request: Request,
+        response: Response,
+        current_user: User = Depends(get_current_active_user),
+        db: DBSession = Depends(get_session)
+    ) -> str:
+        depends_on = list(resources)
+        if expand:
+            for name in (request.query_params.get("expand") or "").split(","):
+                resource = expand.get(name.strip())
+                if resource is not None and resource not in depends_on:
+                    depends_on.append(resource)
+        if filters and "categories" not in depends_on and request.query_params.get("category_id") and (
+            request.query_params.get("include_subcategories", "").lower() in _TRUE_VALUES
+        ):
+            depends_on.append("categories")
+        versions = await run_db(db, get_data_versions, user_id=current_user.id, resources=depends_on)
+        tag = f'{current_user.id}-{"-".join(str(version) for version in versions)}'
+        if currency:
+            tag += f"-{current_user.default_currency}-{get_fx_rates().version}"
+        etag = f'W/"{tag}"'
+        if etag_matches(request.headers.get("if-none-match"), etag):
+            raise NotModified(etag)
+        response.headers["ETag"] = etag
+        response.headers["Cache-Control"] = CACHE_CONTROL
+        return etag
+
+    return check_etag
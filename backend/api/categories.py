@@ -0,0 +1,105 @@
+from typing import List, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query
+from database.database import DBSession, get_session, run_db
+from database.write_queue import run_write
+from schemas.schemas import Category, CategoryCreate, CategoryUpdate, CategoryTreeNode
+from crud.crud import (
+    get_categories, get_category, create_category, update_category, delete_category, get_category_tree_nodes
+)
+from crud.category_tree import get_category_tree
+from auth.auth import get_current_active_user
+from models.models import User
+from api.reports import MONTH_PATTERN
+
+router = APIRouter(prefix="/categories", tags=["categories"])
+
+
+async def _check_parent(db: DBSession, user_id: int, parent_id: Optional[int], category_id: Optional[int] = None) -> None:
+    """父分类必须可见，且不能是分类自身或其子孙分类"""
+    if parent_id is None:
+        return
+    tree = await run_db(db, get_category_tree, user_id)
+    if parent_id not in tree:
+        raise HTTPException(status_code=400, detail="Parent category not found")
+    if category_id is not None and parent_id in tree.subtree(category_id):
+        raise HTTPException(status_code=400, detail="Category cannot be moved under itself")
+
+
+@router.get("", response_model=List[Category])
+async def read_categories(
+    skip: int = 0,
+    limit: int = 100,
+    current_user: User = Depends(get_current_active_user),
+    db: DBSession = Depends(get_session)
+):
+    """获取系统预设分类和用户自己的分类"""
+    return await run_db(db, get_categories, user_id=current_user.id, skip=skip, limit=limit)
+
+
+@router.post("", response_model=Category)
+async def create_category_for_user(
+    category: CategoryCreate,
+    current_user: User = Depends(get_current_active_user),
+    db: DBSession = Depends(get_session)
+):
+    """创建新分类"""
+    await _check_parent(db, current_user.id, category.parent_category_id)
+    return await run_write(db, create_category, category=category, user_id=current_user.id)
+
+
+@router.get("/tree", response_model=List[CategoryTreeNode])
+async def read_category_tree(
+    with_totals: bool = False,
+    start_month: Optional[str] = Query(None, pattern=MONTH_PATTERN, description="with_totals 时的起始月份（含）"),
+    end_month: Optional[str] = Query(None, pattern=MONTH_PATTERN, description="with_totals 时的结束月份（含）"),
+    current_user: User = Depends(get_current_active_user),
+    db: DBSession = Depends(get_session)
+):
+    """按层级获取分类，with_totals 时每个分类附带整个子树的收支汇总，金额换算为用户的默认币种"""
+    return await run_db(
+        db, get_category_tree_nodes, user_id=current_user.id, with_totals=with_totals,
+        start_month=start_month, end_month=end_month, currency=current_user.default_currency
+    )
+
+
+@router.get("/{category_id}", response_model=Category)
+async def read_category(
+    category_id: int,
+    current_user: User = Depends(get_current_active_user),
+    db: DBSession = Depends(get_session)
+):
+    """获取特定分类"""
+    db_category = await run_db(db, get_category, category_id=category_id, user_id=current_user.id)
+    if db_category is None:
+        raise HTTPException(status_code=404, detail="Category not found")
+    return db_category
+
+
+@router.put("/{category_id}", response_model=Category)
+async def update_category_for_user(
+    category_id: int,
+    category_update: CategoryUpdate,
+    current_user: User = Depends(get_current_active_user),
+    db: DBSession = Depends(get_session)
+):
+    """更新分类，系统预设分类不能修改"""
+    await _check_parent(db, current_user.id, category_update.parent_category_id, category_id)
+    db_category = await run_write(
+        db, update_category, category_id=category_id, user_id=current_user.id, category_update=category_update
+    )
+    if db_category is None:
+        raise HTTPException(status_code=404, detail="Category not found")
+    return db_category
+
+
+@router.delete("/{category_id}")
+async def delete_category_for_user(
+    category_id: int,
+    current_user: User = Depends(get_current_active_user),
+    db: DBSession = Depends(get_session)
+):
+    """删除分类，子分类移到其父分类下"""
+    success = await run_write(db, delete_category, category_id=category_id, user_id=current_user.id)
+    if not success:
+        raise HTTPException(status_code=404, detail="Category not found")
+    return {"message": "Category deleted successfully"}
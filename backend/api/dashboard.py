@@ -0,0 +1,22 @@
+from fastapi import APIRouter, Depends, Query
+from database.database import DBSession, get_session, run_db
+from schemas.schemas import DashboardSummary
+from crud.crud import get_dashboard_summary
+from auth.auth import get_current_active_user
+from api.caching import etag_for
+from models.models import User
+
+router = APIRouter(prefix="/dashboard", tags=["dashboard"])
+
+
+@router.get("/summary", response_model=DashboardSummary, dependencies=[Depends(etag_for("transactions", "accounts", "projects", currency=True))])
+async def read_dashboard_summary(
+    recent_limit: int = Query(5, ge=0, le=50),
+    current_user: User = Depends(get_current_active_user),
+    db: DBSession = Depends(get_session)
+):
+    """获取仪表盘汇总数据"""
+    return await run_db(
+        db, get_dashboard_summary, user_id=current_user.id, recent_limit=recent_limit,
+        currency=current_user.default_currency
+    )
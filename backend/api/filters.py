@@ -0,0 +1,37 @@
+"""
+交易筛选参数
+
+交易列表、统计和导出接口通过 Depends(transaction_filter) 接收同一组查询参数，
+解析为 schemas.TransactionFilter 交给 crud，由 crud 统一编译为 SQL 条件。
+"""
+from datetime import date
+from typing import Literal, Optional
+from fastapi import Query
+from models.models import MAX_AMOUNT
+from schemas.schemas import TransactionFilter
+
+
+def transaction_filter(
+    start_date: Optional[date] = Query(None, description="交易日期不早于该日"),
+    end_date: Optional[date] = Query(None, description="交易日期不晚于该日（包含当天）"),
+    account_id: Optional[int] = None,
+    category_id: Optional[int] = None,
+    include_subcategories: bool = Query(False, description="category_id 同时匹配其所有子分类"),
+    project_id: Optional[int] = None,
+    type: Optional[Literal["income", "expense"]] = None,
+    currency: Optional[str] = Query(None, pattern=r"^[A-Za-z]{3}$", description="币种代码，不区分大小写"),
+    min_amount: Optional[float] = Query(None, ge=0, lt=MAX_AMOUNT, description="金额不小于该值"),
+    max_amount: Optional[float] = Query(None, ge=0, lt=MAX_AMOUNT, description="金额不大于该值")
+) -> TransactionFilter:
+    return TransactionFilter(
+        start_date=start_date,
+        end_date=end_date,
+        account_id=account_id,
+        category_id=category_id,
+        include_subcategories=include_subcategories,
+        project_id=project_id,
+        type=type,
+        currency=currency,
+        min_amount=min_amount,
+        max_amount=max_amount
+    )
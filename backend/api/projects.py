@@ -1,136 +1,169 @@
-from typing import List
-from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from sqlalchemy import func
-from database.database import get_db
-from schemas.schemas import Project, ProjectCreate, ProjectUpdate, Transaction
+from typing import List, Optional, Union
+from fastapi import APIRouter, Depends, HTTPException, Query, Response
+from database.database import DBSession, get_session, run_db
+from database.write_queue import run_write
+from schemas.schemas import Project, ProjectPage, ProjectCreate, ProjectUpdate, ProjectStats, Transaction, TransactionFilter
 from crud.crud import (
-    get_projects, get_project, create_project,
-    update_project, delete_project
+    get_projects, get_projects_page, get_project, create_project,
+    update_project, delete_project, get_project_transactions, get_project_stats,
+    get_project_transaction_rows
 )
+from crud.pagination import InvalidCursor
 from auth.auth import get_current_active_user
-from models.models import User, Transaction as TransactionModel
+from api.caching import etag_for
+from api.filters import transaction_filter
+from api.serialization import (
+    json_response, list_adapter, transaction_fieldset, transaction_relations,
+    TRANSACTION_EXPAND_RESOURCES, FIELDS_DESCRIPTION, EXPAND_DESCRIPTION
+)
+from config.config import settings
+from models.models import User
 
 router = APIRouter(prefix="/projects", tags=["projects"])
 
 
-@router.get("", response_model=List[Project])
-def read_projects(
+@router.get("", response_model=Union[ProjectPage, List[Project]], dependencies=[Depends(etag_for("projects"))])
+async def read_projects(
     skip: int = 0,
     limit: int = 100,
+    after: Optional[str] = None,
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: DBSession = Depends(get_session)
 ):
     """获取用户的所有项目"""
-    projects = get_projects(db, user_id=current_user.id, skip=skip, limit=limit)
+    # 游标分页，用法同 GET /transactions
+    if after is not None:
+        try:
+            items, next_cursor = await run_db(db, get_projects_page, user_id=current_user.id, after=after, limit=limit)
+        except InvalidCursor:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        return {"items": items, "next_cursor": next_cursor}
+
+    projects = await run_db(db, get_projects, user_id=current_user.id, skip=skip, limit=limit)
     return projects
 
 
 @router.post("", response_model=Project)
-def create_project_for_user(
+async def create_project_for_user(
     project: ProjectCreate,
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: DBSession = Depends(get_session)
 ):
     """创建新项目"""
-    return create_project(db=db, project=project, user_id=current_user.id)
+    return await run_write(db, create_project, project=project, user_id=current_user.id)
+
+
+@router.get(
+    "/stats",
+    response_model=List[ProjectStats],
+    dependencies=[Depends(etag_for("projects", "transactions", filters=True, currency=True))]
+)
+async def read_projects_stats(
+    project_ids: Optional[List[int]] = Query(None),
+    filters: TransactionFilter = Depends(transaction_filter),
+    current_user: User = Depends(get_current_active_user),
+    db: DBSession = Depends(get_session)
+):
+    """批量获取项目统计信息
+
+    不传 project_ids 时返回用户所有项目的统计，只统计满足筛选条件的交易，筛选参数同 GET /transactions。
+    金额按交易当天的汇率换算为用户的默认币种。
+    """
+    return await run_db(
+        db, get_project_stats, user_id=current_user.id, project_ids=project_ids, filters=filters,
+        currency=current_user.default_currency
+    )
 
 
-@router.get("/{project_id}", response_model=Project)
-def read_project(
+@router.get("/{project_id}", response_model=Project, dependencies=[Depends(etag_for("projects"))])
+async def read_project(
     project_id: int,
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: DBSession = Depends(get_session)
 ):
     """获取特定项目"""
-    db_project = get_project(db, project_id=project_id, user_id=current_user.id)
+    db_project = await run_db(db, get_project, project_id=project_id, user_id=current_user.id)
     if db_project is None:
         raise HTTPException(status_code=404, detail="Project not found")
     return db_project
 
 
 @router.put("/{project_id}", response_model=Project)
-def update_project_for_user(
+async def update_project_for_user(
     project_id: int,
     project_update: ProjectUpdate,
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: DBSession = Depends(get_session)
 ):
     """更新项目"""
-    db_project = update_project(db, project_id=project_id, user_id=current_user.id, project_update=project_update)
+    db_project = await run_write(db, update_project, project_id=project_id, user_id=current_user.id, project_update=project_update)
     if db_project is None:
         raise HTTPException(status_code=404, detail="Project not found")
     return db_project
 
 
 @router.delete("/{project_id}")
-def delete_project_for_user(
+async def delete_project_for_user(
     project_id: int,
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: DBSession = Depends(get_session)
 ):
     """删除项目"""
-    success = delete_project(db, project_id=project_id, user_id=current_user.id)
+    success = await run_write(db, delete_project, project_id=project_id, user_id=current_user.id)
     if not success:
         raise HTTPException(status_code=404, detail="Project not found")
     return {"message": "Project deleted successfully"}
 
 
-@router.get("/{project_id}/transactions", response_model=List[Transaction])
-def read_project_transactions(
+@router.get(
+    "/{project_id}/transactions",
+    response_model=List[Transaction],
+    dependencies=[Depends(etag_for("projects", "transactions", expand=TRANSACTION_EXPAND_RESOURCES))]
+)
+async def read_project_transactions(
     project_id: int,
+    response: Response,
+    fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION),
+    expand: Optional[str] = Query(None, description=EXPAND_DESCRIPTION),
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: DBSession = Depends(get_session)
 ):
-    """获取项目的所有交易记录"""
+    """获取项目的所有交易记录，fields、expand 的用法同 GET /transactions"""
+    field_names, expand_names = transaction_fieldset(fields, expand)
     # 验证项目是否存在且属于当前用户
-    db_project = get_project(db, project_id=project_id, user_id=current_user.id)
+    db_project = await run_db(db, get_project, project_id=project_id, user_id=current_user.id)
     if db_project is None:
         raise HTTPException(status_code=404, detail="Project not found")
 
     # 获取项目的交易记录
-    transactions = db.query(TransactionModel).filter(
-        TransactionModel.project_id == project_id,
-        TransactionModel.user_id == current_user.id
-    ).all()
+    if settings.fast_serialization or field_names or expand_names:
+        rows = await run_db(
+            db, get_project_transaction_rows, project_id=project_id, user_id=current_user.id,
+            fields=field_names, expand=expand_names
+        )
+        return json_response(list_adapter(Transaction, field_names, transaction_relations(expand_names)), rows, response)
+
+    transactions = await run_db(db, get_project_transactions, project_id=project_id, user_id=current_user.id)
 
     return transactions
 
 
-@router.get("/{project_id}/stats")
-def read_project_stats(
+@router.get(
+    "/{project_id}/stats",
+    response_model=ProjectStats,
+    dependencies=[Depends(etag_for("projects", "transactions", filters=True, currency=True))]
+)
+async def read_project_stats(
     project_id: int,
+    filters: TransactionFilter = Depends(transaction_filter),
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: DBSession = Depends(get_session)
 ):
-    """获取项目的统计信息"""
-    # 验证项目是否存在且属于当前用户
-    db_project = get_project(db, project_id=project_id, user_id=current_user.id)
-    if db_project is None:
+    """获取项目的统计信息，筛选参数同 GET /transactions，金额换算为用户的默认币种"""
+    stats = await run_db(
+        db, get_project_stats, user_id=current_user.id, project_ids=[project_id], filters=filters,
+        currency=current_user.default_currency
+    )
+    if not stats:
         raise HTTPException(status_code=404, detail="Project not found")
-
-    # 计算项目统计信息
-    income_total = db.query(func.sum(TransactionModel.amount)).filter(
-        TransactionModel.project_id == project_id,
-        TransactionModel.user_id == current_user.id,
-        TransactionModel.type == 'income'
-    ).scalar() or 0
-
-    expense_total = db.query(func.sum(TransactionModel.amount)).filter(
-        TransactionModel.project_id == project_id,
-        TransactionModel.user_id == current_user.id,
-        TransactionModel.type == 'expense'
-    ).scalar() or 0
-
-    transaction_count = db.query(func.count(TransactionModel.id)).filter(
-        TransactionModel.project_id == project_id,
-        TransactionModel.user_id == current_user.id
-    ).scalar() or 0
-
-    return {
-        "project_id": project_id,
-        "total_income": float(income_total),
-        "total_expense": float(expense_total),
-        "net_amount": float(income_total) - float(expense_total),
-        "transaction_count": transaction_count
-    }
+    return stats[0]
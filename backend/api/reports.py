@@ -0,0 +1,88 @@
+from datetime import date
+from typing import List, Literal, Optional
+from fastapi import APIRouter, Depends, HTTPException, Query
+from database.database import DBSession, get_session, run_db, run_db_in_threadpool
+from schemas.schemas import MonthlyReportItem, CashflowReport, PivotReport, TransactionFilter
+from crud.crud import get_monthly_report, get_cashflow
+from crud.pivot import PIVOT_DIMENSIONS, PIVOT_MEASURES, get_pivot
+from auth.auth import get_current_active_user
+from api.caching import etag_for
+from api.filters import transaction_filter
+from models.models import User
+
+router = APIRouter(prefix="/reports", tags=["reports"])
+
+MONTH_PATTERN = r"^\d{4}-(0[1-9]|1[0-2])$"
+
+
+@router.get("/monthly", response_model=List[MonthlyReportItem])
+async def read_monthly_report(
+    start_month: Optional[str] = Query(None, pattern=MONTH_PATTERN, description="起始月份（含），如 2024-01"),
+    end_month: Optional[str] = Query(None, pattern=MONTH_PATTERN, description="结束月份（含），如 2024-12"),
+    group_by: List[Literal["category", "project", "account"]] = Query([], description="在月份、类型、币种之外的分组维度"),
+    account_id: Optional[int] = None,
+    category_id: Optional[int] = None,
+    project_id: Optional[int] = None,
+    type: Optional[Literal["income", "expense"]] = None,
+    currency: Optional[str] = None,
+    current_user: User = Depends(get_current_active_user),
+    db: DBSession = Depends(get_session)
+):
+    """按月汇总收支，数据来自预聚合的月度汇总表"""
+    return await run_db(
+        db, get_monthly_report, user_id=current_user.id, start_month=start_month, end_month=end_month,
+        group_by=group_by, account_id=account_id, category_id=category_id, project_id=project_id,
+        type=type, currency=currency
+    )
+
+
+@router.get(
+    "/cashflow",
+    response_model=CashflowReport,
+    dependencies=[Depends(etag_for("transactions", "accounts", "categories", currency=True))]
+)
+async def read_cashflow(
+    bucket: Literal["day", "week", "month"] = "month",
+    start_date: Optional[date] = Query(None, alias="from", description="起始日期（含），默认为最早一笔交易的日期"),
+    end_date: Optional[date] = Query(None, alias="to", description="结束日期（含），默认为今天"),
+    split: Optional[Literal["category", "account"]] = Query(None, description="按分类或账户拆分出各自的收支序列"),
+    current_user: User = Depends(get_current_active_user),
+    db: DBSession = Depends(get_session)
+):
+    """按日、周（周一开始）或月汇总的收支时间序列
+
+    返回按周期对齐的平行数组：周期起始日、收入、支出、净额和周期末账户余额，没有交易的周期为 0。
+    外币交易按交易当天的汇率换算为用户的默认币种。
+    """
+    if start_date and end_date and start_date > end_date:
+        raise HTTPException(status_code=400, detail="from must not be after to")
+    try:
+        return await run_db_in_threadpool(
+            db, get_cashflow, user_id=current_user.id, bucket=bucket, start_date=start_date, end_date=end_date, split=split,
+            currency=current_user.default_currency
+        )
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
+
+
+@router.get("/pivot", response_model=PivotReport, dependencies=[Depends(etag_for("transactions", "categories", currency=True))])
+async def read_pivot(
+    rows: List[Literal[PIVOT_DIMENSIONS]] = Query(..., description="行维度，可重复，如 rows=category"),
+    columns: List[Literal[PIVOT_DIMENSIONS]] = Query([], description="列维度，可重复，如 columns=month"),
+    measure: Literal[PIVOT_MEASURES] = "expense",
+    filters: TransactionFilter = Depends(transaction_filter),
+    current_user: User = Depends(get_current_active_user),
+    db: DBSession = Depends(get_session)
+):
+    """按任意维度组合透视汇总交易，如每个分类每月的支出
+
+    数据来自内存中的交易列缓存，同一用户的多次透视只在首次（或交易变化后）查询数据库。
+    金额按交易当天的汇率换算为用户的默认币种。
+    """
+    try:
+        return await run_db_in_threadpool(
+            db, get_pivot, user_id=current_user.id, rows=rows, columns=columns, measure=measure, filters=filters,
+            currency=current_user.default_currency
+        )
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc))
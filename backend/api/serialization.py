@@ -0,0 +1,75 @@
+"""
+列表接口的快速序列化
+
+默认情况下，列表接口返回 ORM 对象，FastAPI 按 response_model 逐个经 from_attributes
+校验成模型实例后再序列化，千行以上的列表主要耗时都在这里。开启 FAST_SERIALIZATION 后，
+crud 直接返回字段字典，由这里按 response_model 的字段生成 TypedDict，用缓存的
+TypeAdapter 一次性序列化为 JSON，不创建任何中间模型实例。
+
+TypedDict 的字段和类型取自 schemas 中的模型，输出与 response_model 的 JSON 一致，
+OpenAPI 文档仍以 response_model 为准。
+
+交易列表的 ?fields= 和 ?expand= 也走这条路径：fields 只输出（也只查询）列出的字段，
+expand 在每行中加入关联对象的 {id, name}。
+"""
+from functools import lru_cache
+from typing import Any, List, Optional, Tuple, Type
+from fastapi import HTTPException, Response
+from pydantic import BaseModel, TypeAdapter
+from typing_extensions import TypedDict
+from schemas.schemas import TransactionRelation
+from crud.crud import TRANSACTION_EXPANSIONS, TRANSACTION_FIELDS
+
+# expand 中的关联与 ETag 依赖的资源，标签改名或删除时已递增 transactions 的版本号
+TRANSACTION_EXPAND_RESOURCES = {"account": "accounts", "category": "categories", "project": "projects", "tags": "transactions"}
+FIELDS_DESCRIPTION = "以逗号分隔的字段名，只返回（也只查询）这些字段"
+EXPAND_DESCRIPTION = "以逗号分隔的关联：account、category、project、tags，每行加入关联对象的 id 和 name"
+
+# (关联名, 关联模型, 是否为列表)
+Relations = Tuple[Tuple[str, Type[BaseModel], bool], ...]
+
+
+@lru_cache(maxsize=256)
+def _row_type(model: Type[BaseModel], fields: Optional[Tuple[str, ...]] = None, relations: Relations = ()) -> type:
+    annotations = {name: field.annotation for name, field in model.model_fields.items() if not fields or name in fields}
+    for name, related, many in relations:
+        annotations[name] = List[_row_type(related)] if many else Optional[_row_type(related)]
+    return TypedDict(f"{model.__name__}Row", annotations)
+
+
+@lru_cache(maxsize=256)
+def list_adapter(model: Type[BaseModel], fields: Optional[Tuple[str, ...]] = None, relations: Relations = ()) -> TypeAdapter:
+    """List[model] 对应的序列化器，输入为字段字典的列表；fields 为空时包含全部字段"""
+    return TypeAdapter(List[_row_type(model, fields, relations)])
+
+
+@lru_cache(maxsize=256)
+def page_adapter(model: Type[BaseModel], fields: Optional[Tuple[str, ...]] = None, relations: Relations = ()) -> TypeAdapter:
+    """游标分页结果 {items, next_cursor} 对应的序列化器"""
+    page = TypedDict(f"{model.__name__}RowPage", {
+        "items": List[_row_type(model, fields, relations)], "next_cursor": Optional[str]
+    })
+    return TypeAdapter(page)
+
+
+def json_response(adapter: TypeAdapter, content: Any, response: Response) -> Response:
+    """序列化 content 并保留依赖项设置在 response 上的响应头（如 ETag）"""
+    headers = {key: value for key, value in response.headers.items() if key != "content-length"}
+    return Response(adapter.dump_json(content), media_type="application/json", headers=headers)
+
+
+def _split_names(value: Optional[str], allowed: Tuple[str, ...], param: str) -> Tuple[str, ...]:
+    names = {name.strip() for name in (value or "").split(",") if name.strip()}
+    unknown = names.difference(allowed)
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown {param}: {', '.join(sorted(unknown))}")
+    return tuple(name for name in allowed if name in names)
+
+
+def transaction_fieldset(fields: Optional[str], expand: Optional[str]) -> Tuple[Optional[Tuple[str, ...]], Tuple[str, ...]]:
+    """解析交易列表的 fields 和 expand 参数，按 schemas.Transaction 和 TRANSACTION_EXPANSIONS 的顺序返回"""
+    return _split_names(fields, TRANSACTION_FIELDS, "fields") or None, _split_names(expand, TRANSACTION_EXPANSIONS, "expand")
+
+
+def transaction_relations(expand: Tuple[str, ...]) -> Relations:
+    return tuple((name, TransactionRelation, name == "tags") for name in expand)
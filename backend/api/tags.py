@@ -0,0 +1,113 @@
+from typing import List, Optional, Union
+from fastapi import APIRouter, Depends, HTTPException
+from database.database import DBSession, get_session, run_db
+from database.write_queue import run_write
+from schemas.schemas import Tag, TagPage, TagCreate, TagUpdate, TagStats, TagStatsPage, TransactionFilter
+from crud.crud import (
+    get_tags, get_tags_page, get_tag, create_tag, update_tag, delete_tag, get_tag_stats, get_tag_stats_page
+)
+from crud.pagination import InvalidCursor
+from auth.auth import get_current_active_user
+from api.filters import transaction_filter
+from models.models import User
+
+router = APIRouter(prefix="/tags", tags=["tags"])
+
+
+@router.get("", response_model=Union[TagPage, List[Tag]])
+async def read_tags(
+    skip: int = 0,
+    limit: int = 100,
+    after: Optional[str] = None,
+    current_user: User = Depends(get_current_active_user),
+    db: DBSession = Depends(get_session)
+):
+    """获取用户的所有标签"""
+    # 游标分页，用法同 GET /transactions
+    if after is not None:
+        try:
+            items, next_cursor = await run_db(db, get_tags_page, user_id=current_user.id, after=after, limit=limit)
+        except InvalidCursor:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        return {"items": items, "next_cursor": next_cursor}
+
+    return await run_db(db, get_tags, user_id=current_user.id, skip=skip, limit=limit)
+
+
+@router.post("", response_model=Tag)
+async def create_tag_for_user(
+    tag: TagCreate,
+    current_user: User = Depends(get_current_active_user),
+    db: DBSession = Depends(get_session)
+):
+    """创建新标签"""
+    return await run_write(db, create_tag, tag=tag, user_id=current_user.id)
+
+
+@router.get("/stats", response_model=Union[TagStatsPage, List[TagStats]])
+async def read_tag_stats(
+    skip: int = 0,
+    limit: int = 100,
+    after: Optional[str] = None,
+    filters: TransactionFilter = Depends(transaction_filter),
+    current_user: User = Depends(get_current_active_user),
+    db: DBSession = Depends(get_session)
+):
+    """每个标签的使用次数和收支合计，分页方式同 GET /tags
+
+    只统计满足筛选条件的交易，筛选参数同 GET /transactions，金额换算为用户的默认币种。
+    """
+    if after is not None:
+        try:
+            items, next_cursor = await run_db(
+                db, get_tag_stats_page, user_id=current_user.id, after=after, limit=limit, filters=filters,
+                currency=current_user.default_currency
+            )
+        except InvalidCursor:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        return {"items": items, "next_cursor": next_cursor}
+
+    return await run_db(
+        db, get_tag_stats, user_id=current_user.id, skip=skip, limit=limit, filters=filters,
+        currency=current_user.default_currency
+    )
+
+
+@router.get("/{tag_id}", response_model=Tag)
+async def read_tag(
+    tag_id: int,
+    current_user: User = Depends(get_current_active_user),
+    db: DBSession = Depends(get_session)
+):
+    """获取特定标签"""
+    db_tag = await run_db(db, get_tag, tag_id=tag_id, user_id=current_user.id)
+    if db_tag is None:
+        raise HTTPException(status_code=404, detail="Tag not found")
+    return db_tag
+
+
+@router.put("/{tag_id}", response_model=Tag)
+async def update_tag_for_user(
+    tag_id: int,
+    tag_update: TagUpdate,
+    current_user: User = Depends(get_current_active_user),
+    db: DBSession = Depends(get_session)
+):
+    """更新标签"""
+    db_tag = await run_write(db, update_tag, tag_id=tag_id, user_id=current_user.id, tag_update=tag_update)
+    if db_tag is None:
+        raise HTTPException(status_code=404, detail="Tag not found")
+    return db_tag
+
+
+@router.delete("/{tag_id}")
+async def delete_tag_for_user(
+    tag_id: int,
+    current_user: User = Depends(get_current_active_user),
+    db: DBSession = Depends(get_session)
+):
+    """删除标签，交易上的该标签一并移除"""
+    success = await run_write(db, delete_tag, tag_id=tag_id, user_id=current_user.id)
+    if not success:
+        raise HTTPException(status_code=404, detail="Tag not found")
+    return {"message": "Tag deleted successfully"}
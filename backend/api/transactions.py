@@ -1,75 +1,285 @@
-from typing import List
-from fastapi import APIRouter, Depends, HTTPException
+import csv
+import io
+import json
+from datetime import datetime
+from typing import Iterator, List, Literal, Optional, Tuple, Union
+from fastapi import APIRouter, Depends, File, HTTPException, Query, Response, UploadFile
+from fastapi.responses import StreamingResponse
 from sqlalchemy.orm import Session
-from database.database import get_db
-from schemas.schemas import Transaction, TransactionCreate, TransactionUpdate
+from database.database import DBSession, SessionLocal, get_db, get_session, run_db
+from database.write_queue import run_write
+from schemas.schemas import (
+    Transaction, TransactionPage, TransactionCreate, TransactionUpdate, TransactionImportResult,
+    TransactionFilter, TransactionStats
+)
 from crud.crud import (
-    get_transactions, get_transaction, create_transaction,
-    update_transaction, delete_transaction
+    get_transactions, get_transactions_page, get_transaction, create_transaction,
+    update_transaction, delete_transaction, import_transactions,
+    iter_transaction_export, search_transactions, EXPORT_COLUMNS,
+    get_transaction_rows, get_transaction_rows_page, get_transaction_stats
 )
+from crud.pagination import InvalidCursor
 from auth.auth import get_current_active_user
+from api.caching import etag_for
+from api.filters import transaction_filter
+from api.serialization import (
+    json_response, list_adapter, page_adapter, transaction_fieldset, transaction_relations,
+    TRANSACTION_EXPAND_RESOURCES, FIELDS_DESCRIPTION, EXPAND_DESCRIPTION
+)
+from config.config import settings
 from models.models import User
 
 router = APIRouter(prefix="/transactions", tags=["transactions"])
 
 
-@router.get("", response_model=List[Transaction])
-def read_transactions(
+@router.get(
+    "",
+    response_model=Union[TransactionPage, List[Transaction]],
+    dependencies=[Depends(etag_for("transactions", expand=TRANSACTION_EXPAND_RESOURCES, filters=True))]
+)
+async def read_transactions(
+    response: Response,
     skip: int = 0,
     limit: int = 100,
+    after: Optional[str] = None,
+    tags: Optional[str] = Query(None, description="以逗号分隔的标签名"),
+    match: Literal["any", "all"] = Query("any", description="any：带有任一标签；all：带有全部标签"),
+    sort: Literal["transaction_date", "amount"] = "transaction_date",
+    order: Literal["asc", "desc"] = "asc",
+    fields: Optional[str] = Query(None, description=FIELDS_DESCRIPTION),
+    expand: Optional[str] = Query(None, description=EXPAND_DESCRIPTION),
+    filters: TransactionFilter = Depends(transaction_filter),
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: DBSession = Depends(get_session)
 ):
-    """获取用户的所有交易记录"""
-    transactions = get_transactions(db, user_id=current_user.id, skip=skip, limit=limit)
+    """获取用户的交易记录
+
+    支持按日期、账户、分类（可包含子分类）、项目、类型、币种、金额范围和标签筛选，
+    按日期或金额升序、降序排列，所有条件编译为一条 SQL 查询。
+    传入 after 参数（首页传空字符串）时使用游标分页，返回 items 和 next_cursor，
+    翻页时须保持相同的筛选和排序参数；否则保持原有的 skip/limit 分页，直接返回列表。
+    """
+    options = {"tags": _tag_names(tags), "match": match, "filters": filters, "sort": sort, "order": order}
+    field_names, expand_names = transaction_fieldset(fields, expand)
+    if settings.fast_serialization or field_names or expand_names:
+        # 只查询需要的列并直接序列化，不带 fields、expand 时输出与 response_model 一致
+        relations = transaction_relations(expand_names)
+        if after is not None:
+            try:
+                items, next_cursor = await run_db(
+                    db, get_transaction_rows_page, user_id=current_user.id, after=after, limit=limit,
+                    fields=field_names, expand=expand_names, **options
+                )
+            except InvalidCursor:
+                raise HTTPException(status_code=400, detail="Invalid cursor")
+            adapter = page_adapter(Transaction, field_names, relations)
+            return json_response(adapter, {"items": items, "next_cursor": next_cursor}, response)
+        rows = await run_db(
+            db, get_transaction_rows, user_id=current_user.id, skip=skip, limit=limit,
+            fields=field_names, expand=expand_names, **options
+        )
+        return json_response(list_adapter(Transaction, field_names, relations), rows, response)
+
+    if after is not None:
+        try:
+            items, next_cursor = await run_db(
+                db, get_transactions_page, user_id=current_user.id, after=after, limit=limit, **options
+            )
+        except InvalidCursor:
+            raise HTTPException(status_code=400, detail="Invalid cursor")
+        return {"items": items, "next_cursor": next_cursor}
+
+    transactions = await run_db(db, get_transactions, user_id=current_user.id, skip=skip, limit=limit, **options)
     return transactions
 
 
+def _tag_names(tags: Optional[str]) -> Optional[List[str]]:
+    return [name.strip() for name in tags.split(",") if name.strip()] if tags else None
+
+
 @router.post("", response_model=Transaction)
-def create_transaction_for_user(
+async def create_transaction_for_user(
     transaction: TransactionCreate,
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: DBSession = Depends(get_session)
 ):
     """创建新交易记录"""
-    return create_transaction(db=db, transaction=transaction, user_id=current_user.id)
+    return await run_write(db, create_transaction, transaction=transaction, user_id=current_user.id)
 
 
-@router.get("/{transaction_id}", response_model=Transaction)
-def read_transaction(
-    transaction_id: int,
+def _iter_csv_rows(stream) -> Iterator[Tuple[int, object]]:
+    """逐行读取 CSV，空单元格视为未填写"""
+    reader = csv.DictReader(io.TextIOWrapper(stream, encoding="utf-8-sig", newline=""))
+    for row in reader:
+        yield reader.line_num, {key: value for key, value in row.items() if key and value not in (None, "")}
+
+
+def _iter_ndjson_rows(stream) -> Iterator[Tuple[int, object]]:
+    """逐行读取 JSON Lines，跳过空行"""
+    for line_number, line in enumerate(io.TextIOWrapper(stream, encoding="utf-8-sig"), start=1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError as exc:
+            yield line_number, ValueError(f"Invalid JSON: {exc}")
+            continue
+        if not isinstance(row, dict):
+            yield line_number, ValueError("Each line must be a JSON object")
+            continue
+        yield line_number, row
+
+
+@router.post("/import", response_model=TransactionImportResult)
+def import_transactions_for_user(
+    file: UploadFile = File(...),
+    format: Optional[str] = Query(None, pattern="^(csv|ndjson)$"),
+    chunk_size: int = Query(1000, ge=1, le=10000),
     current_user: User = Depends(get_current_active_user),
     db: Session = Depends(get_db)
+):
+    """从 CSV 或 JSON Lines 文件批量导入交易记录
+
+    字段与创建交易相同，另可用 tags 按名称指定标签（CSV 中以 | 分隔）。
+    未指定 format 时按文件扩展名判断。
+    """
+    if format is None:
+        filename = (file.filename or "").lower()
+        if filename.endswith(".csv"):
+            format = "csv"
+        elif filename.endswith((".ndjson", ".jsonl")):
+            format = "ndjson"
+        else:
+            raise HTTPException(status_code=400, detail="Unknown file format, use format=csv or format=ndjson")
+
+    rows = _iter_csv_rows(file.file) if format == "csv" else _iter_ndjson_rows(file.file)
+    try:
+        return import_transactions(db, user_id=current_user.id, rows=rows, chunk_size=chunk_size)
+    except (UnicodeDecodeError, csv.Error) as exc:
+        raise HTTPException(status_code=400, detail=f"Invalid file: {exc}")
+
+
+def _export_value(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def _export_csv(batches: Iterator[list]) -> Iterator[str]:
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_COLUMNS)
+    for rows in batches:
+        writer.writerows([_export_value(value) for value in row] for row in rows)
+        yield buffer.getvalue()
+        buffer.seek(0)
+        buffer.truncate()
+    yield buffer.getvalue()
+
+
+def _export_ndjson(batches: Iterator[list]) -> Iterator[str]:
+    for rows in batches:
+        yield "".join(
+            json.dumps(dict(zip(EXPORT_COLUMNS, map(_export_value, row))), ensure_ascii=False) + "\n"
+            for row in rows
+        )
+
+
+@router.get("/export")
+def export_transactions(
+    format: str = Query("csv", pattern="^(csv|ndjson)$"),
+    tags: Optional[str] = Query(None, description="以逗号分隔的标签名"),
+    match: Literal["any", "all"] = Query("any", description="any：带有任一标签；all：带有全部标签"),
+    filters: TransactionFilter = Depends(transaction_filter),
+    current_user: User = Depends(get_current_active_user)
+):
+    """流式导出交易记录（CSV 或 JSON Lines），导出的文件可以直接用于导入
+
+    筛选参数同 GET /transactions。
+    """
+    user_id = current_user.id
+    tag_names = _tag_names(tags)
+
+    def generate():
+        # 响应体在路由返回后才开始生成，使用独立的会话
+        db = SessionLocal()
+        try:
+            batches = iter_transaction_export(db, user_id=user_id, tags=tag_names, match=match, filters=filters)
+            yield from (_export_csv(batches) if format == "csv" else _export_ndjson(batches))
+        finally:
+            db.close()
+
+    media_type = "text/csv" if format == "csv" else "application/x-ndjson"
+    return StreamingResponse(
+        generate(),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="transactions.{format}"'}
+    )
+
+
+@router.get("/stats", response_model=TransactionStats, dependencies=[Depends(etag_for("transactions", filters=True, currency=True))])
+async def read_transaction_stats(
+    tags: Optional[str] = Query(None, description="以逗号分隔的标签名"),
+    match: Literal["any", "all"] = Query("any", description="any：带有任一标签；all：带有全部标签"),
+    filters: TransactionFilter = Depends(transaction_filter),
+    current_user: User = Depends(get_current_active_user),
+    db: DBSession = Depends(get_session)
+):
+    """满足筛选条件的交易笔数和收支合计，筛选参数同 GET /transactions，金额换算为用户的默认币种"""
+    return await run_db(
+        db, get_transaction_stats, user_id=current_user.id, tags=_tag_names(tags), match=match, filters=filters,
+        currency=current_user.default_currency
+    )
+
+
+@router.get("/search", response_model=List[Transaction], dependencies=[Depends(etag_for("transactions"))])
+async def search_transactions_for_user(
+    q: str = Query(..., min_length=1, max_length=200, description="搜索词，多个词以空格分隔，需全部出现在标题或备注中"),
+    skip: int = 0,
+    limit: int = Query(50, ge=1, le=200),
+    sort: Literal["relevance", "date"] = "relevance",
+    current_user: User = Depends(get_current_active_user),
+    db: DBSession = Depends(get_session)
+):
+    """按标题和备注全文搜索交易，默认按相关度排序，sort=date 时按日期倒序"""
+    return await run_db(db, search_transactions, user_id=current_user.id, q=q, skip=skip, limit=limit, sort=sort)
+
+
+@router.get("/{transaction_id}", response_model=Transaction, dependencies=[Depends(etag_for("transactions"))])
+async def read_transaction(
+    transaction_id: int,
+    current_user: User = Depends(get_current_active_user),
+    db: DBSession = Depends(get_session)
 ):
     """获取特定交易记录"""
-    db_transaction = get_transaction(db, transaction_id=transaction_id, user_id=current_user.id)
+    db_transaction = await run_db(db, get_transaction, transaction_id=transaction_id, user_id=current_user.id)
     if db_transaction is None:
         raise HTTPException(status_code=404, detail="Transaction not found")
     return db_transaction
 
 
 @router.put("/{transaction_id}", response_model=Transaction)
-def update_transaction_for_user(
+async def update_transaction_for_user(
     transaction_id: int,
     transaction_update: TransactionUpdate,
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: DBSession = Depends(get_session)
 ):
     """更新交易记录"""
-    db_transaction = update_transaction(db, transaction_id=transaction_id, user_id=current_user.id, transaction_update=transaction_update)
+    db_transaction = await run_write(db, update_transaction, transaction_id=transaction_id, user_id=current_user.id, transaction_update=transaction_update)
     if db_transaction is None:
         raise HTTPException(status_code=404, detail="Transaction not found")
     return db_transaction
 
 
 @router.delete("/{transaction_id}")
-def delete_transaction_for_user(
+async def delete_transaction_for_user(
     transaction_id: int,
     current_user: User = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: DBSession = Depends(get_session)
 ):
     """删除交易记录"""
-    success = delete_transaction(db, transaction_id=transaction_id, user_id=current_user.id)
+    success = await run_write(db, delete_transaction, transaction_id=transaction_id, user_id=current_user.id)
     if not success:
         raise HTTPException(status_code=404, detail="Transaction not found")
     return {"message": "Transaction deleted successfully"}
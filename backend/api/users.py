@@ -1,6 +1,5 @@
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
-from database.database import get_db
+from database.database import DBSession, get_session, run_db
 from schemas.schemas import User, UserUpdate
 from crud.crud import get_user, update_user
 from auth.auth import get_current_active_user
@@ -16,13 +15,13 @@ def read_users_me(current_user: UserModel = Depends(get_current_active_user)):
 
 
 @router.put("/me", response_model=User)
-def update_user_me(
+async def update_user_me(
     user_update: UserUpdate,
     current_user: UserModel = Depends(get_current_active_user),
-    db: Session = Depends(get_db)
+    db: DBSession = Depends(get_session)
 ):
     """更新当前用户信息"""
-    updated_user = update_user(db, current_user.id, user_update)
+    updated_user = await run_db(db, update_user, current_user.id, user_update)
     if not updated_user:
         raise HTTPException(status_code=404, detail="User not found")
     return updated_user
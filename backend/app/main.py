@@ -1,19 +1,36 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, Request
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.exceptions import RequestValidationError
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response
 from database.database import engine
-from models import models
-from api import auth, users, accounts, projects, transactions
+from database.migrations import init_db
+from database.write_queue import write_queue
+from auth.password_pool import PasswordPoolBusy, password_pool
+from api.caching import CACHE_CONTROL, NotModified
+from crud.pivot import get_pivot_cache_metrics
+from crud.fx import MissingExchangeRate
+from api import auth, users, accounts, projects, transactions, dashboard, reports, budgets, categories, tags
+
+# 创建数据库表并执行未应用的迁移
+init_db(engine)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # 启动时预热密码哈希进程池，关闭时回收工作进程并提交写队列中剩余的操作
+    password_pool.start()
+    yield
+    write_queue.shutdown()
+    password_pool.shutdown()
 
-# 创建数据库表
-models.Base.metadata.create_all(bind=engine)
 
 # 创建FastAPI应用
 app = FastAPI(
     title="Monika - 个人记账软件",
     description="基于FastAPI + Vue.js + SQLite的个人记账软件",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # 配置CORS
@@ -45,12 +62,39 @@ async def validation_exception_handler(request: Request, exc: RequestValidationE
         content={"detail": error_details}
     )
 
+
+# 密码哈希进程池已满时快速拒绝，避免登录请求无限堆积
+@app.exception_handler(PasswordPoolBusy)
+async def password_pool_busy_handler(request: Request, exc: PasswordPoolBusy):
+    return JSONResponse(
+        status_code=429,
+        content={"detail": "Too many authentication requests, please retry later"},
+        headers={"Retry-After": "1"}
+    )
+
+
+# 汇总需要换算的币种在汇率表中没有报价
+@app.exception_handler(MissingExchangeRate)
+async def missing_exchange_rate_handler(request: Request, exc: MissingExchangeRate):
+    return JSONResponse(status_code=400, content={"detail": str(exc)})
+
+
+# 客户端缓存的数据仍是最新时直接返回 304，不执行查询
+@app.exception_handler(NotModified)
+async def not_modified_handler(request: Request, exc: NotModified):
+    return Response(status_code=304, headers={"ETag": exc.etag, "Cache-Control": CACHE_CONTROL})
+
 # 包含路由
 app.include_router(auth.router)
 app.include_router(users.router)
 app.include_router(accounts.router)
 app.include_router(projects.router)
 app.include_router(transactions.router)
+app.include_router(dashboard.router)
+app.include_router(reports.router)
+app.include_router(budgets.router)
+app.include_router(categories.router)
+app.include_router(tags.router)
 
 
 @app.get("/")
@@ -61,3 +105,13 @@ def read_root():
 @app.get("/health")
 def health_check():
     return {"status": "healthy"}
+
+
+@app.get("/metrics")
+def metrics():
+    """运行指标：密码哈希进程池的耗时、排队等待和拒绝次数，写入合并的批次大小，以及透视汇总缓存的占用和命中"""
+    return {
+        "password_pool": password_pool.get_metrics(),
+        "write_queue": write_queue.get_metrics(),
+        "pivot_cache": get_pivot_cache_metrics()
+    }
@@ -1,16 +1,15 @@
+import threading
+import time
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Dict, Optional, Tuple
 from jose import JWTError, jwt
-from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
 from sqlalchemy.orm import Session
-from database.database import get_db
+from database.database import DBSession, get_session, run_db
 from models.models import User
 from schemas.schemas import TokenData
-
-# 密码加密上下文
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+from auth.password_pool import password_pool, pwd_context
 
 # OAuth2 scheme
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/token")
@@ -20,6 +19,57 @@ SECRET_KEY = "your-secret-key-here"  # 在生产环境中应该使用环境变
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 24 * 60  # 24小时
 
+# 已认证用户缓存，按 token 的 sub 和 uid 缓存，0 表示不缓存
+USER_CACHE_TTL_SECONDS = 60
+USER_CACHE_MAX_SIZE = 10000
+
+
+class CachedUser:
+    """缓存的用户信息，只包含请求处理中用到的字段，不绑定数据库会话"""
+
+    __slots__ = ("id", "username", "email", "default_currency", "created_at")
+
+    def __init__(self, user: User):
+        self.id = user.id
+        self.username = user.username
+        self.email = user.email
+        self.default_currency = user.default_currency
+        self.created_at = user.created_at
+
+
+# 键为 (用户名, 用户 id)：用户名改名后可能被其他用户注册，只按用户名缓存时
+# 改名前签发的 token 会命中新用户的缓存；只有用户名的旧 token 用户 id 为 None
+_user_cache: Dict[Tuple[str, Optional[int]], Tuple[float, CachedUser]] = {}
+_user_cache_lock = threading.Lock()
+
+
+def get_cached_user(subject: str, user_id: Optional[int]) -> Optional[CachedUser]:
+    with _user_cache_lock:
+        entry = _user_cache.get((subject, user_id))
+        if entry is None:
+            return None
+        if entry[0] < time.monotonic():
+            del _user_cache[(subject, user_id)]
+            return None
+        return entry[1]
+
+
+def cache_user(subject: str, user_id: Optional[int], cached: CachedUser) -> CachedUser:
+    if USER_CACHE_TTL_SECONDS > 0:
+        with _user_cache_lock:
+            if len(_user_cache) >= USER_CACHE_MAX_SIZE:
+                _user_cache.clear()
+            _user_cache[(subject, user_id)] = (time.monotonic() + USER_CACHE_TTL_SECONDS, cached)
+    return cached
+
+
+def invalidate_user_cache(*subjects: str) -> None:
+    """用户信息变化时清除缓存，参数为 token 的 sub（用户名），同一用户名的所有条目都清除"""
+    subjects = set(subjects)
+    with _user_cache_lock:
+        for key in [key for key in _user_cache if key[0] in subjects]:
+            del _user_cache[key]
+
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """验证密码"""
@@ -31,6 +81,11 @@ def get_password_hash(password: str) -> str:
     return pwd_context.hash(password)
 
 
+async def hash_password(password: str) -> str:
+    """在密码进程池中计算密码哈希，进程池占满时抛出 PasswordPoolBusy"""
+    return await password_pool.hash(password)
+
+
 def get_user_by_username(db: Session, username: str) -> Optional[User]:
     """根据用户名获取用户"""
     return db.query(User).filter(User.username == username).first()
@@ -41,12 +96,15 @@ def get_user_by_email(db: Session, email: str) -> Optional[User]:
     return db.query(User).filter(User.email == email).first()
 
 
-def authenticate_user(db: Session, username: str, password: str) -> Optional[User]:
-    """验证用户"""
-    user = get_user_by_username(db, username)
+async def authenticate_user(db: DBSession, username: str, password: str) -> Optional[User]:
+    """验证用户
+
+    密码校验在密码进程池中执行，进程池占满时抛出 PasswordPoolBusy。
+    """
+    user = await run_db(db, get_user_by_username, username)
     if not user:
         return None
-    if not verify_password(password, user.password_hash):
+    if not await password_pool.verify(password, user.password_hash):
         return None
     return user
 
@@ -63,8 +121,28 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     return encoded_jwt
 
 
-async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
-    """获取当前用户"""
+def _load_user(db: Session, username: str, user_id: Optional[int]) -> Optional[CachedUser]:
+    """token 中带有用户 id 时按主键查询，兼容只有用户名的旧 token
+
+    查询后结束只读事务，把连接归还连接池：同步模式下请求在执行 crud 函数前还要
+    再排队等待线程，一直占着连接会让并发请求互相等待连接池直到超时。
+    """
+    if user_id is None:
+        user = get_user_by_username(db, username)
+    else:
+        user = db.query(User).filter(User.id == user_id).first()
+        if user is not None and user.username != username:
+            user = None
+    cached = CachedUser(user) if user is not None else None
+    db.rollback()
+    return cached
+
+
+async def get_current_user(token: str = Depends(oauth2_scheme), db: DBSession = Depends(get_session)):
+    """获取当前用户
+
+    命中缓存时不访问数据库；未命中时通过 run_db 查询，不阻塞事件循环。
+    """
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -75,13 +153,17 @@ async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = De
         username: str = payload.get("sub")
         if username is None:
             raise credentials_exception
-        token_data = TokenData(username=username)
+        token_data = TokenData(username=username, user_id=payload.get("uid"))
     except JWTError:
         raise credentials_exception
-    user = get_user_by_username(db, username=token_data.username)
+
+    cached = get_cached_user(token_data.username, token_data.user_id)
+    if cached is not None:
+        return cached
+    user = await run_db(db, _load_user, token_data.username, token_data.user_id)
     if user is None:
         raise credentials_exception
-    return user
+    return cache_user(token_data.username, token_data.user_id, user)
 
 
 async def get_current_active_user(current_user: User = Depends(get_current_user)):
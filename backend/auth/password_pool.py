@@ -0,0 +1,155 @@
+"""
+bcrypt 密码哈希进程池
+
+bcrypt 每次计算需要几十毫秒 CPU，直接在请求中执行会阻塞事件循环，
+集中登录时拖慢所有请求。这里把哈希和校验交给独立进程执行：
+
+- 并发上限为 PASSWORD_WORKERS 个进程，进程全忙时最多排队
+  PASSWORD_QUEUE_SIZE 个请求，再多则立即抛出 PasswordPoolBusy（接口返回 429）
+- 记录最近的哈希耗时和排队等待时间，通过 get_metrics() 查看
+
+本模块在工作进程中也会被导入，只能依赖 passlib 和配置，不能导入数据库等模块。
+"""
+import asyncio
+import functools
+import math
+import multiprocessing
+import statistics
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Callable, Deque, Dict, List, Optional, Tuple
+from passlib.context import CryptContext
+from config.config import settings
+
+# 密码加密上下文
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+
+# 指标保留最近的样本数
+METRICS_WINDOW = 1000
+
+
+class PasswordPoolBusy(Exception):
+    """进程池和等待队列都已占满"""
+
+
+def _timed(func: Callable, *args) -> Tuple[object, float, float]:
+    """在工作进程中执行，返回 (结果, 开始时间, 耗时秒数)"""
+    started = time.time()
+    result = func(*args)
+    return result, started, time.time() - started
+
+
+def _hash(password: str) -> Tuple[object, float, float]:
+    return _timed(pwd_context.hash, password)
+
+
+def _verify(password: str, hashed_password: str) -> Tuple[object, float, float]:
+    return _timed(pwd_context.verify, password, hashed_password)
+
+
+def _warm_up() -> None:
+    pass
+
+
+def _percentile(ordered: List[float], fraction: float) -> float:
+    """最近秩法：不小于 fraction 比例样本的最小样本，样本很少时也不低于较小的分位数"""
+    return ordered[min(len(ordered) - 1, math.ceil(len(ordered) * fraction) - 1)]
+
+
+def _summary(samples: Deque[float]) -> Dict[str, float]:
+    if not samples:
+        return {"mean": 0.0, "p50": 0.0, "p95": 0.0, "p99": 0.0}
+    ordered = sorted(samples)
+    return {
+        "mean": round(statistics.fmean(ordered) * 1000, 3),
+        "p50": round(_percentile(ordered, 0.50) * 1000, 3),
+        "p95": round(_percentile(ordered, 0.95) * 1000, 3),
+        "p99": round(_percentile(ordered, 0.99) * 1000, 3),
+    }
+
+
+class PasswordPool:
+    """有界的密码哈希进程池"""
+
+    def __init__(self, workers: int, queue_size: int):
+        self.workers = workers
+        self.queue_size = queue_size
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._in_flight = 0
+        self._completed = 0
+        self._rejected = 0
+        self._hash_seconds: Deque[float] = deque(maxlen=METRICS_WINDOW)
+        self._wait_seconds: Deque[float] = deque(maxlen=METRICS_WINDOW)
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._lock:
+            if self._executor is None:
+                # 使用 spawn，避免 fork 带有线程和数据库连接的服务进程
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers, mp_context=multiprocessing.get_context("spawn")
+                )
+            return self._executor
+
+    def start(self) -> None:
+        """预先启动所有工作进程，避免首批登录承担进程启动开销"""
+        executor = self._get_executor()
+        for future in [executor.submit(_warm_up) for _ in range(self.workers)]:
+            future.result()
+
+    def shutdown(self) -> None:
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    def _release(self, submitted_at: float, future: Future) -> None:
+        # 以工作进程真正结束为准释放名额，请求被取消时也不会提前释放
+        with self._lock:
+            self._in_flight -= 1
+            if not future.cancelled() and future.exception() is None:
+                _, started, elapsed = future.result()
+                self._completed += 1
+                self._hash_seconds.append(elapsed)
+                self._wait_seconds.append(max(started - submitted_at, 0.0))
+
+    async def _run(self, func: Callable, *args):
+        executor = self._get_executor()
+        with self._lock:
+            if self._in_flight >= self.workers + self.queue_size:
+                self._rejected += 1
+                raise PasswordPoolBusy()
+            self._in_flight += 1
+        try:
+            submitted_at = time.time()
+            future = executor.submit(func, *args)
+        except BaseException:
+            with self._lock:
+                self._in_flight -= 1
+            raise
+        future.add_done_callback(functools.partial(self._release, submitted_at))
+        result, _, _ = await asyncio.wrap_future(future)
+        return result
+
+    async def hash(self, password: str) -> str:
+        return await self._run(_hash, password)
+
+    async def verify(self, password: str, hashed_password: str) -> bool:
+        return await self._run(_verify, password, hashed_password)
+
+    def get_metrics(self) -> Dict[str, object]:
+        with self._lock:
+            return {
+                "workers": self.workers,
+                "queue_size": self.queue_size,
+                "in_flight": self._in_flight,
+                "completed": self._completed,
+                "rejected": self._rejected,
+                "hash_ms": _summary(self._hash_seconds),
+                "queue_wait_ms": _summary(self._wait_seconds),
+            }
+
+
+password_pool = PasswordPool(settings.password_workers, settings.password_queue_size)
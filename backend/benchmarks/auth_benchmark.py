@@ -0,0 +1,43 @@
+"""
+认证开销基准：对比 get_current_user 每次查询用户表与命中用户缓存时的耗时
+
+    python -m benchmarks.auth_benchmark [次数]
+"""
+import asyncio
+import sys
+from benchmarks.common import use_temp_workdir, measure, report
+
+
+def main(repeat: int = 5000) -> None:
+    use_temp_workdir()
+    from fastapi.testclient import TestClient
+    from app.main import app
+    from auth import auth
+    from database.database import SessionLocal
+
+    client = TestClient(app)
+    client.post("/auth/register/", json={"username": "bench", "email": "bench@example.com", "password": "bench"})
+    token = client.post("/auth/token/", data={"username": "bench", "password": "bench"}).json()["access_token"]
+
+    loop = asyncio.new_event_loop()
+
+    def resolve_user():
+        # 与请求中一样，每次使用新的会话
+        db = SessionLocal()
+        try:
+            loop.run_until_complete(auth.get_current_user(token=token, db=db))
+        finally:
+            db.close()
+
+    ttl = auth.USER_CACHE_TTL_SECONDS
+    auth.USER_CACHE_TTL_SECONDS = 0
+    auth.invalidate_user_cache("bench")
+    report("get_current_user 查询用户表", measure(resolve_user, repeat))
+
+    auth.USER_CACHE_TTL_SECONDS = ttl
+    report("get_current_user 命中缓存", measure(resolve_user, repeat))
+    loop.close()
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:2]))
@@ -0,0 +1,60 @@
+"""
+现金流时间序列基准：五年数据按日、周、月汇总的耗时
+
+写入 2020-2024 年的交易数据（默认 10 万笔），测量 get_cashflow 各种分桶和拆分方式，
+以及 GET /reports/cashflow 按日汇总五年数据的完整请求耗时。
+
+    python -m benchmarks.cashflow_benchmark [交易笔数]
+"""
+import random
+import sys
+from datetime import datetime, timedelta
+from benchmarks.common import use_temp_workdir, measure, report
+
+
+def main(count: int = 100000) -> None:
+    use_temp_workdir()
+    from fastapi.testclient import TestClient
+    from sqlalchemy import insert
+    from app.main import app
+    from database.database import SessionLocal
+    from models.models import Account, Category, Transaction
+    from crud import crud
+
+    with TestClient(app) as client:
+        client.post("/auth/register/", json={"username": "bench", "email": "bench@example.com", "password": "bench"})
+        token = client.post("/auth/token/", data={"username": "bench", "password": "bench"}).json()["access_token"]
+        headers = {"Authorization": f"Bearer {token}"}
+
+        db = SessionLocal()
+        db.add_all([Account(user_id=1, name=f"account {i}", type="cash", initial_balance=1000) for i in range(5)])
+        db.add_all([Category(user_id=1, name=f"category {i}", type="expense") for i in range(20)])
+        db.commit()
+        rng = random.Random(0)
+        first = datetime(2020, 1, 1)
+        for offset in range(0, count, 10000):
+            db.execute(insert(Transaction), [{
+                "user_id": 1, "account_id": rng.randint(1, 5), "category_id": rng.choice([None, rng.randint(1, 20)]),
+                "type": "income" if rng.random() < 0.2 else "expense", "amount": rng.randint(100, 100000) / 100,
+                "currency": "CNY", "transaction_date": first + timedelta(minutes=rng.randrange(5 * 365 * 24 * 60))
+            } for _ in range(min(10000, count - offset))])
+        db.commit()
+        crud.rebuild_monthly_rollups(db, user_id=1)
+        print(f"{count} 笔交易，2020-2024 年")
+
+        span = {"start_date": first.date(), "end_date": datetime(2024, 12, 31).date()}
+        for bucket in ("day", "week", "month"):
+            for split in (None, "category", "account"):
+                label = f"get_cashflow {bucket}" + (f" / {split}" if split else "")
+                report(label, measure(
+                    lambda: crud.get_cashflow(db, user_id=1, bucket=bucket, split=split, **span), repeat=20, warmup=2
+                ))
+        db.close()
+
+        url = "/reports/cashflow?bucket=day&from=2020-01-01&to=2024-12-31"
+        assert len(client.get(url, headers=headers).json()["buckets"]) == 1827
+        report("GET /reports/cashflow day", measure(lambda: client.get(url, headers=headers), repeat=20, warmup=2))
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:2]))
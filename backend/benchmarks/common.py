@@ -0,0 +1,45 @@
+"""
+基准测试公共工具
+
+基准测试在临时目录中运行，使用独立的 monika.db，不影响开发数据库。
+用法（在 backend 目录下）：
+    python -m benchmarks.<模块名>
+"""
+import os
+import statistics
+import sys
+import tempfile
+import time
+from typing import Callable, Dict
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def use_temp_workdir() -> str:
+    """切换到临时目录，必须在导入 app 之前调用"""
+    if BACKEND_DIR not in sys.path:
+        sys.path.insert(0, BACKEND_DIR)
+    workdir = tempfile.mkdtemp(prefix="monika-bench-")
+    os.chdir(workdir)
+    return workdir
+
+
+def measure(func: Callable[[], object], repeat: int, warmup: int = 20) -> Dict[str, float]:
+    """重复执行 func，返回每次耗时的统计（毫秒）"""
+    for _ in range(warmup):
+        func()
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1000)
+    samples.sort()
+    return {
+        "mean": statistics.fmean(samples),
+        "p50": samples[len(samples) // 2],
+        "p99": samples[int(len(samples) * 0.99) - 1],
+    }
+
+
+def report(label: str, stats: Dict[str, float]) -> None:
+    print(f"{label:<32} mean {stats['mean']:8.3f} ms   p50 {stats['p50']:8.3f} ms   p99 {stats['p99']:8.3f} ms")
@@ -0,0 +1,159 @@
+"""
+并发基准：对比 DATABASE_MODE=sync 与 async 下的吞吐量和事件循环响应
+
+每种模式在独立子进程中运行。read 场景预先写入交易数据，然后以固定并发度请求
+GET /transactions，同时测量 GET /health 的延迟（反映事件循环是否被阻塞）；write 场景
+以固定并发度 POST /transactions，其中一部分引用不存在的账户而违反外键约束，统计有效写入
+中因 database is locked 等原因失败的次数，并检查账户余额与成功写入的金额一致。
+
+    python -m benchmarks.concurrency_benchmark [--scenario read|write] [--requests 2000] [--concurrency 50]
+"""
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import time
+from benchmarks.common import BACKEND_DIR, use_temp_workdir
+
+
+async def _login(client) -> dict:
+    from database.database import SessionLocal
+    from models.models import Account
+
+    await client.post("/auth/register/", json={"username": "bench", "email": "bench@example.com", "password": "bench"})
+    token = (await client.post("/auth/token/", data={"username": "bench", "password": "bench"})).json()["access_token"]
+    db = SessionLocal()
+    db.add(Account(user_id=1, name="bench", type="cash", initial_balance=0, current_balance=0))
+    db.commit()
+    db.close()
+    return {"Authorization": f"Bearer {token}"}
+
+
+async def _run_writes(requests: int, concurrency: int, invalid_ratio: float) -> None:
+    import httpx
+    from app.main import app
+    from database.database import SessionLocal
+    from models.models import Account
+
+    # 违反外键约束的写入返回 500，不把异常抛给客户端
+    transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=None) as client:
+        headers = await _login(client)
+        invalid_every = round(1 / invalid_ratio) if invalid_ratio > 0 else 0
+        queue = asyncio.Queue()
+        for i in range(requests):
+            queue.put_nowait(i)
+        ok, invalid, failed, latencies, expected_balance = 0, 0, 0, [], 0
+
+        async def worker():
+            nonlocal ok, invalid, failed, expected_balance
+            while not queue.empty():
+                i = queue.get_nowait()
+                is_invalid = bool(invalid_every) and i % invalid_every == 0
+                start = time.perf_counter()
+                response = await client.post("/transactions", headers=headers, json={
+                    "account_id": 999999 if is_invalid else 1, "type": "expense", "amount": i % 100 + 1,
+                    "currency": "CNY", "transaction_date": f"2024-{i % 12 + 1:02d}-{i % 28 + 1:02d}T12:00:00"
+                })
+                latencies.append((time.perf_counter() - start) * 1000)
+                if is_invalid:
+                    invalid += 1
+                elif response.status_code == 200:
+                    ok += 1
+                    expected_balance -= i % 100 + 1
+                else:
+                    failed += 1
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+
+    db = SessionLocal()
+    balance = db.get(Account, 1).current_balance
+    db.close()
+    latencies.sort()
+    mode = os.environ.get("DATABASE_MODE", "sync")
+    print(
+        f"{mode:<6} {requests / elapsed:8.1f} req/s   p50 {latencies[len(latencies) // 2]:7.2f} ms   "
+        f"max {latencies[-1]:8.2f} ms   ok {ok}  invalid {invalid}  failed {failed}  "
+        f"balance {'ok' if float(balance) == expected_balance else 'mismatch'}"
+    )
+
+
+async def _run(requests: int, concurrency: int) -> None:
+    import httpx
+    from app.main import app
+    from database.database import SessionLocal
+    from crud.crud import import_transactions
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        headers = await _login(client)
+
+        db = SessionLocal()
+        rows = ((i, {"account_id": 1, "type": "expense", "amount": i % 100, "currency": "CNY",
+                     "transaction_date": f"2024-{i % 12 + 1:02d}-{i % 28 + 1:02d}T12:00:00"}) for i in range(20000))
+        import_transactions(db, user_id=1, rows=rows)
+        db.close()
+
+        queue = asyncio.Queue()
+        for i in range(requests):
+            queue.put_nowait(i)
+        health_latencies = []
+
+        async def worker():
+            while not queue.empty():
+                i = queue.get_nowait()
+                response = await client.get(f"/transactions?skip={i * 7 % 19000}&limit=50", headers=headers)
+                assert response.status_code == 200
+
+        async def probe(stop: asyncio.Event):
+            while not stop.is_set():
+                start = time.perf_counter()
+                await client.get("/health")
+                health_latencies.append((time.perf_counter() - start) * 1000)
+                await asyncio.sleep(0.005)
+
+        stop = asyncio.Event()
+        probe_task = asyncio.create_task(probe(stop))
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+        stop.set()
+        await probe_task
+
+    health_latencies.sort()
+    p99 = health_latencies[int(len(health_latencies) * 0.99) - 1] if health_latencies else 0.0
+    mode = os.environ.get("DATABASE_MODE", "sync")
+    print(f"{mode:<6} {requests / elapsed:8.1f} req/s   /health p50 {health_latencies[len(health_latencies) // 2]:7.2f} ms   p99 {p99:7.2f} ms")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--scenario", choices=["read", "write"], default="read")
+    parser.add_argument("--invalid-ratio", type=float, default=0.1, help="write 场景中违反外键约束的写入比例")
+    parser.add_argument("--mode", choices=["sync", "async"], default=None, help="只运行指定模式（内部使用）")
+    args = parser.parse_args()
+
+    if args.mode is None:
+        for mode in ("sync", "async"):
+            subprocess.run(
+                [sys.executable, "-m", "benchmarks.concurrency_benchmark", "--mode", mode, "--scenario", args.scenario,
+                 "--requests", str(args.requests), "--concurrency", str(args.concurrency),
+                 "--invalid-ratio", str(args.invalid_ratio)],
+                cwd=BACKEND_DIR, env={**os.environ, "DATABASE_MODE": mode}, check=True
+            )
+        return
+
+    use_temp_workdir()
+    if args.scenario == "write":
+        asyncio.run(_run_writes(args.requests, args.concurrency, args.invalid_ratio))
+    else:
+        asyncio.run(_run(args.requests, args.concurrency))
+
+
+if __name__ == "__main__":
+    main()
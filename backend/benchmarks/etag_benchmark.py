@@ -0,0 +1,46 @@
+"""
+条件请求基准：重复加载时完整响应与 304 Not Modified 的耗时对比
+
+写入交易数据后，对仪表盘和交易列表各请求一次取得 ETag，再分别测量
+不带 If-None-Match（完整查询和序列化）和带 If-None-Match（只读取版本号）的耗时。
+
+    python -m benchmarks.etag_benchmark [交易笔数]
+"""
+import sys
+from benchmarks.common import use_temp_workdir, measure, report
+
+
+def main(count: int = 20000) -> None:
+    use_temp_workdir()
+    from fastapi.testclient import TestClient
+    from app.main import app
+    from database.database import SessionLocal
+    from crud.crud import import_transactions
+    from models.models import Account, Project
+
+    with TestClient(app) as client:
+        client.post("/auth/register/", json={"username": "bench", "email": "bench@example.com", "password": "bench"})
+        token = client.post("/auth/token/", data={"username": "bench", "password": "bench"}).json()["access_token"]
+        headers = {"Authorization": f"Bearer {token}"}
+
+        db = SessionLocal()
+        db.add_all([Account(user_id=1, name=f"account {i}", type="cash", initial_balance=0, current_balance=0) for i in range(5)])
+        db.add_all([Project(user_id=1, name=f"project {i}") for i in range(10)])
+        db.commit()
+        rows = ((i, {"account_id": i % 5 + 1, "project_id": i % 10 + 1, "type": ("income", "expense")[i % 2],
+                     "amount": i % 100 + 1, "currency": "CNY",
+                     "transaction_date": f"2024-{i % 12 + 1:02d}-{i % 28 + 1:02d}T12:00:00"}) for i in range(count))
+        import_transactions(db, user_id=1, rows=rows)
+        db.close()
+        print(f"{count} 笔交易")
+
+        for label, url in (("GET /dashboard/summary", "/dashboard/summary"), ("GET /transactions", "/transactions?limit=100")):
+            etag = client.get(url, headers=headers).headers["etag"]
+            conditional = {**headers, "If-None-Match": etag}
+            assert client.get(url, headers=conditional).status_code == 304
+            report(f"{label} 200", measure(lambda: client.get(url, headers=headers), repeat=100))
+            report(f"{label} 304", measure(lambda: client.get(url, headers=conditional), repeat=100))
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:2]))
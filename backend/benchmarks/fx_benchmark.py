@@ -0,0 +1,89 @@
+"""
+多币种汇总基准：按交易当天汇率换算为默认币种的开销
+
+三个用户各写入 2023-2025 年的交易数据（默认各 10 万笔）：只有 CNY、约 1% 为 USD、约三成为
+USD、EUR、JPY。测量整个结果集一次换算（memo 为空和已缓存时）与逐行查找汇率的耗时，以及
+交易统计、项目统计、透视汇总在三种数据上的耗时，并检查换算结果与逐行换算一致。
+
+    python -m benchmarks.fx_benchmark [交易笔数]
+"""
+import random
+import sys
+from datetime import datetime, timedelta
+import numpy as np
+from benchmarks.common import use_temp_workdir, measure, report
+
+
+def seed(db, user_id: int, count: int, currencies) -> list:
+    from sqlalchemy import insert
+    from models.models import Account, Project, Transaction
+    from crud import crud
+
+    db.add(Account(user_id=user_id, name="cash", type="cash", initial_balance=0))
+    db.add_all([Project(user_id=user_id, name=f"project {i}") for i in range(10)])
+    db.commit()
+    account_id = db.query(Account.id).filter(Account.user_id == user_id).scalar()
+    project_ids = [project_id for project_id, in db.query(Project.id).filter(Project.user_id == user_id)]
+    rng = random.Random(user_id)
+    first = datetime(2023, 1, 1)
+    rows = []
+    for offset in range(0, count, 10000):
+        chunk = [{
+            "user_id": user_id, "account_id": account_id, "project_id": rng.choice([None, *project_ids]),
+            "type": "income" if rng.random() < 0.2 else "expense", "amount": rng.randint(100, 100000) / 100,
+            "currency": rng.choice(currencies), "transaction_date": first + timedelta(minutes=rng.randrange(3 * 365 * 24 * 60))
+        } for _ in range(min(10000, count - offset))]
+        db.execute(insert(Transaction), chunk)
+        rows.extend(chunk)
+    db.commit()
+    crud.rebuild_monthly_rollups(db, user_id=user_id)
+    return rows
+
+
+def main(count: int = 100000) -> None:
+    use_temp_workdir()
+    from database.database import SessionLocal, engine
+    from database.migrations import init_db
+    from models.models import User
+    from crud import crud, fx, pivot
+
+    init_db(engine)
+    db = SessionLocal()
+    db.add_all([User(username=f"bench{i}", email=f"bench{i}@example.com", password_hash="x") for i in (1, 2, 3)])
+    db.commit()
+    seed(db, 1, count, ["CNY"])
+    seed(db, 2, count, ["CNY"] * 99 + ["USD"])
+    rows = seed(db, 3, count, ["CNY"] * 7 + ["USD", "EUR", "JPY"])
+    print(f"每个用户 {count} 笔交易，2023-2025 年")
+
+    rates = fx.get_fx_rates()
+    codes, index = np.unique(np.array([row["currency"] for row in rows]), return_inverse=True)
+    codes = codes.tolist()
+    days = np.array([row["transaction_date"].date() for row in rows], dtype="datetime64[D]").astype(np.int64)
+
+    def convert_cold():
+        rates._memo.clear()
+        return rates.factors(codes, index, days, "CNY")
+
+    def convert_rows():
+        return [rates.rate(row["currency"], row["transaction_date"].date()) / rates.rate("CNY", row["transaction_date"].date()) for row in rows]
+
+    assert np.allclose(convert_cold(), convert_rows())
+    report("factors, empty memo", measure(convert_cold, repeat=5, warmup=1))
+    report("factors, memoized", measure(lambda: rates.factors(codes, index, days, "CNY"), repeat=5, warmup=1))
+    report("rate lookup per row", measure(convert_rows, repeat=3, warmup=1))
+
+    expected = sum(row["amount"] * rates.rate(row["currency"], row["transaction_date"].date()) for row in rows if row["type"] == "expense")
+    assert abs(crud.get_transaction_stats(db, user_id=3)["total_expense"] - round(expected, 2)) < 0.01
+    for user_id, label in ((1, "CNY only"), (2, "1% USD"), (3, "30% foreign")):
+        report(f"get_transaction_stats {label}", measure(lambda: crud.get_transaction_stats(db, user_id=user_id), repeat=10, warmup=1))
+        report(f"get_project_stats {label}", measure(lambda: crud.get_project_stats(db, user_id=user_id), repeat=10, warmup=1))
+        pivot.get_transaction_columns(db, user_id)
+        report(f"get_pivot {label}", measure(
+            lambda: pivot.get_pivot(db, user_id=user_id, rows=["project"], columns=["month"]), repeat=20, warmup=2
+        ))
+    db.close()
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:2]))
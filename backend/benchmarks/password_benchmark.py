@@ -0,0 +1,84 @@
+"""
+登录突发基准：并发登录时其他请求的延迟，以及密码进程池的拒绝和排队情况
+
+对比两种方式：
+- inline：在事件循环中直接执行 bcrypt（进程池引入之前的行为）
+- pool：交给密码进程池执行，超出 PASSWORD_WORKERS + PASSWORD_QUEUE_SIZE 的请求返回 429
+
+    python -m benchmarks.password_benchmark [并发登录数]
+"""
+import asyncio
+import sys
+import time
+from benchmarks.common import use_temp_workdir
+
+
+async def _burst(client, logins: int):
+    form = {"username": "bench", "password": "bench"}
+    health_latencies = []
+    done = asyncio.Event()
+
+    async def probe():
+        while not done.is_set():
+            start = time.perf_counter()
+            await client.get("/health")
+            health_latencies.append((time.perf_counter() - start) * 1000)
+            await asyncio.sleep(0.005)
+
+    probe_task = asyncio.create_task(probe())
+    start = time.perf_counter()
+    responses = await asyncio.gather(*(client.post("/auth/token/", data=form) for _ in range(logins)))
+    elapsed = time.perf_counter() - start
+    done.set()
+    await probe_task
+
+    codes = [response.status_code for response in responses]
+    health_latencies.sort()
+    return {
+        "elapsed": elapsed,
+        "ok": codes.count(200),
+        "rejected": codes.count(429),
+        "health_max": health_latencies[-1] if health_latencies else 0.0,
+        "health_p50": health_latencies[len(health_latencies) // 2] if health_latencies else 0.0,
+    }
+
+
+def _print(label: str, result) -> None:
+    print(
+        f"{label:<8} {result['elapsed'] * 1000:8.1f} ms   200: {result['ok']:3d}   429: {result['rejected']:3d}   "
+        f"/health p50 {result['health_p50']:7.2f} ms   max {result['health_max']:7.2f} ms"
+    )
+
+
+async def _run(logins: int) -> None:
+    import httpx
+    from app.main import app
+    from auth import auth
+    from auth.password_pool import password_pool, pwd_context
+
+    password_pool.start()
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        await client.post("/auth/register/", json={"username": "bench", "email": "bench@example.com", "password": "bench"})
+
+        verify = password_pool.verify
+
+        async def verify_inline(password, hashed_password):
+            return pwd_context.verify(password, hashed_password)
+
+        password_pool.verify = verify_inline
+        _print("inline", await _burst(client, logins))
+        password_pool.verify = verify
+
+        _print("pool", await _burst(client, logins))
+        print((await client.get("/metrics")).json()["password_pool"])
+    password_pool.shutdown()
+
+
+def main(logins: int = 40) -> None:
+    use_temp_workdir()
+    asyncio.run(_run(logins))
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:2]))
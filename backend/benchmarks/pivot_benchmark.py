@@ -0,0 +1,94 @@
+"""
+透视汇总基准：内存中的交易列缓存与等价 SQL 分组查询的耗时对比
+
+写入 2020-2024 年的交易数据（默认 10 万笔），对几种常见的透视分别测量：
+首次加载（清空缓存后）、缓存命中后的 get_pivot，以及对 transactions 执行等价
+GROUP BY 查询的耗时，并检查两者结果一致。
+
+    python -m benchmarks.pivot_benchmark [交易笔数]
+"""
+import random
+import sys
+from collections import defaultdict
+from datetime import datetime, timedelta
+from benchmarks.common import use_temp_workdir, measure, report
+
+# (说明, rows, columns, measure, 行维度的 SQL 表达式, 列维度的 SQL 表达式)
+PIVOTS = (
+    ("category × month expense", ["category"], ["month"], "expense",
+     "category_id", "strftime('%Y-%m', transaction_date)"),
+    ("project × quarter net", ["project"], ["quarter"], "net",
+     "project_id", "strftime('%Y', transaction_date) || '-Q' || ((CAST(strftime('%m', transaction_date) AS INTEGER) + 2) / 3)"),
+    ("account × week income", ["account"], ["week"], "income",
+     "account_id", "date(transaction_date, 'weekday 0', '-6 days')"),
+    ("day count", ["day"], [], "count", "date(transaction_date)", "NULL"),
+)
+SQL_MEASURES = {
+    "income": "SUM(CASE WHEN type = 'income' THEN amount ELSE 0 END)",
+    "expense": "SUM(CASE WHEN type = 'expense' THEN amount ELSE 0 END)",
+    "net": "SUM(CASE WHEN type = 'income' THEN amount ELSE -amount END)",
+    "count": "COUNT(*)",
+}
+
+
+def sql_pivot(db, row: str, column: str, measure: str) -> dict:
+    from sqlalchemy import text
+    rows = db.execute(text(
+        f"SELECT {row}, {column}, {SQL_MEASURES[measure]} FROM transactions WHERE user_id = 1 GROUP BY 1, 2"
+    ))
+    return {(key, column_key): value for key, column_key, value in rows}
+
+
+def main(count: int = 100000) -> None:
+    use_temp_workdir()
+    from sqlalchemy import insert
+    from database.database import SessionLocal, engine
+    from database.migrations import init_db
+    from models.models import User, Account, Category, Project, Transaction
+    from crud import pivot
+
+    init_db(engine)
+    db = SessionLocal()
+    db.add(User(username="bench", email="bench@example.com", password_hash="x"))
+    db.add_all([Account(user_id=1, name=f"account {i}", type="cash", initial_balance=0) for i in range(5)])
+    db.add_all([Category(user_id=1, name=f"category {i}", type="expense") for i in range(20)])
+    db.add_all([Project(user_id=1, name=f"project {i}") for i in range(10)])
+    db.commit()
+    rng = random.Random(0)
+    first = datetime(2020, 1, 1)
+    for offset in range(0, count, 10000):
+        db.execute(insert(Transaction), [{
+            "user_id": 1, "account_id": rng.randint(1, 5), "category_id": rng.choice([None, rng.randint(1, 20)]),
+            "project_id": rng.choice([None, None, rng.randint(1, 10)]),
+            "type": "income" if rng.random() < 0.2 else "expense", "amount": rng.randint(100, 100000) / 100,
+            "currency": "CNY", "transaction_date": first + timedelta(minutes=rng.randrange(5 * 365 * 24 * 60))
+        } for _ in range(min(10000, count - offset))])
+    db.commit()
+    print(f"{count} 笔交易，2020-2024 年")
+
+    def load():
+        pivot.invalidate_transaction_columns()
+        return pivot.get_transaction_columns(db, user_id=1)
+
+    report("load columns", measure(load, repeat=5, warmup=1))
+    print(f"缓存占用 {pivot.get_transaction_columns(db, user_id=1).nbytes / 1024 / 1024:.1f} MiB")
+
+    for label, rows, columns, measure_name, row_sql, column_sql in PIVOTS:
+        result = pivot.get_pivot(db, user_id=1, rows=rows, columns=columns, measure=measure_name)
+        cells = defaultdict(float)
+        for row_key, values in zip(result["row_keys"], result["values"]):
+            for column_key, value in zip(result["column_keys"], values):
+                if value:
+                    cells[(row_key[0], column_key[0] if column_key else None)] = value
+        expected = {key: round(value, 2) for key, value in sql_pivot(db, row_sql, column_sql, measure_name).items() if value}
+        assert set(cells) == set(expected) and all(abs(cells[key] - expected[key]) < 0.005 for key in expected), f"{label} 结果不一致"
+
+        report(f"{label} pivot", measure(
+            lambda: pivot.get_pivot(db, user_id=1, rows=rows, columns=columns, measure=measure_name), repeat=20, warmup=2
+        ))
+        report(f"{label} sql", measure(lambda: sql_pivot(db, row_sql, column_sql, measure_name), repeat=10, warmup=1))
+    db.close()
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:2]))
@@ -0,0 +1,57 @@
+"""
+月度报表基准：从 monthly_rollups 读取与直接汇总 transactions 的耗时对比
+
+写入多年的交易数据后，分别计算全部历史按月、按分类的收支汇总。
+
+    python -m benchmarks.report_benchmark [交易笔数]
+"""
+import random
+import sys
+from benchmarks.common import use_temp_workdir, measure, report
+
+
+def main(count: int = 200000) -> None:
+    use_temp_workdir()
+    from database.database import SessionLocal, engine
+    from database.migrations import init_db
+    from models.models import User, Account, Category
+    from crud import crud
+
+    init_db(engine)
+    db = SessionLocal()
+    db.add(User(username="bench", email="bench@example.com", password_hash="x"))
+    db.flush()
+    accounts = [Account(user_id=1, name=f"account {i}", type="cash", initial_balance=0) for i in range(5)]
+    categories = [Category(user_id=1, name=f"category {i}", type="expense") for i in range(20)]
+    db.add_all(accounts + categories)
+    db.commit()
+
+    rng = random.Random(0)
+    rows = ((i, {
+        "account_id": rng.choice(accounts).id, "category_id": rng.choice(categories).id,
+        "type": rng.choice(("income", "expense")), "amount": rng.randint(100, 100000) / 100, "currency": "CNY",
+        "transaction_date": f"{rng.randint(2015, 2024)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}"
+    }) for i in range(count))
+    crud.import_transactions(db, user_id=1, rows=rows, chunk_size=5000)
+
+    from sqlalchemy import func, select
+    from models.models import Transaction
+    month = func.strftime("%Y-%m", Transaction.transaction_date)
+    raw_query = select(
+        month, Transaction.type, Transaction.currency, Transaction.category_id,
+        func.sum(Transaction.amount), func.count()
+    ).where(Transaction.user_id == 1).group_by(month, Transaction.type, Transaction.currency, Transaction.category_id)
+
+    rollup_rows = len(crud.get_monthly_report(db, user_id=1, group_by=["category"]))
+    assert rollup_rows == len(db.execute(raw_query).all())
+    print(f"{count} 笔交易，报表 {rollup_rows} 行")
+    report("直接汇总 transactions", measure(lambda: db.execute(raw_query).all(), repeat=10, warmup=1))
+    report("get_monthly_report", measure(lambda: crud.get_monthly_report(db, user_id=1, group_by=["category"]), repeat=200))
+    report("get_monthly_report 最近一年", measure(
+        lambda: crud.get_monthly_report(db, user_id=1, start_month="2024-01", end_month="2024-12"), repeat=200
+    ))
+    db.close()
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:2]))
@@ -0,0 +1,80 @@
+"""
+交易全文搜索基准：transactions_fts 与 LIKE '%词%' 的耗时对比
+
+写入带中文标题和备注的交易数据（默认 100 万笔），分别用 search_transactions
+和直接 LIKE 查询搜索常见词、少见词、多个词和一两个字的短词，同时报告包含全文索引维护的写入耗时。
+
+    python -m benchmarks.search_benchmark [交易笔数]
+"""
+import random
+import sys
+import time
+from datetime import datetime
+from benchmarks.common import use_temp_workdir, measure, report
+
+WORDS = [
+    "早餐", "午餐", "晚餐", "咖啡", "超市", "地铁", "打车", "房租", "水电费", "电影票", "书店", "健身房",
+    "话费", "医院", "药店", "外卖", "水果", "理发", "快递", "加油", "停车费", "火锅", "奶茶", "Starbucks coffee",
+]
+PLACES = ["公司楼下", "家附近", "商场", "机场", "学校门口", "老地方", "朋友推荐的店"]
+# 少见词：(词, 出现概率)
+RARE_WORDS = [("演唱会门票", 0.002), ("宠物医院", 0.001), ("结婚礼金", 0.0001)]
+
+
+def main(count: int = 1000000) -> None:
+    use_temp_workdir()
+    from sqlalchemy import insert, or_, text
+    from database.database import SessionLocal, engine
+    from database.migrations import init_db
+    from models.models import User, Account, Transaction
+
+    init_db(engine)
+    db = SessionLocal()
+    db.add(User(username="bench", email="bench@example.com", password_hash="x"))
+    db.flush()
+    account = Account(user_id=1, name="account", type="cash", initial_balance=0)
+    db.add(account)
+    db.commit()
+
+    rng = random.Random(0)
+
+    def title():
+        for word, probability in RARE_WORDS:
+            if rng.random() < probability:
+                return word
+        return f"{rng.choice(WORDS)}{rng.choice(('', '', '和' + rng.choice(WORDS)))}"
+
+    start = time.perf_counter()
+    for offset in range(0, count, 10000):
+        db.execute(insert(Transaction), [{
+            "user_id": 1, "account_id": account.id, "type": "expense", "amount": rng.randint(100, 10000) / 100,
+            "currency": "CNY", "transaction_date": datetime(rng.randint(2015, 2024), rng.randint(1, 12), rng.randint(1, 28)),
+            "title": title(),
+            "notes": f"在{rng.choice(PLACES)}" if rng.random() < 0.5 else None
+        } for _ in range(min(10000, count - offset))])
+    db.commit()
+    print(f"{count} 笔交易，写入耗时 {time.perf_counter() - start:.1f} s（含全文索引）")
+    index_pages = db.execute(text("SELECT count(*) FROM transactions_fts_data")).scalar()
+    print(f"全文索引 {index_pages} 个数据块")
+
+    from crud import crud
+
+    def like(q):
+        query = db.query(Transaction).filter(Transaction.user_id == 1)
+        for term in q.split():
+            query = query.filter(or_(Transaction.title.like(f"%{term}%"), Transaction.notes.like(f"%{term}%")))
+        return query.order_by(Transaction.transaction_date.desc()).limit(50).all()
+
+    for q in ("水电费", "starbucks", "演唱会门票", "结婚礼金", "朋友推荐 火锅", "咖啡", "电"):
+        hits = len(crud.search_transactions(db, user_id=1, q=q, limit=count))
+        print(f"「{q}」命中 {hits} 笔")
+        report("  LIKE", measure(lambda: like(q), repeat=5, warmup=1))
+        report("  search_transactions 相关度", measure(lambda: crud.search_transactions(db, user_id=1, q=q), repeat=5, warmup=1))
+        report("  search_transactions 日期", measure(
+            lambda: crud.search_transactions(db, user_id=1, q=q, sort="date"), repeat=5, warmup=1
+        ))
+    db.close()
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:2]))
@@ -0,0 +1,53 @@
+"""
+列表序列化基准：ORM + response_model 与 FAST_SERIALIZATION 快速路径的耗时对比
+
+分别写入 100、1000、10000 笔交易到三个项目，测量 GET /transactions?limit=N 和
+GET /projects/{id}/transactions 在两种序列化方式下的耗时，并检查两者输出的 JSON 完全一致。
+
+    python -m benchmarks.serialization_benchmark
+"""
+from benchmarks.common import use_temp_workdir, measure, report
+
+SIZES = (100, 1000, 10000)
+
+
+def main() -> None:
+    use_temp_workdir()
+    from fastapi.testclient import TestClient
+    from app.main import app
+    from config.config import settings
+    from database.database import SessionLocal
+    from crud.crud import import_transactions
+    from models.models import Account, Project
+
+    with TestClient(app) as client:
+        client.post("/auth/register/", json={"username": "bench", "email": "bench@example.com", "password": "bench"})
+        token = client.post("/auth/token/", data={"username": "bench", "password": "bench"}).json()["access_token"]
+        headers = {"Authorization": f"Bearer {token}"}
+
+        db = SessionLocal()
+        db.add(Account(user_id=1, name="account", type="cash", initial_balance=0, current_balance=0))
+        db.add_all([Project(user_id=1, name=f"project {size}") for size in SIZES])
+        db.commit()
+        for project_id, size in enumerate(SIZES, start=1):
+            rows = ((i, {"account_id": 1, "project_id": project_id, "type": ("income", "expense")[i % 2],
+                         "title": f"交易 {i}", "amount": f"{i % 1000}.{i % 100:02d}", "currency": "CNY",
+                         "transaction_date": f"2024-{i % 12 + 1:02d}-{i % 28 + 1:02d}T12:00:00",
+                         "notes": "备注" if i % 3 else ""}) for i in range(size))
+            import_transactions(db, user_id=1, rows=rows)
+        db.close()
+
+        for project_id, size in enumerate(SIZES, start=1):
+            repeat = max(10, 20000 // size)
+            for label, url in ((f"GET /transactions ({size})", f"/transactions?limit={size}"),
+                               (f"GET /projects/{{id}}/transactions ({size})", f"/projects/{project_id}/transactions")):
+                settings.fast_serialization = False
+                expected = client.get(url, headers=headers).content
+                report(f"{label} orm", measure(lambda: client.get(url, headers=headers), repeat=repeat, warmup=3))
+                settings.fast_serialization = True
+                assert client.get(url, headers=headers).content == expected, f"{label} 输出不一致"
+                report(f"{label} fast", measure(lambda: client.get(url, headers=headers), repeat=repeat, warmup=3))
+
+
+if __name__ == "__main__":
+    main()
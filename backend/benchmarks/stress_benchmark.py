@@ -0,0 +1,124 @@
+"""
+多 worker 压力测试：多个 uvicorn worker 同时读写同一个 SQLite 数据库
+
+依次以不同的 worker 数和 DATABASE_PROFILE 启动 uvicorn（每次使用新的临时数据库），
+在固定时长内并发执行读（GET /transactions）和写（POST /transactions），
+统计吞吐量、失败请求数，以及服务端日志中 database is locked 和连接池耗尽的次数。
+
+    python -m benchmarks.stress_benchmark [--seconds 10] [--concurrency 32] [--write-ratio 0.2]
+"""
+import argparse
+import asyncio
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from benchmarks.common import BACKEND_DIR
+
+CONFIGS = [
+    (1, "default"),
+    (4, "default"),
+    (4, "production"),
+]
+
+
+def _free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _start_server(workers: int, profile: str, workdir: str, port: int) -> subprocess.Popen:
+    env = {**os.environ, "DATABASE_PROFILE": profile, "PASSWORD_WORKERS": "1", "PYTHONPATH": BACKEND_DIR}
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--app-dir", BACKEND_DIR,
+         "--port", str(port), "--workers", str(workers), "--log-level", "warning"],
+        cwd=workdir, env=env, stdout=subprocess.DEVNULL, stderr=open(os.path.join(workdir, "server.log"), "w")
+    )
+
+
+async def _wait_ready(client, timeout: float = 60) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            if (await client.get("/health")).status_code == 200:
+                return
+        except Exception:
+            pass
+        await asyncio.sleep(0.2)
+    raise RuntimeError("uvicorn 未能启动")
+
+
+async def _load(base_url: str, seconds: float, concurrency: int, write_ratio: float):
+    import httpx
+
+    limits = httpx.Limits(max_connections=concurrency)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=60) as client:
+        await _wait_ready(client)
+        await client.post("/auth/register/", json={"username": "bench", "email": "bench@example.com", "password": "bench"})
+        token = (await client.post("/auth/token/", data={"username": "bench", "password": "bench"})).json()["access_token"]
+        headers = {"Authorization": f"Bearer {token}"}
+        account = (await client.post("/accounts", json={"name": "bench", "type": "cash"}, headers=headers)).json()
+
+        counts = {"read": 0, "write": 0, "error": 0}
+        deadline = time.monotonic() + seconds
+
+        async def worker(seed: int):
+            rng = random.Random(seed)
+            while time.monotonic() < deadline:
+                try:
+                    if rng.random() < write_ratio:
+                        kind = "write"
+                        response = await client.post("/transactions", headers=headers, json={
+                            "account_id": account["id"], "type": "expense", "amount": rng.randint(1, 100),
+                            "currency": "CNY", "transaction_date": "2024-06-01T12:00:00"
+                        })
+                    else:
+                        kind = "read"
+                        response = await client.get("/transactions?limit=50", headers=headers)
+                    counts[kind if response.status_code == 200 else "error"] += 1
+                except httpx.HTTPError:
+                    counts["error"] += 1
+
+        start = time.monotonic()
+        await asyncio.gather(*(worker(i) for i in range(concurrency)))
+        counts["elapsed"] = time.monotonic() - start
+    return counts
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--write-ratio", type=float, default=0.2)
+    args = parser.parse_args()
+
+    baseline = None
+    for workers, profile in CONFIGS:
+        workdir = tempfile.mkdtemp(prefix="monika-stress-")
+        port = _free_port()
+        server = _start_server(workers, profile, workdir, port)
+        try:
+            counts = asyncio.run(_load(f"http://127.0.0.1:{port}", args.seconds, args.concurrency, args.write_ratio))
+        finally:
+            server.terminate()
+            server.wait()
+        with open(os.path.join(workdir, "server.log")) as log:
+            server_log = log.read()
+        locked = server_log.count("database is locked")
+        pool_exhausted = server_log.count("QueuePool limit")
+
+        throughput = (counts["read"] + counts["write"]) / counts["elapsed"]
+        baseline = baseline or throughput
+        print(
+            f"workers={workers} {profile:<10} {throughput:8.1f} req/s ({throughput / baseline:4.2f}x)   "
+            f"读 {counts['read']:6d}   写 {counts['write']:6d}   失败 {counts['error']:5d}   "
+            f"database is locked {locked:4d}   连接池耗尽 {pool_exhausted:4d}"
+        )
+
+
+if __name__ == "__main__":
+    main()
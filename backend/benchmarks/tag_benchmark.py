@@ -0,0 +1,66 @@
+"""
+标签筛选和标签统计基准
+
+写入交易数据，其中常用标签约 30% 的交易带有、少用标签约 1% 的交易带有，
+测试按标签筛选的第一页和翻页后的游标分页，以及 GET /tags/stats 的单次分组查询。
+
+    python -m benchmarks.tag_benchmark [交易笔数]
+"""
+import random
+import sys
+from benchmarks.common import use_temp_workdir, measure, report
+
+
+def main(count: int = 100000) -> None:
+    use_temp_workdir()
+    from database.database import SessionLocal, engine
+    from database.migrations import init_db
+    from models.models import User, Account
+    from crud import crud
+
+    init_db(engine)
+    db = SessionLocal()
+    db.add(User(username="bench", email="bench@example.com", password_hash="x"))
+    db.flush()
+    account = Account(user_id=1, name="account", type="cash", initial_balance=0)
+    db.add(account)
+    db.commit()
+
+    rng = random.Random(0)
+
+    def tags():
+        names = [f"tag {rng.randint(0, 49)}"]
+        if rng.random() < 0.3:
+            names.append("common")
+        if rng.random() < 0.01:
+            names.append("rare")
+        return names
+
+    rows = ((i, {
+        "account_id": account.id, "type": rng.choice(("income", "expense")), "amount": rng.randint(100, 100000) / 100,
+        "currency": "CNY", "transaction_date": f"{rng.randint(2015, 2024)}-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}",
+        "tags": tags()
+    }) for i in range(count))
+    crud.import_transactions(db, user_id=1, rows=rows, chunk_size=5000)
+    print(f"{count} 笔交易")
+
+    def deep_page(tags, match):
+        _, cursor = crud.get_transactions_page(db, user_id=1, after="", limit=1000, tags=tags, match=match)
+        return crud.get_transactions_page(db, user_id=1, after=cursor, limit=50, tags=tags, match=match)
+
+    for label, tags, match in (
+        ("common", ["common"], "any"),
+        ("rare", ["rare"], "any"),
+        ("common 或 rare", ["common", "rare"], "any"),
+        ("common 且 tag 0", ["common", "tag 0"], "all"),
+    ):
+        report(f"{label} 第一页", measure(
+            lambda: crud.get_transactions_page(db, user_id=1, after="", limit=50, tags=tags, match=match), repeat=50, warmup=2
+        ))
+        report(f"{label} 第 1000 条之后", measure(lambda: deep_page(tags, match), repeat=20, warmup=2))
+    report("get_tag_stats", measure(lambda: crud.get_tag_stats(db, user_id=1), repeat=20, warmup=2))
+    db.close()
+
+
+if __name__ == "__main__":
+    main(*(int(arg) for arg in sys.argv[1:2]))
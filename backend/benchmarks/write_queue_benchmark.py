@@ -0,0 +1,84 @@
+"""
+写入合并基准：并发 POST /transactions 时开启和关闭 WRITE_BATCHING 的写入吞吐量
+
+每种配置在独立子进程中运行，使用新的临时数据库。
+
+    python -m benchmarks.write_queue_benchmark [--requests 2000] [--concurrency 64]
+"""
+import argparse
+import asyncio
+import os
+import subprocess
+import sys
+import time
+from benchmarks.common import BACKEND_DIR, use_temp_workdir
+
+CONFIGS = [
+    ("default", "false"),
+    ("default", "true"),
+    ("production", "false"),
+    ("production", "true"),
+]
+
+
+async def _run(requests: int, concurrency: int) -> None:
+    import httpx
+    from app.main import app
+    from database.write_queue import write_queue
+
+    # 服务端异常按 500 计入失败，不中断压测
+    transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        await client.post("/auth/register/", json={"username": "bench", "email": "bench@example.com", "password": "bench"})
+        token = (await client.post("/auth/token/", data={"username": "bench", "password": "bench"})).json()["access_token"]
+        headers = {"Authorization": f"Bearer {token}"}
+        account = (await client.post("/accounts", json={"name": "bench", "type": "cash"}, headers=headers)).json()
+
+        remaining = iter(range(requests))
+        errors = 0
+
+        async def worker():
+            nonlocal errors
+            for i in remaining:
+                response = await client.post("/transactions", headers=headers, json={
+                    "account_id": account["id"], "type": "expense", "amount": i % 100 + 1,
+                    "currency": "CNY", "transaction_date": "2024-06-01T12:00:00"
+                })
+                errors += response.status_code != 200
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+        balance = (await client.get(f"/accounts/{account['id']}/balance", headers=headers)).json()
+
+    write_queue.shutdown()
+    metrics = write_queue.get_metrics()
+    profile, batching = os.environ["DATABASE_PROFILE"], os.environ["WRITE_BATCHING"]
+    print(
+        f"{profile:<10} batching={batching:<5} {requests / elapsed:8.1f} writes/s   失败 {errors:4d}   "
+        f"平均批大小 {metrics['mean_batch_size']:6.2f}   余额 {balance['balance']}"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--single", action="store_true", help="只按当前环境变量运行一次（内部使用）")
+    args = parser.parse_args()
+
+    if not args.single:
+        for profile, batching in CONFIGS:
+            subprocess.run(
+                [sys.executable, "-m", "benchmarks.write_queue_benchmark", "--single",
+                 "--requests", str(args.requests), "--concurrency", str(args.concurrency)],
+                cwd=BACKEND_DIR, env={**os.environ, "DATABASE_PROFILE": profile, "WRITE_BATCHING": batching}, check=True
+            )
+        return
+
+    use_temp_workdir()
+    asyncio.run(_run(args.requests, args.concurrency))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,57 @@
+"""
+应用配置
+
+从环境变量（以及 backend 目录下的 .env 文件）读取，变量名为字段名的大写形式，
+例如 DATABASE_MODE=async。
+"""
+from typing import Literal, Optional
+from pydantic import Field
+from pydantic_settings import BaseSettings, SettingsConfigDict
+
+
+class Settings(BaseSettings):
+    model_config = SettingsConfigDict(env_file=".env", extra="ignore")
+
+    # 数据库连接地址，相对路径相对于进程工作目录
+    database_url: str = "sqlite:///./monika.db"
+
+    # SQLite 连接参数档位：default 只开启外键约束；production 额外启用 WAL、
+    # synchronous=NORMAL、busy_timeout、mmap 和页缓存，支持多个 uvicorn worker 并发读写
+    database_profile: Literal["default", "production"] = "default"
+    sqlite_busy_timeout_ms: int = Field(default=5000, ge=0)
+    sqlite_mmap_size: int = Field(default=256 * 1024 * 1024, ge=0)
+    sqlite_cache_size_kb: int = Field(default=64 * 1024, ge=0)
+
+    # 连接池大小，未设置时使用档位的默认值
+    database_pool_size: Optional[int] = Field(default=None, ge=1)
+    database_max_overflow: Optional[int] = Field(default=None, ge=0)
+
+    # 数据库访问模式：sync 使用同步 Session（在线程池中执行），
+    # async 使用 aiosqlite + AsyncSession（在事件循环中执行）
+    database_mode: Literal["sync", "async"] = "sync"
+
+    # 写入合并：开启后交易、账户、分类、项目、预算和标签的新增、修改、删除交给单独的写线程，
+    # 最多等待 WRITE_BATCH_WINDOW_MS 或凑满 WRITE_BATCH_MAX_SIZE 个操作后一次提交
+    write_batching: bool = False
+    write_batch_window_ms: float = Field(default=5, ge=0)
+    write_batch_max_size: int = Field(default=64, ge=1)
+
+    # 快速序列化：交易列表接口直接查询列值，经缓存的 TypeAdapter 序列化为 JSON，
+    # 不构建 ORM 对象和 Pydantic 模型实例，输出与 response_model 一致
+    fast_serialization: bool = False
+
+    # 透视汇总的交易列缓存：所有用户的 NumPy 列合计不超过该字节数，超出时淘汰最久未使用的用户
+    pivot_cache_max_bytes: int = Field(default=64 * 1024 * 1024, ge=0)
+
+    # 汇率表：CSV 文件每行为 date,currency,rate，rate 为 1 单位 currency 折合多少基准币种；
+    # 未设置路径时使用 backend/data/fx_rates.csv，汇总接口据此把金额换算为用户的默认币种
+    fx_rates_path: Optional[str] = None
+    fx_base_currency: str = Field(default="CNY", min_length=3, max_length=3)
+
+    # bcrypt 密码哈希进程池：工作进程数，以及进程全忙时允许排队的请求数，
+    # 超出后直接返回 429
+    password_workers: int = Field(default=2, ge=1)
+    password_queue_size: int = Field(default=16, ge=0)
+
+
+settings = Settings()
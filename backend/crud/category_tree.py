@@ -0,0 +1,141 @@
+"""
+分类树缓存
+
+用户可见的分类（系统预设分类加用户自己的分类）很少变化，却在汇总、预算等查询中
+反复需要按层级展开。这里把每个用户的分类树缓存在进程内，预先计算好每个分类的
+祖先链和子孙集合，查询时 O(1) 取用。
+
+分类增删改时由 crud 调用 invalidate_category_tree 清除缓存；缓存还记录加载时
+categories 的数据版本号，命中前与数据库中的版本号比对，多 worker 部署时其他进程的
+写入也会在下一次请求时生效。系统预设分类没有用户的版本号，其变化最多在
+CATEGORY_TREE_TTL_SECONDS 后生效。
+"""
+import threading
+import time
+from typing import Dict, FrozenSet, Iterable, List, Optional, Tuple
+from sqlalchemy.orm import Session
+from models.models import Category, DataVersion
+
+# 0 表示不缓存
+CATEGORY_TREE_TTL_SECONDS = 60
+CATEGORY_TREE_MAX_SIZE = 10000
+
+
+class CategoryNode:
+    """缓存的分类信息，不绑定数据库会话"""
+
+    __slots__ = ("id", "user_id", "parent_category_id", "name", "type", "icon_name")
+
+    def __init__(self, id: int, user_id: Optional[int], parent_category_id: Optional[int],
+                 name: str, type: str, icon_name: Optional[str]):
+        self.id = id
+        self.user_id = user_id
+        self.parent_category_id = parent_category_id
+        self.name = name
+        self.type = type
+        self.icon_name = icon_name
+
+
+class CategoryTree:
+    """一个用户可见的分类树
+
+    父分类不可见（已删除或属于其他用户）的分类视为根分类；
+    parent_category_id 形成环时，环上的分类都视为根分类。
+    """
+
+    def __init__(self, nodes: Iterable[CategoryNode]):
+        self.nodes: Dict[int, CategoryNode] = {node.id: node for node in nodes}
+        self.parents: Dict[int, Optional[int]] = {
+            category_id: self._visible_parent(category_id) for category_id in self.nodes
+        }
+        self.children: Dict[Optional[int], List[int]] = {}
+        self._ancestors: Dict[int, Tuple[int, ...]] = {}
+        descendants: Dict[int, set] = {category_id: {category_id} for category_id in self.nodes}
+
+        for category_id in sorted(self.nodes):
+            ancestors = []
+            parent_id = self.parents[category_id]
+            while parent_id is not None:
+                ancestors.append(parent_id)
+                descendants[parent_id].add(category_id)
+                parent_id = self.parents[parent_id]
+            self._ancestors[category_id] = tuple(ancestors)
+            self.children.setdefault(self.parents[category_id], []).append(category_id)
+
+        self._descendants: Dict[int, FrozenSet[int]] = {
+            category_id: frozenset(ids) for category_id, ids in descendants.items()
+        }
+
+    def _visible_parent(self, category_id: int) -> Optional[int]:
+        parent_id = self.nodes[category_id].parent_category_id
+        seen = set()
+        current = parent_id
+        while current in self.nodes and current not in seen:
+            if current == category_id:
+                return None
+            seen.add(current)
+            current = self.nodes[current].parent_category_id
+        return parent_id if parent_id in self.nodes else None
+
+    def __contains__(self, category_id: int) -> bool:
+        return category_id in self.nodes
+
+    @property
+    def roots(self) -> List[int]:
+        return self.children.get(None, [])
+
+    def ancestors(self, category_id: int) -> Tuple[int, ...]:
+        """从父分类到根分类的 id，不包含自身"""
+        return self._ancestors.get(category_id, ())
+
+    def subtree(self, category_id: int) -> FrozenSet[int]:
+        """自身及所有子孙分类的 id，分类不可见时为空"""
+        return self._descendants.get(category_id, frozenset())
+
+
+_trees: Dict[int, Tuple[float, int, CategoryTree]] = {}
+_trees_lock = threading.Lock()
+
+
+def load_category_tree(db: Session, user_id: int) -> CategoryTree:
+    rows = db.query(
+        Category.id, Category.user_id, Category.parent_category_id, Category.name, Category.type, Category.icon_name
+    ).filter((Category.user_id == user_id) | (Category.user_id.is_(None)))
+    return CategoryTree(CategoryNode(*row) for row in rows)
+
+
+def _categories_version(db: Session, user_id: int) -> int:
+    return db.query(DataVersion.version).filter(
+        DataVersion.user_id == user_id, DataVersion.resource == "categories"
+    ).scalar() or 0
+
+
+def get_category_tree(db: Session, user_id: int) -> CategoryTree:
+    """获取用户的分类树，缓存未命中、过期或数据版本号变化时查询一次 categories
+
+    版本号必须在加载分类之前读取，两者之间发生写入时缓存的是旧版本号，下次请求会重新加载。
+    """
+    if CATEGORY_TREE_TTL_SECONDS <= 0:
+        return load_category_tree(db, user_id)
+
+    version = _categories_version(db, user_id)
+    with _trees_lock:
+        entry = _trees.get(user_id)
+        if entry is not None and entry[0] >= time.monotonic() and entry[1] == version:
+            return entry[2]
+
+    tree = load_category_tree(db, user_id)
+    with _trees_lock:
+        if len(_trees) >= CATEGORY_TREE_MAX_SIZE:
+            _trees.clear()
+        _trees[user_id] = (time.monotonic() + CATEGORY_TREE_TTL_SECONDS, version, tree)
+    return tree
+
+
+def invalidate_category_tree(user_id: Optional[int] = None) -> None:
+    """清除用户的分类树缓存，user_id 为空时清除全部（系统预设分类变化时）"""
+    with _trees_lock:
+        if user_id is None:
+            _trees.clear()
+        else:
+            _trees.pop(user_id, None)
@@ -1,13 +1,60 @@
+from sqlalchemy import Integer, and_, bindparam, case, func, insert, or_, select, text, type_coerce
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
 from sqlalchemy.orm import Session
-from typing import List, Optional
-from models.models import User, Account, Project, Category, Transaction, Tag, Budget
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+from pydantic import ValidationError
+from collections import defaultdict
+from itertools import accumulate
+from datetime import date, datetime, time, timedelta
+import numpy as np
+from models.models import (
+    User, Account, Project, Category, Transaction, TransactionTag, Tag, Budget, MonthlyRollup, DataVersion,
+    TRANSACTION_BIGRAM_FILL, transactions_fts, transactions_fts_bigram
+)
 from schemas.schemas import (
     UserCreate, UserUpdate, AccountCreate, AccountUpdate,
     ProjectCreate, ProjectUpdate, CategoryCreate, CategoryUpdate,
     TransactionCreate, TransactionUpdate, TagCreate, TagUpdate,
-    BudgetCreate, BudgetUpdate
+    BudgetCreate, BudgetUpdate, TransactionFilter, Transaction as TransactionSchema
 )
-from auth.auth import get_password_hash
+from auth.auth import get_password_hash, invalidate_user_cache
+from crud.pagination import keyset_page
+from crud.category_tree import get_category_tree, invalidate_category_tree
+from crud.pivot import invalidate_transaction_columns
+from crud.fx import conversion_factors, get_user_currency
+
+
+# Data versions
+# 带 ETag 的接口依赖的资源。标签与交易的关联和标签名计入 transactions，重命名、删除标签时递增；
+# 新建的标签没有关联任何交易，不改变已缓存的响应，预算没有带 ETag 的接口，两者的写入不递增版本号
+DATA_RESOURCES = ("transactions", "accounts", "projects", "categories")
+
+
+def _bump_data_versions(db: Session, user_id: int, *resources: str) -> None:
+    """在当前事务中递增资源的数据版本号，与数据修改一起提交
+
+    版本号不小于当前毫秒时间戳，数据库重建后也不会与客户端缓存的旧 ETag 重合。
+    交易写入时同时清除该用户的透视汇总列缓存。
+    """
+    statement = sqlite_insert(DataVersion).values([
+        {"user_id": user_id, "resource": resource, "version": int(datetime.now().timestamp() * 1000)}
+        for resource in resources
+    ])
+    db.execute(statement.on_conflict_do_update(
+        index_elements=[DataVersion.user_id, DataVersion.resource],
+        set_={"version": func.max(DataVersion.version + 1, statement.excluded.version)}
+    ))
+    if "transactions" in resources:
+        invalidate_transaction_columns(user_id)
+
+
+def get_data_versions(db: Session, user_id: int, resources: Iterable[str]) -> List[int]:
+    """按 resources 的顺序返回数据版本号，从未写入过的资源为 0"""
+    resources = list(resources)
+    versions = dict(db.query(DataVersion.resource, DataVersion.version).filter(
+        DataVersion.user_id == user_id, DataVersion.resource.in_(resources)
+    ).all())
+    return [versions.get(resource, 0) for resource in resources]
 
 
 # User CRUD
@@ -23,8 +70,9 @@ def get_user_by_username(db: Session, username: str) -> Optional[User]:
     return db.query(User).filter(User.username == username).first()
 
 
-def create_user(db: Session, user: UserCreate) -> User:
-    hashed_password = get_password_hash(user.password)
+def create_user(db: Session, user: UserCreate, hashed_password: Optional[str] = None) -> User:
+    if hashed_password is None:
+        hashed_password = get_password_hash(user.password)
     db_user = User(
         username=user.username,
         email=user.email,
@@ -40,17 +88,24 @@ def create_user(db: Session, user: UserCreate) -> User:
 def update_user(db: Session, user_id: int, user_update: UserUpdate) -> Optional[User]:
     db_user = get_user(db, user_id)
     if db_user:
+        old_username = db_user.username
         update_data = user_update.dict(exclude_unset=True)
         for field, value in update_data.items():
             setattr(db_user, field, value)
         db.commit()
         db.refresh(db_user)
+        invalidate_user_cache(old_username, db_user.username)
     return db_user
 
 
 # Account CRUD
 def get_accounts(db: Session, user_id: int, skip: int = 0, limit: int = 100) -> List[Account]:
-    return db.query(Account).filter(Account.user_id == user_id).offset(skip).limit(limit).all()
+    return db.query(Account).filter(Account.user_id == user_id).order_by(Account.id).offset(skip).limit(limit).all()
+
+
+def get_accounts_page(db: Session, user_id: int, after: Optional[str] = None, limit: int = 100) -> Tuple[List[Account], Optional[str]]:
+    query = db.query(Account).filter(Account.user_id == user_id)
+    return keyset_page(query, [Account.id], after, limit)
 
 
 def get_account(db: Session, account_id: int, user_id: int) -> Optional[Account]:
@@ -59,7 +114,9 @@ def get_account(db: Session, account_id: int, user_id: int) -> Optional[Account]
 
 def create_account(db: Session, account: AccountCreate, user_id: int) -> Account:
     db_account = Account(**account.dict(), user_id=user_id)
+    db_account.current_balance = db_account.initial_balance
     db.add(db_account)
+    _bump_data_versions(db, user_id, "accounts")
     db.commit()
     db.refresh(db_account)
     return db_account
@@ -69,8 +126,19 @@ def update_account(db: Session, account_id: int, user_id: int, account_update: A
     db_account = get_account(db, account_id, user_id)
     if db_account:
         update_data = account_update.dict(exclude_unset=True)
+        initial_balance = update_data.pop("initial_balance", None)
         for field, value in update_data.items():
             setattr(db_account, field, value)
+        # 初始余额变化时在 SQL 中同步调整当前余额，不覆盖并发交易写入的余额变化
+        if initial_balance is not None:
+            db.query(Account).filter(
+                Account.id == account_id,
+                Account.user_id == user_id
+            ).update({
+                Account.current_balance: Account.current_balance + initial_balance - Account.initial_balance,
+                Account.initial_balance: initial_balance
+            }, synchronize_session=False)
+        _bump_data_versions(db, user_id, "accounts")
         db.commit()
         db.refresh(db_account)
     return db_account
@@ -80,14 +148,97 @@ def delete_account(db: Session, account_id: int, user_id: int) -> bool:
     db_account = get_account(db, account_id, user_id)
     if db_account:
         db.delete(db_account)
+        _bump_data_versions(db, user_id, "accounts", "transactions")
         db.commit()
         return True
     return False
 
 
+def get_account_balance(db: Session, account_id: int, user_id: int) -> Optional[float]:
+    """读取物化的当前余额，不需要汇总交易"""
+    balance = db.query(Account.current_balance).filter(
+        Account.id == account_id, Account.user_id == user_id
+    ).scalar()
+    return None if balance is None else float(balance)
+
+
+def get_account_balances(db: Session, user_id: int) -> List[dict]:
+    """按账户汇总收支，余额取物化的 current_balance"""
+    rows = db.query(
+        Account.id,
+        Account.name,
+        Account.type,
+        Account.initial_balance,
+        Account.current_balance,
+        Account.is_active,
+        Transaction.type,
+        func.sum(Transaction.amount)
+    ).outerjoin(
+        Transaction,
+        and_(Transaction.user_id == user_id, Transaction.account_id == Account.id)
+    ).filter(Account.user_id == user_id).group_by(
+        Account.id, Transaction.type
+    ).order_by(Account.id).all()
+
+    balances = {}
+    for account_id, name, account_type, initial_balance, current_balance, is_active, type_, total in rows:
+        item = balances.setdefault(account_id, {
+            "account_id": account_id,
+            "name": name,
+            "type": account_type,
+            "is_active": is_active,
+            "initial_balance": float(initial_balance or 0),
+            "balance": float(current_balance or 0),
+            "total_income": 0.0,
+            "total_expense": 0.0
+        })
+        if type_ == "income":
+            item["total_income"] = float(total or 0)
+        elif type_ == "expense":
+            item["total_expense"] = float(total or 0)
+    return list(balances.values())
+
+
+def recompute_balances(db: Session, user_id: Optional[int] = None, fix: bool = True) -> List[dict]:
+    """从交易记录重新计算账户余额，返回与物化余额不一致的账户
+
+    fix 为 True 时同时修正这些账户的 current_balance。
+    """
+    net = func.coalesce(func.sum(case(
+        (Transaction.type == "income", Transaction.amount),
+        (Transaction.type == "expense", -Transaction.amount),
+        else_=0
+    )), 0)
+    query = db.query(Account, net).outerjoin(
+        Transaction,
+        and_(Transaction.user_id == Account.user_id, Transaction.account_id == Account.id)
+    ).group_by(Account.id)
+    if user_id is not None:
+        query = query.filter(Account.user_id == user_id)
+
+    drifted = []
+    for account, total in query.all():
+        expected = round(float(account.initial_balance or 0) + float(total), 2)
+        stored = float(account.current_balance or 0)
+        if abs(expected - stored) >= 0.005:
+            drifted.append({"account_id": account.id, "user_id": account.user_id, "stored": stored, "expected": expected})
+            if fix:
+                account.current_balance = expected
+    if fix and drifted:
+        for drifted_user_id in {item["user_id"] for item in drifted}:
+            _bump_data_versions(db, drifted_user_id, "accounts")
+        db.commit()
+    return drifted
+
+
 # Project CRUD
 def get_projects(db: Session, user_id: int, skip: int = 0, limit: int = 100) -> List[Project]:
-    return db.query(Project).filter(Project.user_id == user_id).offset(skip).limit(limit).all()
+    return db.query(Project).filter(Project.user_id == user_id).order_by(Project.id).offset(skip).limit(limit).all()
+
+
+def get_projects_page(db: Session, user_id: int, after: Optional[str] = None, limit: int = 100) -> Tuple[List[Project], Optional[str]]:
+    query = db.query(Project).filter(Project.user_id == user_id)
+    return keyset_page(query, [Project.id], after, limit)
 
 
 def get_project(db: Session, project_id: int, user_id: int) -> Optional[Project]:
@@ -97,6 +248,7 @@ def get_project(db: Session, project_id: int, user_id: int) -> Optional[Project]
 def create_project(db: Session, project: ProjectCreate, user_id: int) -> Project:
     db_project = Project(**project.dict(), user_id=user_id)
     db.add(db_project)
+    _bump_data_versions(db, user_id, "projects")
     db.commit()
     db.refresh(db_project)
     return db_project
@@ -108,6 +260,7 @@ def update_project(db: Session, project_id: int, user_id: int, project_update: P
         update_data = project_update.dict(exclude_unset=True)
         for field, value in update_data.items():
             setattr(db_project, field, value)
+        _bump_data_versions(db, user_id, "projects")
         db.commit()
         db.refresh(db_project)
     return db_project
@@ -116,17 +269,158 @@ def update_project(db: Session, project_id: int, user_id: int, project_update: P
 def delete_project(db: Session, project_id: int, user_id: int) -> bool:
     db_project = get_project(db, project_id, user_id)
     if db_project:
+        db.query(Transaction).filter(
+            Transaction.user_id == user_id, Transaction.project_id == project_id
+        ).update({Transaction.project_id: None}, synchronize_session=False)
+        _move_rollups_to_none(db, user_id, "project_id", project_id)
         db.delete(db_project)
+        _bump_data_versions(db, user_id, "projects", "transactions")
         db.commit()
         return True
     return False
 
 
+def _transaction_date_range(start_date: Optional[date], end_date: Optional[date]) -> list:
+    """日期筛选条件，end_date 当天也包含在内"""
+    conditions = []
+    if start_date is not None:
+        conditions.append(Transaction.transaction_date >= datetime.combine(start_date, time.min))
+    if end_date is not None:
+        conditions.append(Transaction.transaction_date < datetime.combine(end_date + timedelta(days=1), time.min))
+    return conditions
+
+
+def _transaction_filter_conditions(db: Session, user_id: int, filters: Optional[TransactionFilter]) -> list:
+    """TransactionFilter 对应的筛选条件（不含 user_id），列表、统计和导出共用
+
+    每个条件都是对 transactions 单列的等值或范围比较，与 user_id 一起命中复合索引；
+    包含子分类时从分类树缓存取得子孙分类 id，展开为 IN 条件。
+    """
+    if filters is None:
+        return []
+    conditions = _transaction_date_range(filters.start_date, filters.end_date)
+    if filters.account_id is not None:
+        conditions.append(Transaction.account_id == filters.account_id)
+    if filters.category_id is not None:
+        if filters.include_subcategories:
+            category_ids = sorted(get_category_tree(db, user_id).subtree(filters.category_id))
+            conditions.append(Transaction.category_id.in_(category_ids))
+        else:
+            conditions.append(Transaction.category_id == filters.category_id)
+    if filters.project_id is not None:
+        conditions.append(Transaction.project_id == filters.project_id)
+    if filters.type is not None:
+        conditions.append(Transaction.type == filters.type)
+    if filters.currency is not None:
+        conditions.append(Transaction.currency == filters.currency)
+    if filters.min_amount is not None:
+        conditions.append(Transaction.amount >= filters.min_amount)
+    if filters.max_amount is not None:
+        conditions.append(Transaction.amount <= filters.max_amount)
+    return conditions
+
+
+def _foreign_currencies(db: Session, user_id: int, currency: str) -> List[str]:
+    """用户交易中 currency 以外的币种，读取很小的月度汇总表"""
+    return [code for code, in db.query(MonthlyRollup.currency).filter(
+        MonthlyRollup.user_id == user_id, MonthlyRollup.currency != currency
+    ).distinct()]
+
+
+def _currency_adjustments(
+    db: Session, user_id: int, currency: str, keys: list, conditions: list, joins: Sequence[tuple] = ()
+) -> Dict[tuple, float]:
+    """外币交易换算为 currency 后与原金额之差，按 keys 分组：{keys 取值: 差额}
+
+    汇总查询照常把各币种金额直接相加，再加上这里的差额。外币交易经 (user_id, currency, type, ...)
+    覆盖索引读取，按币种、日期和 keys 分组后整个结果集一次换算，耗时只与外币交易的数量有关；
+    用户没有外币交易时不查询 transactions。分组以币种和日期开头，避免 SQLite 为了按 keys
+    的顺序分组而选用其他索引。
+    """
+    foreign = _foreign_currencies(db, user_id, currency)
+    if not foreign:
+        return {}
+    day = func.date(Transaction.transaction_date)
+    query = select(Transaction.currency, day, type_coerce(func.sum(Transaction.amount), Integer), *keys).select_from(Transaction)
+    for target, onclause in joins:
+        query = query.join(target, onclause)
+    # 使用 Core 查询并直接读取整数分，外币交易较多时分组数可达数万
+    rows = db.connection().execute(query.where(
+        Transaction.user_id == user_id, Transaction.currency.in_(foreign), *conditions
+    ).group_by(Transaction.currency, day, *keys)).all()
+    if not rows:
+        return {}
+    currencies, days, totals = list(zip(*rows))[:3]
+    deltas = np.array(totals, dtype=np.float64) * (conversion_factors(currencies, days, currency) - 1) / 100
+    adjustments = defaultdict(float)
+    for row, delta in zip(rows, deltas.tolist()):
+        adjustments[tuple(row[3:])] += delta
+    return adjustments
+
+
+def get_project_stats(
+    db: Session,
+    user_id: int,
+    project_ids: Optional[Iterable[int]] = None,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    filters: Optional[TransactionFilter] = None,
+    currency: Optional[str] = None
+) -> List[dict]:
+    """一次 GROUP BY project_id, type 查询出所有项目的收支统计，没有交易的项目统计为 0
+
+    筛选条件放在外连接中，不满足条件的项目同样统计为 0。金额换算为 currency（默认为用户的默认币种）。
+    """
+    currency = currency or get_user_currency(db, user_id)
+    project_ids = None if project_ids is None else list(project_ids)
+    conditions = [*_transaction_date_range(start_date, end_date), *_transaction_filter_conditions(db, user_id, filters)]
+    query = db.query(
+        Project.id,
+        Project.name,
+        Transaction.type,
+        func.sum(Transaction.amount),
+        func.count(Transaction.id)
+    ).outerjoin(
+        Transaction,
+        and_(
+            Transaction.user_id == user_id,
+            Transaction.project_id == Project.id,
+            *conditions
+        )
+    ).filter(Project.user_id == user_id)
+    if project_ids is not None:
+        query = query.filter(Project.id.in_(project_ids))
+    adjustments = _currency_adjustments(db, user_id, currency, [Transaction.project_id, Transaction.type], [
+        *([] if project_ids is None else [Transaction.project_id.in_(project_ids)]), *conditions
+    ])
+
+    stats = {}
+    for project_id, name, type_, total, count in query.group_by(Project.id, Project.name, Transaction.type).all():
+        item = stats.setdefault(project_id, {
+            "project_id": project_id,
+            "name": name,
+            "total_income": 0.0,
+            "total_expense": 0.0,
+            "net_amount": 0.0,
+            "transaction_count": 0
+        })
+        total = round(float(total or 0) + adjustments.get((project_id, type_), 0.0), 2)
+        if type_ == "income":
+            item["total_income"] = total
+        elif type_ == "expense":
+            item["total_expense"] = total
+        item["transaction_count"] += count
+
+    for item in stats.values():
+        item["net_amount"] = round(item["total_income"] - item["total_expense"], 2)
+    return list(stats.values())
+
+
 # Category CRUD
 def get_categories(db: Session, user_id: int, skip: int = 0, limit: int = 100) -> List[Category]:
     return db.query(Category).filter(
         (Category.user_id == user_id) | (Category.user_id.is_(None))
-    ).offset(skip).limit(limit).all()
+    ).order_by(Category.id).offset(skip).limit(limit).all()
 
 
 def get_category(db: Session, category_id: int, user_id: int) -> Optional[Category]:
@@ -139,7 +433,9 @@ def get_category(db: Session, category_id: int, user_id: int) -> Optional[Catego
 def create_category(db: Session, category: CategoryCreate, user_id: int) -> Category:
     db_category = Category(**category.dict(), user_id=user_id)
     db.add(db_category)
+    _bump_data_versions(db, user_id, "categories")
     db.commit()
+    invalidate_category_tree(user_id)
     db.refresh(db_category)
     return db_category
 
@@ -152,7 +448,9 @@ def update_category(db: Session, category_id: int, user_id: int, category_update
         update_data = category_update.dict(exclude_unset=True)
         for field, value in update_data.items():
             setattr(db_category, field, value)
+        _bump_data_versions(db, user_id, "categories")
         db.commit()
+        invalidate_category_tree(user_id)
         db.refresh(db_category)
     return db_category
 
@@ -162,37 +460,709 @@ def delete_category(db: Session, category_id: int, user_id: int) -> bool:
         Category.id == category_id, Category.user_id == user_id
     ).first()
     if db_category:
+        db.query(Transaction).filter(
+            Transaction.user_id == user_id, Transaction.category_id == category_id
+        ).update({Transaction.category_id: None}, synchronize_session=False)
+        db.query(Budget).filter(
+            Budget.user_id == user_id, Budget.category_id == category_id
+        ).update({Budget.category_id: None}, synchronize_session=False)
+        _move_rollups_to_none(db, user_id, "category_id", category_id)
+        # 子分类挂到被删除分类的父分类下
+        db.query(Category).filter(
+            Category.user_id == user_id, Category.parent_category_id == category_id
+        ).update({Category.parent_category_id: db_category.parent_category_id}, synchronize_session=False)
         db.delete(db_category)
+        _bump_data_versions(db, user_id, "transactions", "categories")
         db.commit()
+        invalidate_category_tree(user_id)
         return True
     return False
 
 
+def get_category_tree_nodes(
+    db: Session,
+    user_id: int,
+    with_totals: bool = False,
+    start_month: Optional[str] = None,
+    end_month: Optional[str] = None,
+    currency: Optional[str] = None
+) -> List[dict]:
+    """按层级返回用户可见的分类，每个节点的 children 为子分类
+
+    with_totals 时用一次分组查询从 monthly_rollups 读取每个分类自身的收支，再累加到
+    所有祖先分类：income、expense、transaction_count 包含整个子树。收支换算为 currency
+    （默认为用户的默认币种）。
+    """
+    tree = get_category_tree(db, user_id)
+    totals = defaultdict(lambda: {"income": 0.0, "expense": 0.0, "transaction_count": 0})
+    if with_totals:
+        currency = currency or get_user_currency(db, user_id)
+        table = MonthlyRollup.__table__
+        query = select(
+            table.c.category_id, table.c.type, func.sum(table.c.total), func.sum(table.c.transaction_count)
+        ).where(table.c.user_id == user_id, table.c.category_id != 0)
+        if start_month:
+            query = query.where(table.c.month >= start_month)
+        if end_month:
+            query = query.where(table.c.month <= end_month)
+        first_day = date.fromisoformat(f"{start_month}-01") if start_month else None
+        last_day = _shift_period("monthly", date.fromisoformat(f"{end_month}-01"), 1) - timedelta(days=1) if end_month else None
+        adjustments = _currency_adjustments(
+            db, user_id, currency, [Transaction.category_id, Transaction.type], _transaction_date_range(first_day, last_day)
+        )
+        for category_id, type, total, count in db.execute(query.group_by(table.c.category_id, table.c.type)):
+            if category_id not in tree:
+                continue
+            total = float(total or 0) + adjustments.get((category_id, type), 0.0)
+            for target in (category_id, *tree.ancestors(category_id)):
+                totals[target][type] = totals[target].get(type, 0.0) + total
+                totals[target]["transaction_count"] += count
+
+    def build(category_id: int) -> dict:
+        node = tree.nodes[category_id]
+        item = {
+            "id": node.id,
+            "user_id": node.user_id,
+            "parent_category_id": tree.parents[category_id],
+            "name": node.name,
+            "type": node.type,
+            "icon_name": node.icon_name,
+            "children": [build(child_id) for child_id in tree.children.get(category_id, [])]
+        }
+        if with_totals:
+            item.update(
+                income=round(totals[category_id]["income"], 2),
+                expense=round(totals[category_id]["expense"], 2),
+                transaction_count=totals[category_id]["transaction_count"]
+            )
+        return item
+
+    return [build(category_id) for category_id in tree.roots]
+
+
 # Transaction CRUD
-def get_transactions(db: Session, user_id: int, skip: int = 0, limit: int = 100) -> List[Transaction]:
-    return db.query(Transaction).filter(Transaction.user_id == user_id).offset(skip).limit(limit).all()
+TAG_MATCH_MODES = ("any", "all")
+
+
+def _tag_condition(user_id: int, tags: Iterable[str], match: str = "any"):
+    """按标签名筛选交易的条件：any 为带有任一标签，all 为带有全部标签
+
+    子查询从 tags 的 user_id 索引出发，经 transaction_tags(tag_id, transaction_id)
+    索引取得交易 id，不扫描 transactions；同名标签视为同一个标签。
+    """
+    names = list(dict.fromkeys(tags))
+    transaction_ids = select(TransactionTag.transaction_id).join(Tag, Tag.id == TransactionTag.tag_id).where(
+        Tag.user_id == user_id, Tag.name.in_(names)
+    )
+    if match == "all":
+        transaction_ids = transaction_ids.group_by(TransactionTag.transaction_id).having(
+            func.count(Tag.name.distinct()) == len(names)
+        )
+    return Transaction.id.in_(transaction_ids)
+
+
+# schemas.Transaction 各字段对应的列，用于不构建 ORM 对象和 Pydantic 模型的快速序列化
+TRANSACTION_FIELDS = tuple(TransactionSchema.model_fields)
+TRANSACTION_ROW_COLUMNS = [getattr(Transaction, name) for name in TRANSACTION_FIELDS]
+
+# 交易列表可以展开的关联：account、category、project 与交易一起 LEFT JOIN 查询，
+# tags 按交易 id 分批另行查询，查询次数与行数无关
+TRANSACTION_EXPANSIONS = ("account", "category", "project", "tags")
+_TRANSACTION_JOINS = {
+    "account": (Account, Transaction.account_id),
+    "category": (Category, Transaction.category_id),
+    "project": (Project, Transaction.project_id),
+}
+# 每次查询标签的交易数，与 selectinload 的默认批量相同
+TRANSACTION_TAG_BATCH_SIZE = 500
+
+# 交易列表的排序键，均以 id 作为第二排序键；两者都有 (user_id, 排序键, id) 索引
+TRANSACTION_SORT_COLUMNS = {
+    "transaction_date": Transaction.transaction_date,
+    "amount": Transaction.amount,
+}
+
+
+def _filtered_transactions(
+    db: Session,
+    user_id: int,
+    tags: Optional[Iterable[str]],
+    match: str,
+    columns: Optional[list] = None,
+    filters: Optional[TransactionFilter] = None
+):
+    query = (db.query(*columns) if columns else db.query(Transaction)).filter(
+        Transaction.user_id == user_id, *_transaction_filter_conditions(db, user_id, filters)
+    )
+    if tags:
+        query = query.filter(_tag_condition(user_id, tags, match))
+    return query
+
+
+def _transaction_order(sort: str, order: str) -> list:
+    columns = [TRANSACTION_SORT_COLUMNS[sort], Transaction.id]
+    return [column.desc() for column in columns] if order == "desc" else columns
+
+
+def _transaction_row_query(
+    db: Session,
+    user_id: int,
+    fields: Optional[Sequence[str]],
+    expand: Sequence[str],
+    tags: Optional[Iterable[str]] = None,
+    match: str = "any",
+    filters: Optional[TransactionFilter] = None,
+    sort: str = "transaction_date"
+):
+    """只查询 fields 中的列，以及分页和展开关联需要的 id 和排序键"""
+    names = set(fields or TRANSACTION_FIELDS) | {"id", sort}
+    columns = [column for name, column in zip(TRANSACTION_FIELDS, TRANSACTION_ROW_COLUMNS) if name in names]
+    for name in expand:
+        if name in _TRANSACTION_JOINS:
+            model = _TRANSACTION_JOINS[name][0]
+            columns += [model.id.label(f"{name}__id"), model.name.label(f"{name}__name")]
+
+    query = _filtered_transactions(db, user_id, tags, match, columns, filters)
+    for name in expand:
+        if name in _TRANSACTION_JOINS:
+            model, foreign_key = _TRANSACTION_JOINS[name]
+            query = query.outerjoin(model, model.id == foreign_key)
+    return query
+
+
+def _transaction_tag_names(db: Session, transaction_ids: List[int]) -> Dict[int, List[dict]]:
+    tags_by_transaction: Dict[int, List[dict]] = {}
+    for start in range(0, len(transaction_ids), TRANSACTION_TAG_BATCH_SIZE):
+        rows = db.query(TransactionTag.transaction_id, Tag.id, Tag.name).join(
+            Tag, Tag.id == TransactionTag.tag_id
+        ).filter(TransactionTag.transaction_id.in_(transaction_ids[start:start + TRANSACTION_TAG_BATCH_SIZE]))
+        for transaction_id, tag_id, name in rows:
+            tags_by_transaction.setdefault(transaction_id, []).append({"id": tag_id, "name": name})
+    for tags in tags_by_transaction.values():
+        tags.sort(key=lambda tag: tag["name"])
+    return tags_by_transaction
+
+
+def _transaction_row_dicts(db: Session, rows: list, fields: Optional[Sequence[str]], expand: Sequence[str]) -> List[dict]:
+    """把查询结果转换为字典：字段按 schemas.Transaction 的顺序，展开的关联为 {id, name}"""
+    names = [name for name in TRANSACTION_FIELDS if not fields or name in fields]
+    joined = [name for name in expand if name in _TRANSACTION_JOINS]
+    items = []
+    for row in rows:
+        values = row._asdict()
+        item = {name: values[name] for name in names}
+        for name in joined:
+            related_id = values[f"{name}__id"]
+            item[name] = None if related_id is None else {"id": related_id, "name": values[f"{name}__name"]}
+        items.append(item)
+
+    if "tags" in expand:
+        tags_by_transaction = _transaction_tag_names(db, [row.id for row in rows])
+        for row, item in zip(rows, items):
+            item["tags"] = tags_by_transaction.get(row.id, [])
+    return items
+
+
+def get_transactions(
+    db: Session,
+    user_id: int,
+    skip: int = 0,
+    limit: int = 100,
+    tags: Optional[Iterable[str]] = None,
+    match: str = "any",
+    filters: Optional[TransactionFilter] = None,
+    sort: str = "transaction_date",
+    order: str = "asc"
+) -> List[Transaction]:
+    return _filtered_transactions(db, user_id, tags, match, filters=filters).order_by(
+        *_transaction_order(sort, order)
+    ).offset(skip).limit(limit).all()
+
+
+def get_transactions_page(
+    db: Session,
+    user_id: int,
+    after: Optional[str] = None,
+    limit: int = 100,
+    tags: Optional[Iterable[str]] = None,
+    match: str = "any",
+    filters: Optional[TransactionFilter] = None,
+    sort: str = "transaction_date",
+    order: str = "asc"
+) -> Tuple[List[Transaction], Optional[str]]:
+    """游标分页，游标中记录排序键和 id，翻页时 sort、order 须与首页一致"""
+    query = _filtered_transactions(db, user_id, tags, match, filters=filters)
+    return keyset_page(query, [TRANSACTION_SORT_COLUMNS[sort], Transaction.id], after, limit, order == "desc")
+
+
+def get_transaction_rows(
+    db: Session,
+    user_id: int,
+    skip: int = 0,
+    limit: int = 100,
+    tags: Optional[Iterable[str]] = None,
+    match: str = "any",
+    fields: Optional[Sequence[str]] = None,
+    expand: Sequence[str] = (),
+    filters: Optional[TransactionFilter] = None,
+    sort: str = "transaction_date",
+    order: str = "asc"
+) -> List[dict]:
+    """与 get_transactions 相同，但返回字典
+
+    fields 为空时包含 schemas.Transaction 的全部字段；expand 中的关联按 TRANSACTION_EXPANSIONS 展开。
+    """
+    rows = _transaction_row_query(db, user_id, fields, expand, tags, match, filters, sort).order_by(
+        *_transaction_order(sort, order)
+    ).offset(skip).limit(limit).all()
+    return _transaction_row_dicts(db, rows, fields, expand)
+
+
+def get_transaction_rows_page(
+    db: Session,
+    user_id: int,
+    after: Optional[str] = None,
+    limit: int = 100,
+    tags: Optional[Iterable[str]] = None,
+    match: str = "any",
+    fields: Optional[Sequence[str]] = None,
+    expand: Sequence[str] = (),
+    filters: Optional[TransactionFilter] = None,
+    sort: str = "transaction_date",
+    order: str = "asc"
+) -> Tuple[List[dict], Optional[str]]:
+    """与 get_transactions_page 相同，但返回字典，fields、expand 同 get_transaction_rows"""
+    query = _transaction_row_query(db, user_id, fields, expand, tags, match, filters, sort)
+    rows, next_cursor = keyset_page(query, [TRANSACTION_SORT_COLUMNS[sort], Transaction.id], after, limit, order == "desc")
+    return _transaction_row_dicts(db, rows, fields, expand), next_cursor
+
+
+def get_transaction_stats(
+    db: Session,
+    user_id: int,
+    tags: Optional[Iterable[str]] = None,
+    match: str = "any",
+    filters: Optional[TransactionFilter] = None,
+    currency: Optional[str] = None
+) -> dict:
+    """满足筛选条件的交易笔数和收支合计，金额换算为 currency（默认为用户的默认币种）"""
+    currency = currency or get_user_currency(db, user_id)
+    row = _filtered_transactions(db, user_id, tags, match, [
+        func.count(Transaction.id).label("transaction_count"),
+        func.coalesce(func.sum(case((Transaction.type == "income", Transaction.amount), else_=0)), 0).label("total_income"),
+        func.coalesce(func.sum(case((Transaction.type == "expense", Transaction.amount), else_=0)), 0).label("total_expense")
+    ], filters).one()
+    conditions = _transaction_filter_conditions(db, user_id, filters)
+    if tags:
+        conditions.append(_tag_condition(user_id, tags, match))
+    adjustments = _currency_adjustments(db, user_id, currency, [Transaction.type], conditions)
+    total_income = round(float(row.total_income) + adjustments.get(("income",), 0.0), 2)
+    total_expense = round(float(row.total_expense) + adjustments.get(("expense",), 0.0), 2)
+    return {
+        "transaction_count": row.transaction_count,
+        "total_income": total_income,
+        "total_expense": total_expense,
+        "net_amount": round(total_income - total_expense, 2),
+        "currency": currency
+    }
+
+
+# trigram 分词只能匹配不少于 3 个字符的词，更短的词使用 transactions_fts_bigram
+SEARCH_MIN_TERM_LENGTH = 3
+
+
+def _contains_pattern(term: str) -> str:
+    escaped = term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"%{escaped}%"
+
+
+def _short_term_match(term: str) -> Optional[str]:
+    """短词在 transactions_fts_bigram 中的查询；包含标点等分隔字符的词无法按词条匹配，返回 None"""
+    if not term.isalnum():
+        return None
+    return f'"{term}"' if len(term) == 2 else f'"{term}"*'
+
+
+def _search_matches(table, match: str, sort: str):
+    """全文索引命中的交易 id（及 bm25 相关度），物化为 CTE
+
+    先物化命中的 id 再按主键取交易：耗时只与命中数有关。直接 JOIN 时查询规划器
+    可能改为遍历该用户的全部交易、逐笔查询全文索引。
+    """
+    columns = [table.c.rowid.label("id")]
+    if sort == "relevance":
+        columns.append(table.c.rank.label("rank"))
+    return select(*columns).where(table.c[table.name].op("MATCH")(match)).cte("matches").prefix_with("MATERIALIZED")
+
+
+def search_transactions(
+    db: Session, user_id: int, q: str, skip: int = 0, limit: int = 50, sort: str = "relevance"
+) -> List[Transaction]:
+    """按标题和备注搜索交易，q 中以空白分隔的词都要出现（子串匹配，不区分大小写）
+
+    不少于 3 个字符的词通过 transactions_fts（trigram）索引匹配，更短的词（如两个汉字）在命中的交易中
+    用 LIKE 过滤。全部是短词时通过 transactions_fts_bigram 取得候选交易，同样由 LIKE 确认；
+    短词都包含标点等分隔字符时才退化为用 LIKE 检查该用户的每笔交易。
+    sort 为 relevance 时按 bm25 相关度排序，为 date 时（以及退化为 LIKE 时）按日期倒序。
+    """
+    terms = list(dict.fromkeys(q.split()))
+    if not terms:
+        return []
+    indexed = [term for term in terms if len(term) >= SEARCH_MIN_TERM_LENGTH]
+    short = [term for term in terms if len(term) < SEARCH_MIN_TERM_LENGTH]
+
+    query = db.query(Transaction).filter(Transaction.user_id == user_id)
+    for term in short:
+        pattern = _contains_pattern(term)
+        query = query.filter(or_(
+            Transaction.title.like(pattern, escape="\\"), Transaction.notes.like(pattern, escape="\\")
+        ))
+    order = [Transaction.transaction_date.desc(), Transaction.id.desc()]
+    matches = None
+    if indexed:
+        # 每个词作为带引号的短语，避免 AND、OR、* 等被解析为 FTS5 语法
+        match = " AND ".join('"' + term.replace('"', '""') + '"' for term in indexed)
+        matches = _search_matches(transactions_fts, match, sort)
+    else:
+        short_matches = [match for match in map(_short_term_match, short) if match is not None]
+        if short_matches:
+            # 文本过长、只索引了开头部分的交易总是作为候选
+            matches = _search_matches(transactions_fts_bigram, f"({' AND '.join(short_matches)}) OR overflow", sort)
+    if matches is not None:
+        query = query.join(matches, matches.c.id == Transaction.id)
+        if sort == "relevance":
+            order = [matches.c.rank, Transaction.id]
+    return query.order_by(*order).offset(skip).limit(limit).all()
+
+
+def rebuild_transaction_search(db: Session) -> None:
+    """从 transactions 重建全文索引和短词索引并合并索引段"""
+    db.execute(insert(transactions_fts).values(transactions_fts="rebuild"))
+    db.execute(insert(transactions_fts).values(transactions_fts="optimize"))
+    db.execute(insert(transactions_fts_bigram).values(transactions_fts_bigram="delete-all"))
+    db.execute(text(TRANSACTION_BIGRAM_FILL))
+    db.execute(insert(transactions_fts_bigram).values(transactions_fts_bigram="optimize"))
+    db.commit()
+
+
+def get_project_transactions(db: Session, project_id: int, user_id: int) -> List[Transaction]:
+    return db.query(Transaction).filter(
+        Transaction.user_id == user_id,
+        Transaction.project_id == project_id
+    ).all()
+
+
+def get_project_transaction_rows(
+    db: Session, project_id: int, user_id: int, fields: Optional[Sequence[str]] = None, expand: Sequence[str] = ()
+) -> List[dict]:
+    """与 get_project_transactions 相同，但返回字典，fields、expand 同 get_transaction_rows"""
+    rows = _transaction_row_query(db, user_id, fields, expand).filter(Transaction.project_id == project_id).all()
+    return _transaction_row_dicts(db, rows, fields, expand)
+
+
+EXPORT_COLUMNS = [
+    "id", "account_id", "project_id", "category_id", "type", "title", "amount",
+    "currency", "transaction_date", "notes", "created_at", "tags"
+]
+
+
+def iter_transaction_export(
+    db: Session,
+    user_id: int,
+    batch_size: int = 1000,
+    tags: Optional[Iterable[str]] = None,
+    match: str = "any",
+    filters: Optional[TransactionFilter] = None
+) -> Iterator[list]:
+    """按 (transaction_date, id) 顺序分批读取导出用的交易行
+
+    使用服务端游标逐批取数，不构建 ORM 对象，内存占用只与 batch_size 有关。
+    tags 为以 | 分隔的标签名，与导入格式一致。
+    """
+    tag_names = select(func.group_concat(Tag.name, "|")).select_from(TransactionTag).join(
+        Tag, Tag.id == TransactionTag.tag_id
+    ).where(TransactionTag.transaction_id == Transaction.id).scalar_subquery()
+    columns = [getattr(Transaction, name) for name in EXPORT_COLUMNS[:-1]] + [tag_names.label("tags")]
+    conditions = _transaction_filter_conditions(db, user_id, filters)
+    if tags:
+        conditions.append(_tag_condition(user_id, tags, match))
+    statement = select(*columns).where(Transaction.user_id == user_id, *conditions).order_by(
+        Transaction.transaction_date, Transaction.id
+    ).execution_options(stream_results=True, yield_per=batch_size)
+    for partition in db.execute(statement).partitions():
+        yield partition
 
 
 def get_transaction(db: Session, transaction_id: int, user_id: int) -> Optional[Transaction]:
     return db.query(Transaction).filter(Transaction.id == transaction_id, Transaction.user_id == user_id).first()
 
 
+def _signed_amount(type_: str, amount) -> float:
+    """交易对账户余额的影响：收入为正，支出为负"""
+    if type_ == "income":
+        return float(amount)
+    if type_ == "expense":
+        return -float(amount)
+    return 0.0
+
+
+def _transaction_snapshot(db_transaction: Transaction) -> dict:
+    """记录交易中影响派生数据的字段，用于计入或撤销"""
+    return {
+        "account_id": db_transaction.account_id,
+        "project_id": db_transaction.project_id,
+        "category_id": db_transaction.category_id,
+        "type": db_transaction.type,
+        "amount": db_transaction.amount,
+        "currency": db_transaction.currency,
+        "transaction_date": db_transaction.transaction_date
+    }
+
+
+def _rollup_key(row: dict) -> Tuple[str, int, int, int, str, str]:
+    """交易在 monthly_rollups 中对应的键（不含 user_id）"""
+    return (
+        row["transaction_date"].strftime("%Y-%m"),
+        row.get("category_id") or 0,
+        row.get("project_id") or 0,
+        row["account_id"],
+        row["type"],
+        row["currency"],
+    )
+
+
+def _apply_rollup_deltas(db: Session, user_id: int, deltas: Dict[tuple, List[float]]) -> None:
+    """把 {汇总键: [金额变化, 笔数变化]} 合并进 monthly_rollups，笔数减为 0 的行删除"""
+    params = []
+    for (month, category_id, project_id, account_id, type_, currency), (total, count) in deltas.items():
+        if count or round(total, 2):
+            params.append({
+                "user_id": user_id, "month": month, "category_id": category_id, "project_id": project_id,
+                "account_id": account_id, "type": type_, "currency": currency,
+                "total": round(total, 2), "transaction_count": count
+            })
+    if not params:
+        return
+
+    table = MonthlyRollup.__table__
+    stmt = sqlite_insert(table)
+    db.execute(stmt.on_conflict_do_update(
+        index_elements=[column.name for column in table.primary_key],
+        set_={
+            "total": table.c.total + stmt.excluded.total,
+            "transaction_count": table.c.transaction_count + stmt.excluded.transaction_count
+        }
+    ), params)
+
+    emptied = [row for row in params if row["transaction_count"] < 0]
+    if emptied:
+        db.execute(
+            table.delete().where(
+                *(column == bindparam(f"key_{column.name}") for column in table.primary_key),
+                table.c.transaction_count <= 0
+            ),
+            [{f"key_{name}": row[name] for name in table.primary_key.columns.keys()} for row in emptied]
+        )
+
+
+def _move_rollups_to_none(db: Session, user_id: int, column: str, value: int) -> None:
+    """删除项目或分类时其交易的外键被置空，对应的汇总行并入 0（未关联）"""
+    table = MonthlyRollup.__table__
+    deltas = defaultdict(lambda: [0.0, 0])
+    for row in db.execute(select(table).where(table.c.user_id == user_id, table.c[column] == value)).mappings():
+        key = dict(row)
+        for target in (value, 0):
+            key[column] = target
+            sign = -1 if target else 1
+            delta = deltas[(key["month"], key["category_id"], key["project_id"], key["account_id"], key["type"], key["currency"])]
+            delta[0] += sign * float(row["total"])
+            delta[1] += sign * row["transaction_count"]
+    _apply_rollup_deltas(db, user_id, deltas)
+
+
+def _apply_transaction_effects(db: Session, user_id: int, rows: Iterable[dict], sign: int) -> None:
+    """在当前事务中计入（sign=1）或撤销（sign=-1）一批交易对账户余额和月度汇总的影响
+
+    同一账户、同一汇总键的变化先在内存中合并，每个账户只执行一条 UPDATE，
+    月度汇总用一条 upsert 批量写入。
+    """
+    deltas = defaultdict(float)
+    rollup_deltas = defaultdict(lambda: [0.0, 0])
+    for row in rows:
+        deltas[row["account_id"]] += sign * _signed_amount(row["type"], row["amount"])
+        rollup = rollup_deltas[_rollup_key(row)]
+        rollup[0] += sign * float(row["amount"])
+        rollup[1] += sign
+    for account_id, delta in deltas.items():
+        delta = round(delta, 2)
+        if delta:
+            db.query(Account).filter(
+                Account.id == account_id,
+                Account.user_id == user_id
+            ).update({Account.current_balance: Account.current_balance + delta}, synchronize_session=False)
+    _apply_rollup_deltas(db, user_id, rollup_deltas)
+
+
+def _resolve_tags(db: Session, user_id: int, tag_ids: Iterable[int]) -> List[Tag]:
+    return db.query(Tag).filter(Tag.id.in_(list(tag_ids)), Tag.user_id == user_id).all()
+
+
 def create_transaction(db: Session, transaction: TransactionCreate, user_id: int) -> Transaction:
     transaction_data = transaction.dict()
     tag_ids = transaction_data.pop('tag_ids', [])
 
     db_transaction = Transaction(**transaction_data, user_id=user_id)
+    # 标签关联和余额变化与交易在同一次提交中写入
+    if tag_ids:
+        db_transaction.tags = _resolve_tags(db, user_id, tag_ids)
     db.add(db_transaction)
+    _apply_transaction_effects(db, user_id, [_transaction_snapshot(db_transaction)], 1)
+    _bump_data_versions(db, user_id, "transactions", "accounts")
     db.commit()
     db.refresh(db_transaction)
+    return db_transaction
 
-    # 添加标签关联
-    if tag_ids:
-        tags = db.query(Tag).filter(Tag.id.in_(tag_ids), Tag.user_id == user_id).all()
-        db_transaction.tags.extend(tags)
-        db.commit()
 
-    return db_transaction
+def _split_tag_names(value) -> List[str]:
+    """导入数据中的标签名：列表，或以 | 分隔的字符串"""
+    if not value:
+        return []
+    if isinstance(value, str):
+        value = value.split("|")
+    return [str(name).strip() for name in value if str(name).strip()]
+
+
+def _import_chunk(
+    db: Session, user_id: int, chunk: List[Tuple[int, TransactionCreate, List[str]]], tag_ids_by_name: Dict[str, int]
+) -> Dict[str, int]:
+    """批量写入一块已校验的交易，标签名按批解析，整块一次提交
+
+    返回本块新建的标签 {名称: id}；tag_ids_by_name 不在这里修改，提交失败时
+    新建的标签随事务回滚，由调用方在提交成功后再合并。
+    """
+    created = {}
+    missing = {name for _, _, names in chunk for name in names if name not in tag_ids_by_name}
+    if missing:
+        created = {name: tag_id for tag_id, name in db.execute(
+            insert(Tag).returning(Tag.id, Tag.name, sort_by_parameter_order=True),
+            [{"user_id": user_id, "name": name} for name in sorted(missing)]
+        )}
+
+    rows = []
+    for _, item, _ in chunk:
+        row = item.model_dump(exclude={"tag_ids"})
+        row["user_id"] = user_id
+        rows.append(row)
+
+    # 第一行单独插入取回 id；此时本连接已持有 SQLite 的写锁，其余行的 id
+    # 只能顺序分配，直接指定 id 后用 executemany 插入，再据此建立标签关联
+    table = Transaction.__table__
+    first_id = db.execute(insert(table).returning(table.c.id), rows[0]).scalar_one()
+    for offset, row in enumerate(rows[1:], start=1):
+        row["id"] = first_id + offset
+    if len(rows) > 1:
+        db.execute(insert(table), rows[1:])
+
+    links = []
+    for offset, (_, item, names) in enumerate(chunk):
+        tag_ids = set(item.tag_ids or []) | {created.get(name) or tag_ids_by_name[name] for name in names}
+        links.extend({"transaction_id": first_id + offset, "tag_id": tag_id} for tag_id in tag_ids)
+    if links:
+        db.execute(insert(TransactionTag.__table__), links)
+
+    _apply_transaction_effects(db, user_id, rows, 1)
+    _bump_data_versions(db, user_id, "transactions", "accounts")
+    db.commit()
+    return created
+
+
+def import_transactions(
+    db: Session,
+    user_id: int,
+    rows: Iterable[Tuple[int, object]],
+    chunk_size: int = 1000,
+    max_errors: int = 100
+) -> dict:
+    """流式批量导入交易记录
+
+    rows 逐行产出 (行号, 数据字典)，解析失败的行产出 (行号, 异常)。每行用
+    TransactionCreate 校验（包括金额范围）并检查账户、项目、分类和标签归属，校验通过的行按
+    chunk_size 分块批量插入、每块提交一次；内存占用只与块大小有关。整块写入失败时逐行重试，
+    只有写入失败的行计入错误，错误信息不包含数据库的原始报错。
+    tags 字段中的标签名会解析为标签 id，不存在的标签自动创建。
+    错误明细最多返回 max_errors 条。
+    """
+    account_ids = {row[0] for row in db.query(Account.id).filter(Account.user_id == user_id)}
+    project_ids = {row[0] for row in db.query(Project.id).filter(Project.user_id == user_id)}
+    category_ids = {row[0] for row in db.query(Category.id).filter(
+        (Category.user_id == user_id) | (Category.user_id.is_(None))
+    )}
+    tag_ids_by_name = {}
+    for tag_id, name in db.query(Tag.id, Tag.name).filter(Tag.user_id == user_id).order_by(Tag.id.desc()):
+        tag_ids_by_name[name] = tag_id
+    tag_ids = set(tag_ids_by_name.values())
+
+    result = {"imported": 0, "failed": 0, "errors": []}
+
+    def fail(line: int, message: str) -> None:
+        result["failed"] += 1
+        if len(result["errors"]) < max_errors:
+            result["errors"].append({"line": line, "error": message})
+
+    def write(chunk) -> bool:
+        try:
+            created = _import_chunk(db, user_id, chunk, tag_ids_by_name)
+        except Exception:
+            db.rollback()
+            return False
+        tag_ids_by_name.update(created)
+        result["imported"] += len(chunk)
+        return True
+
+    def flush(chunk) -> None:
+        if write(chunk):
+            return
+        if len(chunk) == 1:
+            fail(chunk[0][0], "写入失败")
+            return
+        # 整块失败时逐行重试，只有写入失败的行计入错误
+        for item in chunk:
+            if not write([item]):
+                fail(item[0], "写入失败")
+
+    chunk = []
+    for line, raw in rows:
+        if isinstance(raw, Exception):
+            fail(line, str(raw))
+            continue
+        try:
+            raw = dict(raw)
+            names = _split_tag_names(raw.pop("tags", None))
+            # 银行流水常见只有日期的格式，按当天零点处理
+            transaction_date = raw.get("transaction_date")
+            if isinstance(transaction_date, str) and len(transaction_date) == 10:
+                raw["transaction_date"] = f"{transaction_date}T00:00:00"
+            item = TransactionCreate(**raw)
+        except ValidationError as exc:
+            error = exc.errors()[0]
+            fail(line, f"{'.'.join(str(loc) for loc in error['loc'])}: {error['msg']}")
+            continue
+        if item.account_id not in account_ids:
+            fail(line, "account_id: Account not found")
+        elif item.project_id is not None and item.project_id not in project_ids:
+            fail(line, "project_id: Project not found")
+        elif item.category_id is not None and item.category_id not in category_ids:
+            fail(line, "category_id: Category not found")
+        elif not tag_ids.issuperset(item.tag_ids or []):
+            fail(line, "tag_ids: Tag not found")
+        else:
+            chunk.append((line, item, names))
+            if len(chunk) >= chunk_size:
+                flush(chunk)
+                chunk = []
+    if chunk:
+        flush(chunk)
+    return result
 
 
 def update_transaction(db: Session, transaction_id: int, user_id: int, transaction_update: TransactionUpdate) -> Optional[Transaction]:
@@ -201,16 +1171,19 @@ def update_transaction(db: Session, transaction_id: int, user_id: int, transacti
         update_data = transaction_update.dict(exclude_unset=True)
         tag_ids = update_data.pop('tag_ids', None)
 
+        # 先撤销旧值的影响再计入新值，账户、类型或金额变化都能正确处理
+        _apply_transaction_effects(db, user_id, [_transaction_snapshot(db_transaction)], -1)
         for field, value in update_data.items():
             setattr(db_transaction, field, value)
+        _apply_transaction_effects(db, user_id, [_transaction_snapshot(db_transaction)], 1)
 
         # 更新标签关联
         if tag_ids is not None:
             db_transaction.tags.clear()
             if tag_ids:
-                tags = db.query(Tag).filter(Tag.id.in_(tag_ids), Tag.user_id == user_id).all()
-                db_transaction.tags.extend(tags)
+                db_transaction.tags.extend(_resolve_tags(db, user_id, tag_ids))
 
+        _bump_data_versions(db, user_id, "transactions", "accounts")
         db.commit()
         db.refresh(db_transaction)
     return db_transaction
@@ -219,7 +1192,9 @@ def update_transaction(db: Session, transaction_id: int, user_id: int, transacti
 def delete_transaction(db: Session, transaction_id: int, user_id: int) -> bool:
     db_transaction = get_transaction(db, transaction_id, user_id)
     if db_transaction:
+        _apply_transaction_effects(db, user_id, [_transaction_snapshot(db_transaction)], -1)
         db.delete(db_transaction)
+        _bump_data_versions(db, user_id, "transactions", "accounts")
         db.commit()
         return True
     return False
@@ -227,7 +1202,12 @@ def delete_transaction(db: Session, transaction_id: int, user_id: int) -> bool:
 
 # Tag CRUD
 def get_tags(db: Session, user_id: int, skip: int = 0, limit: int = 100) -> List[Tag]:
-    return db.query(Tag).filter(Tag.user_id == user_id).offset(skip).limit(limit).all()
+    return db.query(Tag).filter(Tag.user_id == user_id).order_by(Tag.id).offset(skip).limit(limit).all()
+
+
+def get_tags_page(db: Session, user_id: int, after: Optional[str] = None, limit: int = 100) -> Tuple[List[Tag], Optional[str]]:
+    query = db.query(Tag).filter(Tag.user_id == user_id)
+    return keyset_page(query, [Tag.id], after, limit)
 
 
 def get_tag(db: Session, tag_id: int, user_id: int) -> Optional[Tag]:
@@ -248,15 +1228,92 @@ def update_tag(db: Session, tag_id: int, user_id: int, tag_update: TagUpdate) ->
         update_data = tag_update.dict(exclude_unset=True)
         for field, value in update_data.items():
             setattr(db_tag, field, value)
+        _bump_data_versions(db, user_id, "transactions")
         db.commit()
         db.refresh(db_tag)
     return db_tag
 
 
+def _tag_stats_query(
+    db: Session, user_id: int, start_date: Optional[date], end_date: Optional[date], filters: Optional[TransactionFilter]
+):
+    """每个标签的交易笔数和收支合计，按标签分组，筛选条件放在外连接中以保留未使用的标签"""
+    return db.query(
+        Tag.id.label("id"),
+        Tag.name.label("name"),
+        func.count(Transaction.id).label("transaction_count"),
+        func.coalesce(func.sum(case((Transaction.type == "income", Transaction.amount), else_=0)), 0).label("total_income"),
+        func.coalesce(func.sum(case((Transaction.type == "expense", Transaction.amount), else_=0)), 0).label("total_expense")
+    ).outerjoin(TransactionTag, TransactionTag.tag_id == Tag.id).outerjoin(
+        Transaction,
+        and_(
+            Transaction.id == TransactionTag.transaction_id,
+            *_transaction_date_range(start_date, end_date),
+            *_transaction_filter_conditions(db, user_id, filters)
+        )
+    ).filter(Tag.user_id == user_id).group_by(Tag.id)
+
+
+def _tag_stats_items(
+    db: Session, user_id: int, rows: list, start_date: Optional[date], end_date: Optional[date],
+    filters: Optional[TransactionFilter], currency: Optional[str]
+) -> List[dict]:
+    """标签统计的行转换为响应，金额换算为 currency（默认为用户的默认币种），只换算本页标签的外币交易"""
+    currency = currency or get_user_currency(db, user_id)
+    adjustments = _currency_adjustments(
+        db, user_id, currency, [TransactionTag.tag_id, Transaction.type], [
+            TransactionTag.tag_id.in_([row.id for row in rows]),
+            *_transaction_date_range(start_date, end_date),
+            *_transaction_filter_conditions(db, user_id, filters)
+        ], joins=[(TransactionTag, TransactionTag.transaction_id == Transaction.id)]
+    ) if rows else {}
+    items = []
+    for row in rows:
+        item = dict(row._mapping)
+        item["total_income"] = round(float(item["total_income"]) + adjustments.get((row.id, "income"), 0.0), 2)
+        item["total_expense"] = round(float(item["total_expense"]) + adjustments.get((row.id, "expense"), 0.0), 2)
+        item["net_amount"] = round(item["total_income"] - item["total_expense"], 2)
+        items.append(item)
+    return items
+
+
+def get_tag_stats(
+    db: Session,
+    user_id: int,
+    skip: int = 0,
+    limit: int = 100,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    filters: Optional[TransactionFilter] = None,
+    currency: Optional[str] = None
+) -> List[dict]:
+    rows = _tag_stats_query(db, user_id, start_date, end_date, filters).order_by(Tag.id).offset(skip).limit(limit).all()
+    return _tag_stats_items(db, user_id, rows, start_date, end_date, filters, currency)
+
+
+def get_tag_stats_page(
+    db: Session,
+    user_id: int,
+    after: Optional[str] = None,
+    limit: int = 100,
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    filters: Optional[TransactionFilter] = None,
+    currency: Optional[str] = None
+) -> Tuple[List[dict], Optional[str]]:
+    """按标签 id 游标分页的标签统计，每页只聚合本页标签的交易"""
+    query = _tag_stats_query(db, user_id, start_date, end_date, filters)
+    rows, next_cursor = keyset_page(query, [Tag.id], after, limit)
+    return _tag_stats_items(db, user_id, rows, start_date, end_date, filters, currency), next_cursor
+
+
 def delete_tag(db: Session, tag_id: int, user_id: int) -> bool:
     db_tag = get_tag(db, tag_id, user_id)
     if db_tag:
+        # 直接删除关联行，避免加载该标签下的全部交易
+        db.query(TransactionTag).filter(TransactionTag.tag_id == tag_id).delete(synchronize_session=False)
         db.delete(db_tag)
+        _bump_data_versions(db, user_id, "transactions")
         db.commit()
         return True
     return False
@@ -264,7 +1321,12 @@ def delete_tag(db: Session, tag_id: int, user_id: int) -> bool:
 
 # Budget CRUD
 def get_budgets(db: Session, user_id: int, skip: int = 0, limit: int = 100) -> List[Budget]:
-    return db.query(Budget).filter(Budget.user_id == user_id).offset(skip).limit(limit).all()
+    return db.query(Budget).filter(Budget.user_id == user_id).order_by(Budget.id).offset(skip).limit(limit).all()
+
+
+def get_budgets_page(db: Session, user_id: int, after: Optional[str] = None, limit: int = 100) -> Tuple[List[Budget], Optional[str]]:
+    query = db.query(Budget).filter(Budget.user_id == user_id)
+    return keyset_page(query, [Budget.id], after, limit)
 
 
 def get_budget(db: Session, budget_id: int, user_id: int) -> Optional[Budget]:
@@ -297,3 +1359,494 @@ def delete_budget(db: Session, budget_id: int, user_id: int) -> bool:
         db.commit()
         return True
     return False
+
+
+BUDGET_PERIODS = ("weekly", "monthly", "yearly")
+
+
+def _period_start(period: str, day: date) -> date:
+    """day 所在周期的第一天：周一、每月 1 日或每年 1 月 1 日"""
+    if period == "weekly":
+        return day - timedelta(days=day.weekday())
+    if period == "monthly":
+        return day.replace(day=1)
+    return day.replace(month=1, day=1)
+
+
+def _shift_period(period: str, start: date, count: int) -> date:
+    """把周期起始日向后（count 为负时向前）移动 count 个周期"""
+    if period == "weekly":
+        return start + timedelta(weeks=count)
+    if period == "monthly":
+        months = start.year * 12 + start.month - 1 + count
+        return date(months // 12, months % 12 + 1, 1)
+    return date(start.year + count, 1, 1)
+
+
+def _period_key(period: str, start: date) -> str:
+    """与 _budget_spending 中 SQL 分组键相同格式的周期标识"""
+    if period == "weekly":
+        return start.isoformat()
+    if period == "monthly":
+        return start.strftime("%Y-%m")
+    return str(start.year)
+
+
+def _budget_spending(
+    db: Session, user_id: int, period: str, first: date, last: date, currency: str
+) -> Dict[str, Dict[int, float]]:
+    """一次分组查询得到 [first, last] 各周期内每个分类的支出：{周期标识: {分类 id: 金额}}
+
+    按月、按年直接读取月度汇总；按周需要精确到日期，读取 transactions。
+    未分类的支出记在分类 0 下。外币支出按交易当天的汇率换算为 currency。
+    """
+    transaction_keys = [{
+        "weekly": func.date(Transaction.transaction_date, "weekday 0", "-6 days"),
+        "monthly": func.strftime("%Y-%m", Transaction.transaction_date),
+        "yearly": func.strftime("%Y", Transaction.transaction_date)
+    }[period], func.coalesce(Transaction.category_id, 0)]
+    conditions = [
+        Transaction.type == "expense",
+        *_transaction_date_range(first, _shift_period(period, last, 1) - timedelta(days=1))
+    ]
+    if period == "weekly":
+        bucket, category = transaction_keys
+        query = db.query(bucket, category, func.sum(Transaction.amount)).filter(Transaction.user_id == user_id, *conditions)
+    else:
+        table = MonthlyRollup.__table__
+        bucket = table.c.month if period == "monthly" else func.substr(table.c.month, 1, 4)
+        category = table.c.category_id
+        query = db.query(bucket, category, func.sum(table.c.total)).filter(
+            table.c.user_id == user_id,
+            table.c.type == "expense",
+            table.c.month >= first.strftime("%Y-%m"),
+            table.c.month <= (last.strftime("%Y-%m") if period == "monthly" else f"{last.year}-12")
+        )
+
+    spending = defaultdict(dict)
+    for key, category_id, total in query.group_by(bucket, category):
+        spending[key][category_id] = float(total or 0)
+    for (key, category_id), delta in _currency_adjustments(db, user_id, currency, transaction_keys, conditions).items():
+        spending[key][category_id] = spending[key].get(category_id, 0.0) + delta
+    return spending
+
+
+def get_budget_progress(
+    db: Session, user_id: int, today: Optional[date] = None, history: int = 12, currency: Optional[str] = None
+) -> List[dict]:
+    """计算每个预算在当前周期和之前 history 个周期内的实际支出
+
+    周期按自然周（周一开始）、自然月、自然年划分，从 start_date 所在周期开始。
+    分类预算包含所有子孙分类的支出，category_id 为空的总预算包含全部支出。
+    每种周期类型只执行一次分组查询，与预算数量无关；不支持的 period 不返回。
+    预算金额以 currency（默认为用户的默认币种）计，支出同样换算为该币种。
+    """
+    today = today or date.today()
+    budgets = db.query(Budget).filter(Budget.user_id == user_id, Budget.period.in_(BUDGET_PERIODS)).order_by(Budget.id).all()
+    if not budgets:
+        return []
+    tree = get_category_tree(db, user_id)
+    currency = currency or get_user_currency(db, user_id)
+
+    # 每个预算需要的周期范围：最多回溯 history 个周期，且不早于 start_date 所在周期
+    ranges = {}
+    for budget in budgets:
+        current = _period_start(budget.period, today)
+        first = max(_period_start(budget.period, budget.start_date), _shift_period(budget.period, current, -history))
+        ranges[budget.id] = (first, current)
+
+    spending = {}
+    for period in BUDGET_PERIODS:
+        periods = [ranges[budget.id] for budget in budgets if budget.period == period and ranges[budget.id][0] <= ranges[budget.id][1]]
+        if periods:
+            spending[period] = _budget_spending(
+                db, user_id, period, min(first for first, _ in periods), max(current for _, current in periods), currency
+            )
+
+    progress = []
+    for budget in budgets:
+        amount = float(budget.amount)
+        category_ids = None if budget.category_id is None else tree.subtree(budget.category_id) or {budget.category_id}
+        first, current = ranges[budget.id]
+        periods = []
+        start = first
+        while start <= current:
+            by_category = spending[budget.period].get(_period_key(budget.period, start), {})
+            if category_ids is None:
+                spent = sum(by_category.values())
+            else:
+                spent = sum(by_category.get(category_id, 0.0) for category_id in category_ids)
+            spent = round(spent, 2)
+            end = _shift_period(budget.period, start, 1)
+            periods.append({
+                "start_date": start,
+                "end_date": end - timedelta(days=1),
+                "spent": spent,
+                "remaining": round(amount - spent, 2),
+                "ratio": round(spent / amount, 4) if amount else None
+            })
+            start = end
+        progress.append({
+            "budget_id": budget.id,
+            "category_id": budget.category_id,
+            "category_ids": sorted(category_ids) if category_ids is not None else None,
+            "period": budget.period,
+            "amount": amount,
+            "current": periods[-1] if periods else None,
+            "periods": periods
+        })
+    return progress
+
+
+# Dashboard
+def get_dashboard_summary(db: Session, user_id: int, recent_limit: int = 5, currency: Optional[str] = None) -> dict:
+    """仪表盘汇总：账户余额、项目净额和最近交易，查询次数与交易数量无关
+
+    总收支和项目统计换算为 currency（默认为用户的默认币种），账户余额按账户原样返回。
+    """
+    currency = currency or get_user_currency(db, user_id)
+    accounts = get_account_balances(db, user_id)
+    projects = sorted(get_project_stats(db, user_id, currency=currency), key=lambda item: item["net_amount"], reverse=True)
+    recent_transactions = db.query(Transaction).filter(Transaction.user_id == user_id).order_by(
+        Transaction.transaction_date.desc(), Transaction.id.desc()
+    ).limit(recent_limit).all()
+
+    # 每笔交易都属于某个账户，总收支可以直接由账户汇总得到，再加上外币交易换算后的差额
+    adjustments = _currency_adjustments(db, user_id, currency, [Transaction.type], [])
+    total_income = round(sum(item["total_income"] for item in accounts) + adjustments.get(("income",), 0.0), 2)
+    total_expense = round(sum(item["total_expense"] for item in accounts) + adjustments.get(("expense",), 0.0), 2)
+    return {
+        "total_income": total_income,
+        "total_expense": total_expense,
+        "net_income": round(total_income - total_expense, 2),
+        "currency": currency,
+        "account_count": len(accounts),
+        "accounts": accounts,
+        "projects": projects,
+        "recent_transactions": recent_transactions
+    }
+
+
+# Reports
+REPORT_GROUP_COLUMNS = {"category": "category_id", "project": "project_id", "account": "account_id"}
+
+
+def _rollup_source(user_id: Optional[int] = None):
+    """直接从 transactions 汇总出的月度数据，列与 monthly_rollups 一一对应"""
+    keys = [
+        Transaction.user_id,
+        func.strftime("%Y-%m", Transaction.transaction_date).label("month"),
+        func.coalesce(Transaction.category_id, 0).label("category_id"),
+        func.coalesce(Transaction.project_id, 0).label("project_id"),
+        Transaction.account_id,
+        Transaction.type,
+        Transaction.currency,
+    ]
+    query = select(
+        *keys,
+        func.sum(Transaction.amount).label("total"),
+        func.count().label("transaction_count")
+    ).group_by(*keys)
+    if user_id is not None:
+        query = query.where(Transaction.user_id == user_id)
+    return query
+
+
+def rebuild_monthly_rollups(db: Session, user_id: Optional[int] = None) -> int:
+    """从交易记录重建月度汇总，返回写入的行数"""
+    table = MonthlyRollup.__table__
+    delete = table.delete()
+    if user_id is not None:
+        delete = delete.where(table.c.user_id == user_id)
+    db.execute(delete)
+    source = _rollup_source(user_id)
+    result = db.execute(insert(table).from_select([column.name for column in source.selected_columns], source))
+    db.commit()
+    return result.rowcount
+
+
+def recompute_monthly_rollups(db: Session, user_id: Optional[int] = None, fix: bool = True) -> List[dict]:
+    """比对月度汇总与交易记录，返回不一致的汇总键
+
+    fix 为 True 时重建存在偏差的用户的汇总。
+    """
+    table = MonthlyRollup.__table__
+    stored_query = select(table)
+    if user_id is not None:
+        stored_query = stored_query.where(table.c.user_id == user_id)
+    key_names = [column.name for column in table.primary_key]
+
+    def by_key(rows) -> Dict[tuple, Tuple[float, int]]:
+        return {
+            tuple(row[name] for name in key_names): (round(float(row["total"] or 0), 2), row["transaction_count"])
+            for row in rows
+        }
+
+    stored = by_key(db.execute(stored_query).mappings())
+    expected = by_key(db.execute(_rollup_source(user_id)).mappings())
+
+    drifted = []
+    for key in sorted(stored.keys() | expected.keys()):
+        stored_total, stored_count = stored.get(key, (0.0, 0))
+        expected_total, expected_count = expected.get(key, (0.0, 0))
+        if stored_count != expected_count or abs(stored_total - expected_total) >= 0.005:
+            drifted.append({
+                **dict(zip(key_names, key)),
+                "stored_total": stored_total, "stored_count": stored_count,
+                "expected_total": expected_total, "expected_count": expected_count
+            })
+    if fix:
+        for drifted_user_id in sorted({item["user_id"] for item in drifted}):
+            rebuild_monthly_rollups(db, drifted_user_id)
+    return drifted
+
+
+def get_monthly_report(
+    db: Session,
+    user_id: int,
+    start_month: Optional[str] = None,
+    end_month: Optional[str] = None,
+    group_by: Iterable[str] = (),
+    account_id: Optional[int] = None,
+    category_id: Optional[int] = None,
+    project_id: Optional[int] = None,
+    type: Optional[str] = None,
+    currency: Optional[str] = None
+) -> List[dict]:
+    """按月汇总收支，只读取 monthly_rollups，耗时与交易数量无关
+
+    每行按 (月份, 类型, 币种) 以及 group_by 中的维度（category/project/account）分组。
+    """
+    table = MonthlyRollup.__table__
+    group_columns = [table.c[REPORT_GROUP_COLUMNS[name]] for name in dict.fromkeys(group_by)]
+    keys = [table.c.month, table.c.type, table.c.currency, *group_columns]
+    query = select(
+        *keys,
+        func.sum(table.c.total).label("total"),
+        func.sum(table.c.transaction_count).label("transaction_count")
+    ).where(table.c.user_id == user_id)
+
+    if start_month:
+        query = query.where(table.c.month >= start_month)
+    if end_month:
+        query = query.where(table.c.month <= end_month)
+    for column, value in (
+        (table.c.account_id, account_id), (table.c.category_id, category_id), (table.c.project_id, project_id),
+        (table.c.type, type), (table.c.currency, currency)
+    ):
+        if value is not None:
+            query = query.where(column == value)
+
+    report = []
+    for row in db.execute(query.group_by(*keys).order_by(*keys)).mappings():
+        item = dict(row)
+        item["total"] = round(float(item["total"] or 0), 2)
+        # 0 表示未关联分类或项目
+        for name in ("category_id", "project_id"):
+            if name in item and not item[name]:
+                item[name] = None
+        report.append(item)
+    return report
+
+
+# Cash flow
+CASHFLOW_BUCKETS = ("day", "week", "month")
+CASHFLOW_SPLITS = {"category": Transaction.category_id, "account": Transaction.account_id}
+# 单次最多返回的周期数，按日约 13 年
+CASHFLOW_MAX_BUCKETS = 5000
+
+
+def _cashflow_bucket_starts(bucket: str, first: date, last: date) -> List[date]:
+    """[first, last] 覆盖的所有周期的起始日，按周以周一开始"""
+    current = first if bucket == "day" else _period_start("weekly" if bucket == "week" else "monthly", first)
+    starts = []
+    while current <= last:
+        if len(starts) >= CASHFLOW_MAX_BUCKETS:
+            raise ValueError(f"Too many buckets (max {CASHFLOW_MAX_BUCKETS})")
+        starts.append(current)
+        if bucket == "day":
+            current += timedelta(days=1)
+        else:
+            current = _shift_period("weekly" if bucket == "week" else "monthly", current, 1)
+    return starts
+
+
+def _cashflow_bucket_key(bucket: str):
+    """交易所在周期的起始日（YYYY-MM-DD），与 _cashflow_bucket_starts 一致"""
+    if bucket == "day":
+        return func.substr(Transaction.transaction_date, 1, 10)
+    if bucket == "week":
+        return func.date(Transaction.transaction_date, "weekday 0", "-6 days")
+    return func.strftime("%Y-%m-01", Transaction.transaction_date)
+
+
+def _cashflow_totals(
+    db: Session, user_id: int, bucket: str, first: date, last: date, split: Optional[str], currency: str
+) -> list:
+    """[first, last] 内每个周期（及分类或账户）的 (周期起始日, 拆分键, 收入, 支出)
+
+    按日、按周在 transactions 的 (user_id, transaction_date, ...) 覆盖索引上分组，不回表；
+    按月时完整月份直接读取 monthly_rollups，只有首尾不完整的月份读取 transactions。
+    外币交易换算为 currency 后的差额作为额外的行返回，同一周期可能有多行。
+    """
+    rows = []
+    if bucket == "month":
+        full_first = first if first.day == 1 else _shift_period("monthly", first.replace(day=1), 1)
+        full_last = _shift_period("monthly", last.replace(day=1), 1) - timedelta(days=1)
+        if full_last != last:
+            full_last = last.replace(day=1) - timedelta(days=1)
+        if full_first <= full_last:
+            table = MonthlyRollup.__table__
+            key = (table.c.month + "-01").label("bucket")
+            split_column = table.c[REPORT_GROUP_COLUMNS[split]] if split else None
+            group = [key] + ([split_column] if split_column is not None else [])
+            query = db.query(
+                *group,
+                func.sum(case((table.c.type == "income", table.c.total), else_=0)),
+                func.sum(case((table.c.type == "expense", table.c.total), else_=0))
+            ).filter(
+                table.c.user_id == user_id,
+                table.c.month >= full_first.strftime("%Y-%m"),
+                table.c.month <= full_last.strftime("%Y-%m")
+            ).group_by(*group)
+            # monthly_rollups 中 0 表示未分类
+            rows += [
+                (row[0], (row[1] or None) if split_column is not None else None, row[-2], row[-1]) for row in query
+            ]
+            ranges = [(first, full_first - timedelta(days=1)), (full_last + timedelta(days=1), last)]
+        else:
+            ranges = [(first, last)]
+    else:
+        ranges = [(first, last)]
+
+    key = _cashflow_bucket_key(bucket)
+    split_column = CASHFLOW_SPLITS[split] if split else None
+    group = [key] + ([split_column] if split_column is not None else [])
+    for range_first, range_last in ranges:
+        if range_first > range_last:
+            continue
+        query = db.query(
+            *group,
+            func.sum(case((Transaction.type == "income", Transaction.amount), else_=0)),
+            func.sum(case((Transaction.type == "expense", Transaction.amount), else_=0))
+        ).filter(Transaction.user_id == user_id, *_transaction_date_range(range_first, range_last)).group_by(*group)
+        rows += [(row[0], row[1] if split_column is not None else None, row[-2], row[-1]) for row in query]
+
+    for (bucket_key, type, *split_key), delta in _currency_adjustments(
+        db, user_id, currency, group[:1] + [Transaction.type] + group[1:], _transaction_date_range(first, last)
+    ).items():
+        rows.append((
+            bucket_key, split_key[0] if split_key else None,
+            delta if type == "income" else 0.0, delta if type == "expense" else 0.0
+        ))
+    return rows
+
+
+def _account_balances_before(db: Session, user_id: int, day: date, currency: str) -> Dict[int, float]:
+    """每个账户在 day 之前（不含当天）的余额：初始余额加上此前所有交易的净额
+
+    整月部分读取 monthly_rollups，day 所在月份的前几天读取 transactions，耗时与交易总数无关。
+    外币交易的净额换算为 currency，初始余额视为 currency。
+    """
+    balances = {
+        account_id: float(initial or 0)
+        for account_id, initial in db.query(Account.id, Account.initial_balance).filter(Account.user_id == user_id)
+    }
+    table = MonthlyRollup.__table__
+    rollup_net = func.sum(case((table.c.type == "income", table.c.total), (table.c.type == "expense", -table.c.total), else_=0))
+    transaction_net = func.sum(case(
+        (Transaction.type == "income", Transaction.amount), (Transaction.type == "expense", -Transaction.amount), else_=0
+    ))
+    month_start = day.replace(day=1)
+    rows = list(db.query(table.c.account_id, rollup_net).filter(
+        table.c.user_id == user_id, table.c.month < month_start.strftime("%Y-%m")
+    ).group_by(table.c.account_id))
+    if day > month_start:
+        rows += db.query(Transaction.account_id, transaction_net).filter(
+            Transaction.user_id == user_id, *_transaction_date_range(month_start, day - timedelta(days=1))
+        ).group_by(Transaction.account_id).all()
+    for account_id, net in rows:
+        balances[account_id] = balances.get(account_id, 0.0) + float(net or 0)
+    for (account_id, type), delta in _currency_adjustments(
+        db, user_id, currency, [Transaction.account_id, Transaction.type], _transaction_date_range(None, day - timedelta(days=1))
+    ).items():
+        if type in ("income", "expense"):
+            balances[account_id] = balances.get(account_id, 0.0) + (delta if type == "income" else -delta)
+    return balances
+
+
+def _cashflow_arrays(income: List[float], expense: List[float], opening: Optional[float]) -> dict:
+    # 拆分后大部分周期为 0，跳过这些值的 round
+    income = [round(value, 2) if value else 0.0 for value in income]
+    expense = [round(value, 2) if value else 0.0 for value in expense]
+    net = [round(a - b, 2) if a or b else 0.0 for a, b in zip(income, expense)]
+    arrays = {"income": income, "expense": expense, "net": net}
+    if opening is not None:
+        arrays["balance"] = [round(value, 2) for value in accumulate(net, initial=opening)][1:]
+    return arrays
+
+
+def get_cashflow(
+    db: Session,
+    user_id: int,
+    bucket: str = "month",
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    split: Optional[str] = None,
+    currency: Optional[str] = None
+) -> dict:
+    """按日、周或月汇总 [start_date, end_date] 内的收支，返回按周期对齐的平行数组
+
+    聚合在 SQL 中按 (周期[, 分类或账户]) 分组完成，Python 只按周期下标填入数组，没有交易的周期补 0。
+    金额和余额换算为 currency（默认为用户的默认币种）。
+    balance 为所有账户余额之和在每个周期末的值（期初余额加累计净额）；按账户拆分时
+    每个账户也有自己的 balance，按分类拆分时分类没有余额。
+    start_date 默认为最早一笔交易的日期，end_date 默认为今天；周期数超过
+    CASHFLOW_MAX_BUCKETS 时抛出 ValueError。
+    """
+    currency = currency or get_user_currency(db, user_id)
+    end_date = end_date or date.today()
+    if start_date is None:
+        earliest = db.query(func.min(Transaction.transaction_date)).filter(Transaction.user_id == user_id).scalar()
+        start_date = min(earliest.date(), end_date) if earliest else end_date
+    starts = _cashflow_bucket_starts(bucket, start_date, end_date)
+    index = {start.isoformat(): position for position, start in enumerate(starts)}
+
+    size = len(starts)
+    income = [0.0] * size
+    expense = [0.0] * size
+    split_totals: Dict[Optional[int], Tuple[List[float], List[float]]] = {}
+    for bucket_key, split_id, bucket_income, bucket_expense in _cashflow_totals(
+        db, user_id, bucket, start_date, end_date, split, currency
+    ):
+        position = index[bucket_key]
+        income[position] += bucket_income
+        expense[position] += bucket_expense
+        if split:
+            series = split_totals.get(split_id)
+            if series is None:
+                series = split_totals[split_id] = ([0.0] * size, [0.0] * size)
+            series[0][position] += bucket_income
+            series[1][position] += bucket_expense
+
+    balances = _account_balances_before(db, user_id, start_date, currency)
+    report = {
+        "bucket": bucket,
+        "currency": currency,
+        "buckets": starts,
+        **_cashflow_arrays(income, expense, sum(balances.values())),
+        "series": []
+    }
+    if split == "account":
+        names = dict(db.query(Account.id, Account.name).filter(Account.user_id == user_id))
+    elif split == "category":
+        names = {category_id: node.name for category_id, node in get_category_tree(db, user_id).nodes.items()}
+    for split_id in sorted(split_totals, key=lambda value: (value is None, value or 0)):
+        series_income, series_expense = split_totals[split_id]
+        opening = balances.get(split_id, 0.0) if split == "account" else None
+        report["series"].append({
+            "id": split_id,
+            "name": names.get(split_id),
+            **_cashflow_arrays(series_income, series_expense, opening)
+        })
+    return report
@@ -0,0 +1,158 @@
+"""
+汇率表
+
+多币种汇总把交易金额按交易当天的汇率换算为用户的默认币种。汇率来自本地 CSV 文件
+（settings.fx_rates_path，默认为 backend/data/fx_rates.csv），不需要联网；每行为
+date,currency,rate，即该日 1 单位 currency 折合多少单位 settings.fx_base_currency，
+基准币种本身恒为 1。某日没有报价时使用此前最近一次的报价，早于第一次报价时使用第一次报价。
+
+文件在首次使用时读入，每个币种一组按日期排序的 NumPy 数组，文件修改后在下一次使用时重新读入。
+查到的 (币种, 日期) 汇率记入 memo；换算整个结果集时每个币种的日期先去重，memo 中没有的
+日期用 searchsorted 一次查出，再按下标展开到每一行，不逐行查找。
+"""
+import csv
+import os
+import threading
+from collections import defaultdict
+from datetime import date
+from pathlib import Path
+from typing import Dict, Optional, Sequence, Tuple
+import numpy as np
+from sqlalchemy.orm import Session
+from config.config import settings
+from models.models import User
+
+DEFAULT_FX_RATES_PATH = Path(__file__).resolve().parent.parent / "data" / "fx_rates.csv"
+
+
+class MissingExchangeRate(ValueError):
+    """汇率表中没有该币种的报价"""
+
+    def __init__(self, currency: str):
+        super().__init__(f"No exchange rate for {currency}")
+        self.currency = currency
+
+
+def _day_number(value: date) -> int:
+    return value.toordinal() - date(1970, 1, 1).toordinal()
+
+
+class FxRates:
+    """一份汇率表：每个币种按日期排序的日期序号（距 1970-01-01 的天数）和汇率
+
+    version 由文件的修改时间和大小生成，各 worker 读到的同一份文件版本相同，可用于 ETag。
+    """
+
+    def __init__(self, base: str, quotes: Dict[str, Tuple[np.ndarray, np.ndarray]], path: Optional[Path] = None, version: str = ""):
+        self.base = base
+        self.quotes = quotes
+        self.path = path
+        self.version = version
+        self._memo: Dict[str, Dict[int, float]] = {}
+
+    def __contains__(self, currency: str) -> bool:
+        return currency == self.base or currency in self.quotes
+
+    def _lookup(self, currency: str, days: np.ndarray) -> np.ndarray:
+        """去重后的日期序号当天生效的汇率，查到的结果记入 memo"""
+        if currency == self.base:
+            return np.ones(len(days))
+        if currency not in self.quotes:
+            raise MissingExchangeRate(currency)
+        memo = self._memo.setdefault(currency, {})
+        rates = np.array([memo.get(day, np.nan) for day in days.tolist()], dtype=np.float64)
+        missing = np.isnan(rates)
+        if missing.any():
+            quote_days, quote_rates = self.quotes[currency]
+            positions = np.searchsorted(quote_days, days[missing], side="right") - 1
+            rates[missing] = quote_rates[np.maximum(positions, 0)]
+            memo.update(zip(days[missing].tolist(), rates[missing].tolist()))
+        return rates
+
+    def rate(self, currency: str, day: date) -> float:
+        """day 当天 1 单位 currency 折合的基准币种"""
+        return float(self._lookup(currency, np.array([_day_number(day)], dtype=np.int64))[0])
+
+    def rates(self, codes: Sequence[str], index: np.ndarray, days: np.ndarray) -> np.ndarray:
+        """每行折合基准币种的汇率：第 i 行的币种为 codes[index[i]]，日期序号为 days[i]"""
+        days = np.asarray(days, dtype=np.int64)
+        result = np.ones(len(days), dtype=np.float64)
+        for position, currency in enumerate(codes):
+            if currency == self.base:
+                continue
+            rows = index == position
+            if not rows.any():
+                continue
+            unique_days, inverse = np.unique(days[rows], return_inverse=True)
+            result[rows] = self._lookup(currency, unique_days)[inverse.reshape(-1)]
+        return result
+
+    def factors(self, codes: Sequence[str], index: np.ndarray, days: np.ndarray, target: str) -> np.ndarray:
+        """每行金额换算为 target 币种的倍数，币种已是 target 的行为 1"""
+        days = np.asarray(days, dtype=np.int64)
+        factors = np.ones(len(days), dtype=np.float64)
+        foreign = np.asarray(index) != (list(codes).index(target) if target in codes else -1)
+        if not foreign.any():
+            return factors
+        days = days[foreign]
+        factors[foreign] = self.rates(codes, np.asarray(index)[foreign], days) / self.rates(
+            (target,), np.zeros(len(days), dtype=np.int64), days
+        )
+        return factors
+
+
+def load_fx_rates(path: Path, base: str, version: str = "") -> FxRates:
+    """读取汇率文件，同一币种同一日期重复出现时以最后一行为准"""
+    quotes = defaultdict(dict)
+    with open(path, newline="", encoding="utf-8") as file:
+        reader = csv.DictReader(file)
+        for row in reader:
+            try:
+                day = _day_number(date.fromisoformat(row["date"].strip()))
+                rate = float(row["rate"])
+            except (KeyError, AttributeError, ValueError):
+                raise ValueError(f"{path}:{reader.line_num}: invalid exchange rate row")
+            if not rate > 0:
+                raise ValueError(f"{path}:{reader.line_num}: exchange rate must be positive")
+            currency = (row["currency"] or "").strip().upper()
+            if len(currency) != 3 or not currency.isalpha():
+                raise ValueError(f"{path}:{reader.line_num}: currency must be a 3-letter code")
+            quotes[currency][day] = rate
+    return FxRates(base, {
+        currency: (np.array(sorted(by_day), dtype=np.int64), np.array([by_day[day] for day in sorted(by_day)], dtype=np.float64))
+        for currency, by_day in quotes.items()
+    }, path, version)
+
+
+_rates: Optional[FxRates] = None
+_rates_lock = threading.Lock()
+
+
+def get_fx_rates() -> FxRates:
+    """当前的汇率表，文件不存在时只有基准币种"""
+    global _rates
+    path = Path(settings.fx_rates_path) if settings.fx_rates_path else DEFAULT_FX_RATES_PATH
+    try:
+        stat = os.stat(path)
+        version = f"{stat.st_mtime_ns:x}.{stat.st_size:x}"
+    except FileNotFoundError:
+        version = ""
+    rates = _rates
+    if rates is None or (rates.path, rates.version, rates.base) != (path, version, settings.fx_base_currency):
+        with _rates_lock:
+            rates = _rates
+            if rates is None or (rates.path, rates.version, rates.base) != (path, version, settings.fx_base_currency):
+                rates = load_fx_rates(path, settings.fx_base_currency, version) if version else FxRates(settings.fx_base_currency, {}, path)
+                _rates = rates
+    return rates
+
+
+def conversion_factors(currencies: Sequence[str], days: Sequence, target: str) -> np.ndarray:
+    """查询结果集每行金额换算为 target 币种的倍数，days 为日期或 ISO 格式的日期字符串"""
+    codes, index = np.unique(np.array(currencies, dtype=str), return_inverse=True)
+    days = np.array(days, dtype="datetime64[D]").astype(np.int64)
+    return get_fx_rates().factors(codes.tolist(), index.reshape(-1), days, target)
+
+
+def get_user_currency(db: Session, user_id: int) -> str:
+    return db.query(User.default_currency).filter(User.id == user_id).scalar()
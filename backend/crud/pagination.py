@@ -0,0 +1,74 @@
+import base64
+import json
+from datetime import datetime
+from typing import Any, List, Optional, Sequence, Tuple
+from sqlalchemy import DateTime, and_, or_
+from sqlalchemy.orm import Query
+from models.models import MAX_AMOUNT, Money
+
+
+class InvalidCursor(ValueError):
+    """游标字符串格式不正确"""
+
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    """把排序键编码为不透明的游标字符串"""
+    payload = [v.isoformat() if isinstance(v, datetime) else v for v in values]
+    raw = json.dumps(payload, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, columns: Sequence[Any]) -> List[Any]:
+    """解析游标字符串，格式不正确时抛出 InvalidCursor"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = json.loads(raw)
+    except (ValueError, TypeError):
+        raise InvalidCursor("Invalid cursor")
+    if not isinstance(values, list) or len(values) != len(columns):
+        raise InvalidCursor("Invalid cursor")
+
+    decoded = []
+    for column, value in zip(columns, values):
+        if isinstance(column.type, DateTime):
+            if not isinstance(value, str):
+                raise InvalidCursor("Invalid cursor")
+            value = datetime.fromisoformat(value)
+        elif isinstance(column.type, Money):
+            if isinstance(value, bool) or not isinstance(value, (int, float)) or not abs(value) < MAX_AMOUNT:
+                raise InvalidCursor("Invalid cursor")
+        elif not isinstance(value, int):
+            raise InvalidCursor("Invalid cursor")
+        decoded.append(value)
+    return decoded
+
+
+def _after(columns: Sequence[Any], values: Sequence[Any], descending: bool = False):
+    """构造 (c1, c2, ...) > (v1, v2, ...) 的条件（descending 时为 <），可以直接走复合索引"""
+    column, value = columns[0], values[0]
+    beyond = column < value if descending else column > value
+    if len(columns) == 1:
+        return beyond
+    return or_(beyond, and_(column == value, _after(columns[1:], values[1:], descending)))
+
+
+def keyset_page(
+    query: Query, columns: Sequence[Any], after: Optional[str], limit: int, descending: bool = False
+) -> Tuple[list, Optional[str]]:
+    """按 columns 做游标分页，返回 (当前页数据, 下一页游标)
+
+    after 为空字符串时从第一页开始；没有更多数据时 next_cursor 为 None。
+    descending 时所有列按降序排列。limit 不大于 0 时返回空页，不查询数据库。
+    """
+    if after:
+        query = query.filter(_after(columns, decode_cursor(after, columns), descending))
+    if limit <= 0:
+        return [], None
+    order = [column.desc() for column in columns] if descending else columns
+    items = query.order_by(*order).limit(limit + 1).all()
+
+    next_cursor = None
+    if len(items) > limit:
+        items = items[:limit]
+        next_cursor = encode_cursor([getattr(items[-1], column.key) for column in columns])
+    return items, next_cursor
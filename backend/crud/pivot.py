@@ -0,0 +1,330 @@
+"""
+透视汇总引擎
+
+分类 × 月、项目 × 季度这类透视视图需要对同一批交易按不同维度反复分组。这里把每个用户的
+交易一次性读入紧凑的 NumPy 列（日期序号、以分为单位的金额、分类、账户、项目、类型、币种），
+之后任意维度组合的分组汇总都在内存中用 bincount 完成，不再查询 transactions。
+
+缓存保存在进程内，按最近使用顺序排列，总字节数不超过 settings.pivot_cache_max_bytes，
+超出时淘汰最久未使用的用户。交易写入时 crud 在递增 transactions 数据版本号的同时调用
+invalidate_transaction_columns 清除该用户的缓存；缓存还记录加载时的数据版本号，命中前
+与数据库中的版本号比对，多 worker 部署时其他进程的写入也会在下一次请求时生效。
+"""
+import threading
+from collections import OrderedDict
+from datetime import date
+from typing import Dict, List, Optional, Sequence, Tuple
+import numpy as np
+from sqlalchemy import Integer, case, cast, func, select, type_coerce
+from sqlalchemy.orm import Session
+from config.config import settings
+from models.models import DataVersion, Transaction, to_cents
+from schemas.schemas import TransactionFilter
+from crud.category_tree import get_category_tree
+from crud.fx import get_fx_rates, get_user_currency
+
+PIVOT_DIMENSIONS = ("day", "week", "month", "quarter", "year", "category", "account", "project", "type", "currency")
+PIVOT_MEASURES = ("income", "expense", "net", "count")
+PIVOT_MAX_CELLS = 100000
+# 1970-01-01 的儒略日，日期序号为距 1970-01-01 的天数，可直接转换为 datetime64[D]
+_EPOCH_JULIAN_DAY = 2440587.5
+
+
+class TransactionColumns:
+    """一个用户全部交易的列式副本，同一笔交易位于各数组的同一下标
+
+    分类、项目为空时记为 0，与 monthly_rollups 一致；币种记为 currency_codes 中的下标。
+    """
+
+    __slots__ = ("version", "days", "amounts", "categories", "accounts", "projects", "incomes", "currencies", "currency_codes")
+
+    def __init__(self, version: int, days: np.ndarray, amounts: np.ndarray, categories: np.ndarray, accounts: np.ndarray,
+                 projects: np.ndarray, incomes: np.ndarray, currencies: np.ndarray, currency_codes: Tuple[str, ...]):
+        self.version = version
+        self.days = days
+        self.amounts = amounts
+        self.categories = categories
+        self.accounts = accounts
+        self.projects = projects
+        self.incomes = incomes
+        self.currencies = currencies
+        self.currency_codes = currency_codes
+
+    def __len__(self) -> int:
+        return len(self.days)
+
+    @property
+    def nbytes(self) -> int:
+        return sum(array.nbytes for array in (
+            self.days, self.amounts, self.categories, self.accounts, self.projects, self.incomes, self.currencies
+        ))
+
+
+def _transactions_version(db: Session, user_id: int) -> int:
+    return db.query(DataVersion.version).filter(
+        DataVersion.user_id == user_id, DataVersion.resource == "transactions"
+    ).scalar() or 0
+
+
+def load_transaction_columns(db: Session, user_id: int, version: int = 0) -> TransactionColumns:
+    """查询一次用户的全部交易，日期在 SQL 中换算为整数，金额直接读取存储的整数分
+
+    查询的列都在 (user_id, transaction_date, ...) 覆盖索引中，按索引顺序读取，不回表；
+    使用 Core 查询，跳过 ORM 的逐行处理。
+    """
+    table = Transaction.__table__
+    rows = db.connection().execute(select(
+        cast(func.julianday(func.substr(table.c.transaction_date, 1, 10)) - _EPOCH_JULIAN_DAY, Integer),
+        type_coerce(table.c.amount, Integer),
+        func.coalesce(table.c.category_id, 0),
+        table.c.account_id,
+        func.coalesce(table.c.project_id, 0),
+        case((table.c.type == "income", 1), else_=0),
+        table.c.currency
+    ).where(table.c.user_id == user_id)).all()
+    days, amounts, categories, accounts, projects, incomes, currencies = zip(*rows) if rows else ((),) * 7
+    currency_codes, currency_index = np.unique(np.array(currencies, dtype=str), return_inverse=True)
+    return TransactionColumns(
+        version=version,
+        days=np.array(days, dtype=np.int32),
+        amounts=np.array(amounts, dtype=np.int64),
+        categories=np.array(categories, dtype=np.int32),
+        accounts=np.array(accounts, dtype=np.int32),
+        projects=np.array(projects, dtype=np.int32),
+        incomes=np.array(incomes, dtype=np.bool_),
+        currencies=currency_index.astype(np.uint16).reshape(-1),
+        currency_codes=tuple(str(code) for code in currency_codes)
+    )
+
+
+class _ColumnCache:
+    """按总字节数限制大小的 LRU 缓存"""
+
+    def __init__(self):
+        self._entries: "OrderedDict[int, TransactionColumns]" = OrderedDict()
+        self._bytes = 0
+        self._hits = 0
+        self._misses = 0
+        self._lock = threading.Lock()
+
+    def get(self, user_id: int, version: int) -> Optional[TransactionColumns]:
+        with self._lock:
+            data = self._entries.get(user_id)
+            if data is None or data.version != version:
+                self._misses += 1
+                return None
+            self._entries.move_to_end(user_id)
+            self._hits += 1
+            return data
+
+    def put(self, user_id: int, data: TransactionColumns) -> None:
+        max_bytes = settings.pivot_cache_max_bytes
+        with self._lock:
+            self._discard(user_id)
+            if data.nbytes > max_bytes:
+                return
+            self._entries[user_id] = data
+            self._bytes += data.nbytes
+            while self._bytes > max_bytes:
+                self._discard(next(iter(self._entries)))
+
+    def invalidate(self, user_id: Optional[int] = None) -> None:
+        with self._lock:
+            if user_id is None:
+                self._entries.clear()
+                self._bytes = 0
+            else:
+                self._discard(user_id)
+
+    def _discard(self, user_id: int) -> None:
+        data = self._entries.pop(user_id, None)
+        if data is not None:
+            self._bytes -= data.nbytes
+
+    def get_metrics(self) -> Dict[str, int]:
+        with self._lock:
+            return {
+                "users": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": settings.pivot_cache_max_bytes,
+                "hits": self._hits,
+                "misses": self._misses,
+            }
+
+
+_cache = _ColumnCache()
+
+
+def get_transaction_columns(db: Session, user_id: int) -> TransactionColumns:
+    """获取用户交易的列式副本，缓存未命中或数据版本号变化时重新加载
+
+    版本号必须在加载数据之前读取，两者之间发生写入时缓存的是旧版本号，下次请求会重新加载。
+    """
+    version = _transactions_version(db, user_id)
+    data = _cache.get(user_id, version)
+    if data is None:
+        data = load_transaction_columns(db, user_id, version)
+        _cache.put(user_id, data)
+    return data
+
+
+def invalidate_transaction_columns(user_id: Optional[int] = None) -> None:
+    """清除用户的交易列缓存，user_id 为空时清除全部"""
+    _cache.invalidate(user_id)
+
+
+def get_pivot_cache_metrics() -> Dict[str, int]:
+    return _cache.get_metrics()
+
+
+def _day_number(value: date) -> int:
+    return value.toordinal() - date(1970, 1, 1).toordinal()
+
+
+def _filter_mask(db: Session, user_id: int, data: TransactionColumns, filters: TransactionFilter) -> np.ndarray:
+    """TransactionFilter 对应的行掩码，语义与 crud 中的 SQL 筛选条件一致"""
+    mask = np.ones(len(data), dtype=np.bool_)
+    if filters.start_date is not None:
+        mask &= data.days >= _day_number(filters.start_date)
+    if filters.end_date is not None:
+        mask &= data.days <= _day_number(filters.end_date)
+    if filters.account_id is not None:
+        mask &= data.accounts == filters.account_id
+    if filters.category_id is not None:
+        if filters.include_subcategories:
+            category_ids = sorted(get_category_tree(db, user_id).subtree(filters.category_id))
+            mask &= np.isin(data.categories, category_ids)
+        else:
+            mask &= data.categories == filters.category_id
+    if filters.project_id is not None:
+        mask &= data.projects == filters.project_id
+    if filters.type is not None:
+        mask &= data.incomes == (filters.type == "income")
+    if filters.currency is not None:
+        if filters.currency in data.currency_codes:
+            mask &= data.currencies == data.currency_codes.index(filters.currency)
+        else:
+            mask[:] = False
+    if filters.min_amount is not None:
+        mask &= data.amounts >= to_cents(filters.min_amount)
+    if filters.max_amount is not None:
+        mask &= data.amounts <= to_cents(filters.max_amount)
+    return mask
+
+
+def _dimension_codes(data: TransactionColumns, mask: np.ndarray, dimension: str) -> np.ndarray:
+    """每笔交易在该维度上的整数取值"""
+    if dimension in ("day", "week", "month", "quarter", "year"):
+        days = data.days[mask].astype(np.int64)
+        if dimension == "day":
+            return days
+        if dimension == "week":
+            # 1970-01-01 是周四，加 3 天后每 7 天从周一开始
+            return (days + 3) // 7
+        months = days.astype("datetime64[D]").astype("datetime64[M]").astype(np.int64)
+        return {"month": months, "quarter": months // 3, "year": months // 12}[dimension]
+    column = {
+        "category": data.categories, "account": data.accounts, "project": data.projects,
+        "type": data.incomes, "currency": data.currencies
+    }[dimension]
+    return column[mask].astype(np.int64)
+
+
+def _dimension_labels(data: TransactionColumns, dimension: str, codes: np.ndarray) -> list:
+    """维度取值在响应中的表示：日期为 ISO 字符串，分类、项目 0 为 None"""
+    if dimension == "day":
+        return [str(day) for day in codes.astype("datetime64[D]")]
+    if dimension == "week":
+        return [str(day) for day in (codes * 7 - 3).astype("datetime64[D]")]
+    if dimension == "month":
+        return [str(month) for month in codes.astype("datetime64[M]")]
+    if dimension == "quarter":
+        return [f"{1970 + quarter // 4}-Q{quarter % 4 + 1}" for quarter in codes.tolist()]
+    if dimension == "year":
+        return [1970 + year for year in codes.tolist()]
+    if dimension == "type":
+        return ["income" if code else "expense" for code in codes.tolist()]
+    if dimension == "currency":
+        return [data.currency_codes[code] for code in codes.tolist()]
+    if dimension == "account":
+        return codes.tolist()
+    return [code or None for code in codes.tolist()]
+
+
+def _group(data: TransactionColumns, mask: np.ndarray, dimensions: Sequence[str]) -> Tuple[np.ndarray, List[list]]:
+    """按多个维度分组，返回每笔交易的组号和每组的维度取值，组按维度取值排序"""
+    count = int(mask.sum())
+    if not dimensions:
+        return np.zeros(count, dtype=np.int64), [[]]
+    if not count:
+        return np.zeros(0, dtype=np.int64), []
+    uniques, inverses = zip(*(
+        np.unique(_dimension_codes(data, mask, dimension), return_inverse=True) for dimension in dimensions
+    ))
+    shape = tuple(len(values) for values in uniques)
+    combined = np.ravel_multi_index([inverse.reshape(-1) for inverse in inverses], shape)
+    keys, groups = np.unique(combined, return_inverse=True)
+    labels = [
+        _dimension_labels(data, dimension, values[positions])
+        for dimension, values, positions in zip(dimensions, uniques, np.unravel_index(keys, shape))
+    ]
+    return groups.reshape(-1), [list(key) for key in zip(*labels)]
+
+
+def get_pivot(
+    db: Session,
+    user_id: int,
+    rows: Sequence[str],
+    columns: Sequence[str] = (),
+    measure: str = "expense",
+    filters: Optional[TransactionFilter] = None,
+    currency: Optional[str] = None
+) -> dict:
+    """按 rows × columns 维度汇总交易，返回二维矩阵
+
+    rows、columns 为 PIVOT_DIMENSIONS 中的维度，可以为空（只有一行或一列）；measure 为收入、
+    支出、净额（收入减支出）或笔数。row_keys、column_keys 中每项依次为各维度的取值，只包含
+    有交易的组合；values[i][j] 为第 i 行第 j 列的汇总。单元格数超过 PIVOT_MAX_CELLS 时抛出 ValueError。
+    金额按交易当天的汇率换算为 currency（默认为用户的默认币种），currency 维度仍按交易的原币种分组。
+    """
+    unknown = [dimension for dimension in (*rows, *columns) if dimension not in PIVOT_DIMENSIONS]
+    if unknown:
+        raise ValueError(f"Unknown dimension: {', '.join(unknown)}")
+    if len(set(rows) | set(columns)) != len(rows) + len(columns):
+        raise ValueError("A dimension can only be used once")
+    if measure not in PIVOT_MEASURES:
+        raise ValueError(f"Unknown measure: {measure}")
+
+    currency = currency or get_user_currency(db, user_id)
+    data = get_transaction_columns(db, user_id)
+    mask = _filter_mask(db, user_id, data, filters) if filters is not None else np.ones(len(data), dtype=np.bool_)
+    row_groups, row_keys = _group(data, mask, rows)
+    column_groups, column_keys = _group(data, mask, columns)
+    if len(row_keys) * len(column_keys) > PIVOT_MAX_CELLS:
+        raise ValueError(f"Too many cells (max {PIVOT_MAX_CELLS})")
+
+    if measure == "count":
+        weights = None
+    else:
+        amounts = data.amounts[mask]
+        incomes = data.incomes[mask]
+        weights = {
+            "income": np.where(incomes, amounts, 0),
+            "expense": np.where(incomes, 0, amounts),
+            "net": np.where(incomes, amounts, -amounts)
+        }[measure].astype(np.float64)
+        if data.currency_codes not in ((), (currency,)):
+            weights *= get_fx_rates().factors(data.currency_codes, data.currencies[mask], data.days[mask], currency)
+    cells = np.bincount(
+        row_groups * len(column_keys) + column_groups, weights=weights, minlength=len(row_keys) * len(column_keys)
+    ).reshape(len(row_keys), len(column_keys))
+    values = cells.astype(np.int64).tolist() if measure == "count" else (np.rint(cells) / 100).tolist()
+    return {
+        "rows": list(rows),
+        "columns": list(columns),
+        "measure": measure,
+        "currency": currency,
+        "row_keys": row_keys,
+        "column_keys": column_keys,
+        "values": values
+    }
@@ -1,27 +1,89 @@
+from typing import Any, Callable, Dict, Optional, TypeVar, Union
+import anyio
+from fastapi.concurrency import run_in_threadpool
 from sqlalchemy import create_engine, event
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool
 import os
+from config.config import settings
+
+# SQLite数据库文件路径，可通过 DATABASE_URL 配置
+SQLALCHEMY_DATABASE_URL = settings.database_url
+ASYNC_SQLALCHEMY_DATABASE_URL = SQLALCHEMY_DATABASE_URL.replace("sqlite://", "sqlite+aiosqlite://", 1)
+
+# SQLite 连接参数档位（DATABASE_PROFILE）
+# production 使用 WAL：读写互不阻塞，多个 worker 进程可以同时读，写入在
+# busy_timeout 内排队等待而不是立即报 database is locked；WAL 下
+# synchronous=NORMAL 只在检查点时 fsync，断电最多丢失最近提交的事务，不会损坏数据库
+SQLITE_PROFILES: Dict[str, Dict[str, Any]] = {
+    "default": {
+        "pragmas": [],
+        "pool_size": 5,
+        "max_overflow": 10,
+    },
+    "production": {
+        "pragmas": [
+            "PRAGMA journal_mode=WAL",
+            "PRAGMA synchronous=NORMAL",
+            f"PRAGMA mmap_size={settings.sqlite_mmap_size}",
+            f"PRAGMA cache_size=-{settings.sqlite_cache_size_kb}",
+        ],
+        # 覆盖线程池的并发请求数，避免请求在连接池上排队
+        "pool_size": 20,
+        "max_overflow": 20,
+    },
+}
+SQLITE_PROFILE = SQLITE_PROFILES[settings.database_profile]
+
+
+def _engine_options(url: str) -> Dict[str, Any]:
+    """文件数据库使用可配置大小的连接池，内存数据库保持 SQLAlchemy 的默认连接池"""
+    if make_url(url).database in (None, "", ":memory:"):
+        return {}
+    return {
+        "pool_size": settings.database_pool_size or SQLITE_PROFILE["pool_size"],
+        "max_overflow": settings.database_max_overflow if settings.database_max_overflow is not None
+        else SQLITE_PROFILE["max_overflow"],
+    }
 
-# SQLite数据库文件路径
-SQLALCHEMY_DATABASE_URL = "sqlite:///./monika.db"
 
 # 创建SQLAlchemy引擎
 engine = create_engine(
     SQLALCHEMY_DATABASE_URL, 
-    connect_args={"check_same_thread": False}
+    connect_args={"check_same_thread": False},
+    **_engine_options(SQLALCHEMY_DATABASE_URL)
 )
 
-# 启用外键约束
+# 设置连接参数并启用外键约束
 @event.listens_for(engine, "connect")
 def set_sqlite_pragma(dbapi_connection, connection_record):
     cursor = dbapi_connection.cursor()
+    # busy_timeout 需要最先设置，切换 journal_mode 时也可能需要等待其他连接
+    cursor.execute(f"PRAGMA busy_timeout={settings.sqlite_busy_timeout_ms}")
+    for pragma in SQLITE_PROFILE["pragmas"]:
+        cursor.execute(pragma)
     cursor.execute("PRAGMA foreign_keys=ON")
     cursor.close()
 
 # 创建SessionLocal类
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# 异步模式下的引擎和会话（aiosqlite），建表、迁移、导入导出等仍使用同步引擎
+async_engine = None
+AsyncSessionLocal = None
+if settings.database_mode == "async":
+    async_options = _engine_options(ASYNC_SQLALCHEMY_DATABASE_URL)
+    if async_options:
+        async_options["poolclass"] = AsyncAdaptedQueuePool
+    async_engine = create_async_engine(ASYNC_SQLALCHEMY_DATABASE_URL, **async_options)
+    event.listen(async_engine.sync_engine, "connect", set_sqlite_pragma)
+    AsyncSessionLocal = async_sessionmaker(
+        async_engine, autocommit=False, autoflush=False, expire_on_commit=False
+    )
+
 # 创建Base类
 Base = declarative_base()
 
@@ -32,3 +94,87 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+DBSession = Union[Session, AsyncSession]
+T = TypeVar("T")
+
+# 同步模式下关闭会话使用的线程 limiter，与连接池的连接数相同，每个借出的连接都能及时归还；
+# anyio 的 limiter 需要在事件循环中创建，首次使用时创建
+_release_limiter: Optional[anyio.CapacityLimiter] = None
+
+
+def _get_release_limiter() -> anyio.CapacityLimiter:
+    global _release_limiter
+    if _release_limiter is None:
+        options = _engine_options(SQLALCHEMY_DATABASE_URL)
+        _release_limiter = anyio.CapacityLimiter(options.get("pool_size", 5) + options.get("max_overflow", 10))
+    return _release_limiter
+
+
+async def get_session():
+    """按 DATABASE_MODE 提供同步或异步会话，配合 run_db 使用
+
+    请求出错时先回滚再关闭会话：写入失败的事务仍持有 SQLite 的写锁，
+    不回滚就归还连接会让其他写入等到 busy_timeout 后报 database is locked。
+    """
+    if AsyncSessionLocal is None:
+        db = SessionLocal()
+        try:
+            yield db
+        except Exception:
+            await anyio.to_thread.run_sync(db.rollback, limiter=_get_release_limiter())
+            raise
+        finally:
+            # 关闭会话使用单独的 limiter：线程池被等待数据库连接的请求占满时，
+            # 归还连接的操作不能也排在它们后面
+            await anyio.to_thread.run_sync(db.close, limiter=_get_release_limiter())
+    else:
+        db = AsyncSessionLocal()
+        try:
+            yield db
+        except Exception:
+            await db.rollback()
+            raise
+        finally:
+            await db.close()
+
+
+async def run_db(db: DBSession, func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """执行以同步 Session 为第一个参数的 crud 函数
+
+    同步模式下在线程池中执行；异步模式下通过 AsyncSession.run_sync 执行，
+    SQL 经由 aiosqlite 异步完成，不占用线程池，但 crud 函数中的 Python 计算仍在事件循环中执行，
+    计算量大的只读查询使用 run_db_in_threadpool。crud 函数抛出异常时立即回滚，不等到请求结束才释放写锁。
+
+    异步模式下出错时作废会话的连接而不是归还连接池：SQLAlchemy 的 aiosqlite 适配不关闭出错语句的游标，
+    游标随异常对象留到之后才在事件循环线程中释放，释放时需要获取连接的互斥锁；连接若已被其他请求借出、
+    正在 busy_timeout 中等待写锁，事件循环会随之停顿。作废的连接关闭后不再被使用，游标随时释放都不会等待。
+    """
+    if isinstance(db, AsyncSession):
+        try:
+            return await db.run_sync(func, *args, **kwargs)
+        except Exception:
+            await db.invalidate()
+            raise
+    try:
+        return await run_in_threadpool(func, db, *args, **kwargs)
+    except Exception:
+        await anyio.to_thread.run_sync(db.rollback, limiter=_get_release_limiter())
+        raise
+
+
+async def run_db_in_threadpool(db: DBSession, func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """执行计算量大的只读 crud 函数（透视汇总、现金流等）
+
+    异步模式下 run_sync 在事件循环线程中执行 crud 函数，其中的 Python 计算会阻塞其他请求；
+    这里改用同步会话在线程池中执行，db 不使用。同步模式下与 run_db 相同。
+    """
+    if not isinstance(db, AsyncSession):
+        return await run_db(db, func, *args, **kwargs)
+
+    def run() -> T:
+        with SessionLocal() as session:
+            return func(session, *args, **kwargs)
+
+    return await run_in_threadpool(run)
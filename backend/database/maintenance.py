@@ -0,0 +1,102 @@
+"""
+数据维护命令
+
+用法（在 backend 目录下）：
+    python -m database.maintenance recompute-balances [--user-id ID] [--dry-run]
+    python -m database.maintenance recompute-rollups [--user-id ID] [--dry-run | --rebuild]
+    python -m database.maintenance rebuild-search
+"""
+import argparse
+import sys
+from database.database import SessionLocal, engine
+from database.migrations import init_db
+from crud.crud import (
+    recompute_balances, recompute_monthly_rollups, rebuild_monthly_rollups, rebuild_transaction_search
+)
+
+
+def recompute_balances_command(args: argparse.Namespace) -> int:
+    """从交易记录重新计算账户余额，报告并修正偏差"""
+    db = SessionLocal()
+    try:
+        drifted = recompute_balances(db, user_id=args.user_id, fix=not args.dry_run)
+    finally:
+        db.close()
+
+    for item in drifted:
+        print(f"账户 {item['account_id']} (用户 {item['user_id']}): 记录余额 {item['stored']:.2f}，实际余额 {item['expected']:.2f}")
+    if not drifted:
+        print("所有账户余额一致")
+    elif args.dry_run:
+        print(f"{len(drifted)} 个账户余额不一致（未修正）")
+        return 1
+    else:
+        print(f"已修正 {len(drifted)} 个账户余额")
+    return 0
+
+
+def recompute_rollups_command(args: argparse.Namespace) -> int:
+    """比对月度汇总与交易记录，报告并重建存在偏差的用户的汇总"""
+    db = SessionLocal()
+    try:
+        if args.rebuild:
+            rows = rebuild_monthly_rollups(db, user_id=args.user_id)
+            print(f"已重建月度汇总，共 {rows} 行")
+            return 0
+        drifted = recompute_monthly_rollups(db, user_id=args.user_id, fix=not args.dry_run)
+    finally:
+        db.close()
+
+    for item in drifted:
+        print(
+            f"用户 {item['user_id']} {item['month']} 账户 {item['account_id']} 分类 {item['category_id']} "
+            f"项目 {item['project_id']} {item['type']} {item['currency']}: "
+            f"汇总 {item['stored_total']:.2f}/{item['stored_count']} 笔，实际 {item['expected_total']:.2f}/{item['expected_count']} 笔"
+        )
+    if not drifted:
+        print("月度汇总与交易记录一致")
+    elif args.dry_run:
+        print(f"{len(drifted)} 条月度汇总不一致（未修正）")
+        return 1
+    else:
+        print(f"已重建 {len({item['user_id'] for item in drifted})} 个用户的月度汇总")
+    return 0
+
+
+def rebuild_search_command(args: argparse.Namespace) -> int:
+    """从交易记录重建全文搜索索引"""
+    db = SessionLocal()
+    try:
+        rebuild_transaction_search(db)
+    finally:
+        db.close()
+    print("已重建交易全文索引")
+    return 0
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m database.maintenance", description="Monika 数据维护命令")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    balances = subparsers.add_parser("recompute-balances", help="重新计算账户余额并修正偏差")
+    balances.add_argument("--user-id", type=int, default=None, help="只检查指定用户的账户")
+    balances.add_argument("--dry-run", action="store_true", help="只报告偏差，不写入数据库")
+    balances.set_defaults(handler=recompute_balances_command)
+
+    rollups = subparsers.add_parser("recompute-rollups", help="检查月度汇总并重建存在偏差的部分")
+    rollups.add_argument("--user-id", type=int, default=None, help="只检查指定用户的汇总")
+    rollups_mode = rollups.add_mutually_exclusive_group()
+    rollups_mode.add_argument("--dry-run", action="store_true", help="只报告偏差，不写入数据库")
+    rollups_mode.add_argument("--rebuild", action="store_true", help="不做比对，直接从交易记录全部重建")
+    rollups.set_defaults(handler=recompute_rollups_command)
+
+    search = subparsers.add_parser("rebuild-search", help="重建交易标题和备注的全文索引")
+    search.set_defaults(handler=rebuild_search_command)
+
+    args = parser.parse_args(argv)
+    init_db(engine)
+    return args.handler(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,181 @@
+"""
+数据库结构迁移
+
+schema 版本记录在 SQLite 的 PRAGMA user_version 中。新建的数据库由
+create_all 直接建成最新结构并标记为最新版本；已有的 monika.db 启动时
+依次执行尚未应用的迁移，每个迁移在独立事务中完成。
+
+新增迁移：在 MIGRATIONS 末尾追加 (版本号, 说明, 函数)，版本号递增。
+"""
+from typing import Callable, List, Tuple
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Connection, Engine
+from models.models import (
+    Base, Account, Project, Category, Transaction, TransactionTag, Tag, Budget, MonthlyRollup, DataVersion,
+    TRANSACTION_SEARCH_DDL, TRANSACTION_BIGRAM_DDL, TRANSACTION_BIGRAM_FILL
+)
+
+
+def _create_indexes(connection: Connection, *models) -> None:
+    """按模型定义补建缺失的索引"""
+    for model in models:
+        for index in model.__table__.indexes:
+            index.create(bind=connection, checkfirst=True)
+
+
+def _add_hot_path_indexes(connection: Connection) -> None:
+    _create_indexes(connection, Account, Project, Category, Transaction, TransactionTag, Tag, Budget)
+
+
+def _add_account_current_balance(connection: Connection) -> None:
+    columns = {column["name"] for column in inspect(connection).get_columns("accounts")}
+    if "current_balance" not in columns:
+        connection.execute(text(
+            "ALTER TABLE accounts ADD COLUMN current_balance NUMERIC(10, 2) NOT NULL DEFAULT 0"
+        ))
+    connection.execute(text("""
+        UPDATE accounts SET current_balance = initial_balance + COALESCE((
+            SELECT SUM(CASE transactions.type
+                WHEN 'income' THEN transactions.amount
+                WHEN 'expense' THEN -transactions.amount
+                ELSE 0 END)
+            FROM transactions
+            WHERE transactions.user_id = accounts.user_id AND transactions.account_id = accounts.id
+        ), 0)
+    """))
+
+
+def _add_monthly_rollups(connection: Connection) -> None:
+    MonthlyRollup.__table__.create(bind=connection, checkfirst=True)
+    connection.execute(text("DELETE FROM monthly_rollups"))
+    connection.execute(text("""
+        INSERT INTO monthly_rollups
+            (user_id, month, category_id, project_id, account_id, type, currency, total, transaction_count)
+        SELECT user_id, strftime('%Y-%m', transaction_date), COALESCE(category_id, 0), COALESCE(project_id, 0),
+               account_id, type, currency, ROUND(SUM(amount), 2), COUNT(*)
+        FROM transactions
+        GROUP BY user_id, strftime('%Y-%m', transaction_date), COALESCE(category_id, 0), COALESCE(project_id, 0),
+                 account_id, type, currency
+    """))
+
+
+def _add_transaction_search(connection: Connection) -> None:
+    for statement in TRANSACTION_SEARCH_DDL:
+        connection.exec_driver_sql(statement)
+    connection.exec_driver_sql("INSERT INTO transactions_fts(transactions_fts) VALUES ('rebuild')")
+
+
+def _add_short_term_search(connection: Connection) -> None:
+    for statement in TRANSACTION_BIGRAM_DDL:
+        connection.exec_driver_sql(statement)
+    connection.exec_driver_sql(TRANSACTION_BIGRAM_FILL)
+
+
+def _add_data_versions(connection: Connection) -> None:
+    DataVersion.__table__.create(bind=connection, checkfirst=True)
+
+
+def _add_amount_sort_index(connection: Connection) -> None:
+    _create_indexes(connection, Transaction)
+
+
+def _widen_date_index(connection: Connection) -> None:
+    # 新索引以原索引的列开头，可以完全替代原索引
+    connection.execute(text("DROP INDEX IF EXISTS ix_transactions_user_date_id"))
+    _create_indexes(connection, Transaction)
+
+
+def _widen_date_index_for_pivot(connection: Connection) -> None:
+    connection.execute(text("DROP INDEX IF EXISTS ix_transactions_user_date_cashflow"))
+    _create_indexes(connection, Transaction)
+
+
+def _store_money_as_cents(connection: Connection) -> None:
+    # SQLite 不能修改列类型，已有数据库的金额列仍声明为 DECIMAL（NUMERIC 亲和性），
+    # 写入的整数同样按 INTEGER 存储，与新建数据库的 INTEGER 列行为一致
+    money_columns = {
+        "transactions": ("amount",),
+        "accounts": ("initial_balance", "current_balance"),
+        "budgets": ("amount",),
+        "monthly_rollups": ("total",),
+    }
+    for table, columns in money_columns.items():
+        assignments = ", ".join(f"{column} = CAST(ROUND({column} * 100) AS INTEGER)" for column in columns)
+        connection.execute(text(f"UPDATE {table} SET {assignments}"))
+
+
+def _add_currency_index(connection: Connection) -> None:
+    _create_indexes(connection, Transaction)
+
+
+MIGRATIONS: List[Tuple[int, str, Callable[[Connection], None]]] = [
+    (1, "transactions 热点查询的复合索引", _add_hot_path_indexes),
+    (2, "accounts.current_balance 物化余额", _add_account_current_balance),
+    (3, "monthly_rollups 月度汇总", _add_monthly_rollups),
+    (4, "transactions_fts 交易全文索引", _add_transaction_search),
+    (5, "data_versions 数据版本号", _add_data_versions),
+    (6, "transactions 按金额排序的索引", _add_amount_sort_index),
+    (7, "transactions 按日期的索引附带现金流汇总的列", _widen_date_index),
+    (8, "transactions 按日期的索引附带透视汇总的列", _widen_date_index_for_pivot),
+    (9, "金额以整数分存储", _store_money_as_cents),
+    (10, "transactions 按币种的覆盖索引", _add_currency_index),
+    (11, "transactions_fts_bigram 短词索引", _add_short_term_search),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+def get_schema_version(connection: Connection) -> int:
+    return connection.execute(text("PRAGMA user_version")).scalar()
+
+
+def _set_schema_version(connection: Connection, version: int) -> None:
+    # PRAGMA 不支持参数绑定
+    connection.execute(text(f"PRAGMA user_version = {int(version)}"))
+
+
+def _begin_immediate(connection: Connection) -> None:
+    """立即获取写锁
+
+    多个 uvicorn worker 同时启动时都会执行 init_db，先拿到写锁的进程完成
+    建表或迁移，其余进程在 busy_timeout 内等待，拿到锁后重新检查状态。
+    """
+    connection.exec_driver_sql("BEGIN IMMEDIATE")
+
+
+def run_migrations(engine: Engine) -> List[int]:
+    """执行所有未应用的迁移，返回本次应用的版本号"""
+    applied = []
+    for version, description, migrate in MIGRATIONS:
+        with engine.connect() as connection:
+            _begin_immediate(connection)
+            if version <= get_schema_version(connection):
+                connection.rollback()
+                continue
+            migrate(connection)
+            _set_schema_version(connection, version)
+            connection.commit()
+        print(f"数据库迁移 {version}: {description}")
+        applied.append(version)
+    return applied
+
+
+def init_db(engine: Engine) -> List[int]:
+    """建表并把数据库升级到最新结构，返回本次应用的迁移版本号"""
+    with engine.connect() as connection:
+        _begin_immediate(connection)
+        is_new = not inspect(connection).has_table("users")
+        Base.metadata.create_all(bind=connection)
+        if is_new:
+            _set_schema_version(connection, LATEST_VERSION)
+        connection.commit()
+    if is_new:
+        return []
+    return run_migrations(engine)
+
+
+if __name__ == "__main__":
+    from database.database import engine
+
+    applied = init_db(engine)
+    print(f"已应用 {len(applied)} 个迁移，当前版本 {LATEST_VERSION}")
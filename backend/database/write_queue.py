@@ -0,0 +1,169 @@
+"""
+写入合并（group commit）
+
+每个写请求单独提交时，每次都要 fsync，且 SQLite 同一时间只允许一个写事务。
+开启 WRITE_BATCHING 后，写操作交给单独的写线程：写线程在一个外层事务中
+依次执行一批操作，每个操作放在自己的 SAVEPOINT 里，最后只提交一次。
+
+- 每个操作仍然是原子的：操作抛出异常时回滚它自己的 SAVEPOINT（包括
+  异常前已经 commit 的部分），异常原样返回给调用方，同批其他操作不受影响
+- 外层提交失败时，本批所有操作都返回该异常
+- crud 函数无需修改：其中的 db.commit() 只释放 SAVEPOINT，db.refresh()
+  读到的是本事务内的最新数据；返回的 ORM 对象在会话关闭后已脱离会话，
+  只能访问已加载的字段
+"""
+import asyncio
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, List, Optional, TypeVar
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import Session
+from config.config import settings
+from database.database import DBSession, engine, run_db
+
+T = TypeVar("T")
+
+
+class _WriteOp:
+    __slots__ = ("func", "args", "kwargs", "future")
+
+    def __init__(self, func: Callable[..., Any], args: tuple, kwargs: dict, future: Future):
+        self.func = func
+        self.args = args
+        self.kwargs = kwargs
+        self.future = future
+
+
+class WriteQueue:
+    """单个写线程按批提交写操作"""
+
+    def __init__(self, engine: Engine, window_ms: float, max_size: int):
+        self.engine = engine
+        self.window = window_ms / 1000
+        self.max_size = max_size
+        self._queue: "queue.Queue[Optional[_WriteOp]]" = queue.Queue()
+        self._thread: Optional[threading.Thread] = None
+        self._lock = threading.Lock()
+        self._batches = 0
+        self._operations = 0
+        self._largest_batch = 0
+
+    def start(self) -> None:
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="write-queue", daemon=True)
+                self._thread.start()
+
+    def shutdown(self) -> None:
+        """处理完已提交的操作后停止写线程"""
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is not None:
+            self._queue.put(None)
+            thread.join()
+
+    def submit(self, func: Callable[..., T], *args: Any, **kwargs: Any) -> "Future[T]":
+        """提交以 Session 为第一个参数的写操作"""
+        self.start()
+        future: Future = Future()
+        self._queue.put(_WriteOp(func, args, kwargs, future))
+        return future
+
+    def _collect(self, first: _WriteOp) -> List[_WriteOp]:
+        batch = [first]
+        deadline = time.monotonic() + self.window
+        while len(batch) < self.max_size:
+            remaining = deadline - time.monotonic()
+            try:
+                op = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if op is None:
+                # 停止信号放回队列，本批处理完后退出
+                self._queue.put(None)
+                break
+            batch.append(op)
+        return batch
+
+    def _run(self) -> None:
+        while True:
+            op = self._queue.get()
+            if op is None:
+                return
+            self._commit_batch(self._collect(op))
+
+    def _commit_batch(self, batch: List[_WriteOp]) -> None:
+        results = []
+        try:
+            with self.engine.connect() as connection:
+                # 显式开启外层事务，pysqlite 才不会在释放第一个 SAVEPOINT 时提交
+                connection.exec_driver_sql("BEGIN IMMEDIATE")
+                for op in batch:
+                    if not op.future.set_running_or_notify_cancel():
+                        continue
+                    # 整个操作包在一个 SAVEPOINT 中，crud 提交后才抛出的异常也能完整回滚
+                    savepoint = connection.begin_nested()
+                    session = Session(bind=connection, join_transaction_mode="create_savepoint", autoflush=False)
+                    try:
+                        result = op.func(session, *op.args, **op.kwargs)
+                    except Exception as exc:
+                        session.close()
+                        savepoint.rollback()
+                        results.append((op, None, exc))
+                    else:
+                        session.close()
+                        savepoint.commit()
+                        results.append((op, result, None))
+                connection.commit()
+        except Exception as exc:
+            for op in batch:
+                if not op.future.done():
+                    op.future.set_exception(exc)
+            return
+
+        with self._lock:
+            self._batches += 1
+            self._operations += len(batch)
+            self._largest_batch = max(self._largest_batch, len(batch))
+        for op, result, exc in results:
+            if exc is None:
+                op.future.set_result(result)
+            else:
+                op.future.set_exception(exc)
+
+    def get_metrics(self) -> Dict[str, object]:
+        with self._lock:
+            return {
+                "enabled": settings.write_batching,
+                "batches": self._batches,
+                "operations": self._operations,
+                "mean_batch_size": round(self._operations / self._batches, 2) if self._batches else 0.0,
+                "largest_batch": self._largest_batch,
+                "pending": self._queue.qsize(),
+            }
+
+
+write_queue = WriteQueue(engine, settings.write_batch_window_ms, settings.write_batch_max_size)
+
+# 异步模式下同一进程的写事务依次执行：写事务的每条语句都要回到事件循环，持有写锁的时间
+# 随事件循环的负载变长，其余写入在 busy_timeout 中轮询等待，并发高时会超时报 database is locked；
+# 在锁上排队则按先后顺序执行。多个进程之间仍由 busy_timeout 协调
+_async_write_lock = asyncio.Lock()
+
+
+async def run_write(db: DBSession, func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """执行写操作的 crud 函数
+
+    开启 WRITE_BATCHING 时交给写线程合并提交（不使用 db），否则与 run_db 相同，
+    异步模式下同一进程的写操作依次执行。交易、账户、分类、项目、预算和标签的写接口都经由这里；
+    修改用户资料后要清除认证缓存，须在真正提交之后，仍使用 run_db。
+    """
+    if settings.write_batching:
+        return await asyncio.wrap_future(write_queue.submit(func, *args, **kwargs))
+    if isinstance(db, AsyncSession):
+        async with _async_write_lock:
+            return await run_db(db, func, *args, **kwargs)
+    return await run_db(db, func, *args, **kwargs)
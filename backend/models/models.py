@@ -1,10 +1,55 @@
-from sqlalchemy import Column, Integer, String, DateTime, Boolean, ForeignKey, Text, Date
-from sqlalchemy.types import DECIMAL
+from decimal import Decimal, ROUND_HALF_UP
+from sqlalchemy import Column, Integer, String, DateTime, Boolean, ForeignKey, Text, Date, Index, DDL, MetaData, Table, event
+from sqlalchemy.types import TypeDecorator
 from sqlalchemy.orm import relationship
-from sqlalchemy.sql import func
+from sqlalchemy.sql import func, operators
 from database.database import Base
 
 
+# 金额绝对值的上限（不含）：换算为分后，单笔金额及大量交易的汇总都在 SQLite 的 64 位整数范围内
+MAX_AMOUNT = 10 ** 12
+
+
+def to_cents(value) -> int:
+    """金额换算为整数分，按十进制四舍五入；float 先取最短的十进制表示，0.1 + 0.2 得到 30"""
+    if isinstance(value, int):
+        return value * 100
+    return int(Decimal(str(value)).scaleb(2).quantize(Decimal(1), rounding=ROUND_HALF_UP))
+
+
+class Money(TypeDecorator):
+    """金额：数据库中存为整数分，Python 中为精确到分的 float
+
+    SUM 等聚合在 SQLite 中是整数运算，结果精确；与金额比较、相加减的参数同样换算为分，
+    乘除的另一个操作数是倍数，按原值绑定。
+    """
+    impl = Integer
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        return None if value is None else to_cents(value)
+
+    def process_result_value(self, value, dialect):
+        return None if value is None else value / 100
+
+    class Comparator(TypeDecorator.Comparator):
+        def _adapt_expression(self, op, other_comparator):
+            # 金额乘除倍数的结果仍是金额（分）
+            if op in _SCALING_OPERATORS:
+                return op, self.type
+            return super()._adapt_expression(op, other_comparator)
+
+    comparator_factory = Comparator
+
+    def coerce_compared_value(self, op, value):
+        if op in _SCALING_OPERATORS:
+            return Integer()
+        return self
+
+
+_SCALING_OPERATORS = (operators.mul, operators.truediv, operators.floordiv)
+
+
 class User(Base):
     __tablename__ = "users"
 
@@ -28,10 +73,11 @@ class Account(Base):
     __tablename__ = "accounts"
 
     id = Column(Integer, primary_key=True, index=True)
-    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
     name = Column(String(100), nullable=False)
     type = Column(String(20), nullable=False)  # 'debit_card', 'credit_card', 'cash', etc.
-    initial_balance = Column(DECIMAL(10, 2), nullable=False, default=0.00)
+    initial_balance = Column(Money, nullable=False, default=0)
+    current_balance = Column(Money, nullable=False, default=0)  # 由交易增删改同步维护
     is_active = Column(Boolean, nullable=False, default=True)
 
     # 关系
@@ -43,7 +89,7 @@ class Project(Base):
     __tablename__ = "projects"
 
     id = Column(Integer, primary_key=True, index=True)
-    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
     name = Column(String(100), nullable=False)
     description = Column(Text)
     start_date = Column(Date)
@@ -51,14 +97,15 @@ class Project(Base):
 
     # 关系
     user = relationship("User", back_populates="projects")
-    transactions = relationship("Transaction", back_populates="project")
+    # 删除时由 crud 按 user_id 批量置空交易的 project_id，不逐条加载交易
+    transactions = relationship("Transaction", back_populates="project", passive_deletes=True)
 
 
 class Category(Base):
     __tablename__ = "categories"
 
     id = Column(Integer, primary_key=True, index=True)
-    user_id = Column(Integer, ForeignKey("users.id"), nullable=True)  # NULL为系统预设分类
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=True, index=True)  # NULL为系统预设分类
     parent_category_id = Column(Integer, ForeignKey("categories.id"), nullable=True)
     name = Column(String(50), nullable=False)
     type = Column(String(10), nullable=False)  # 'income' 或 'expense'
@@ -67,8 +114,9 @@ class Category(Base):
     # 关系
     user = relationship("User", back_populates="categories")
     parent_category = relationship("Category", remote_side=[id])
-    transactions = relationship("Transaction", back_populates="category")
-    budgets = relationship("Budget", back_populates="category")
+    # 删除时由 crud 按 user_id 批量置空交易和预算的 category_id，不逐条加载
+    transactions = relationship("Transaction", back_populates="category", passive_deletes=True)
+    budgets = relationship("Budget", back_populates="category", passive_deletes=True)
 
 
 class Transaction(Base):
@@ -81,7 +129,7 @@ class Transaction(Base):
     category_id = Column(Integer, ForeignKey("categories.id"), nullable=True)
     type = Column(String(10), nullable=False)  # 'income' 或 'expense'
     title = Column(String(255))
-    amount = Column(DECIMAL(10, 2), nullable=False)
+    amount = Column(Money, nullable=False)
     currency = Column(String(3), nullable=False)
     transaction_date = Column(DateTime(timezone=True), nullable=False)
     notes = Column(Text)
@@ -94,12 +142,31 @@ class Transaction(Base):
     category = relationship("Category", back_populates="transactions")
     tags = relationship("Tag", secondary="transaction_tags", back_populates="transactions")
 
+    # 所有查询都带 user_id，复合索引覆盖列表分页和排序、项目统计和按账户/分类筛选；
+    # 按日期的索引附带现金流汇总和透视汇总缓存用到的列，按日期汇总和加载交易列时不回表；
+    # 按币种的索引使汇总换算只读取外币交易，没有外币交易的用户不受影响
+    __table_args__ = (
+        Index(
+            "ix_transactions_user_date_covering",
+            "user_id", "transaction_date", "id", "type", "amount", "account_id", "category_id", "project_id", "currency"
+        ),
+        Index(
+            "ix_transactions_user_currency_covering",
+            "user_id", "currency", "type", "transaction_date", "amount", "account_id", "category_id", "project_id"
+        ),
+        Index("ix_transactions_user_amount_id", "user_id", "amount", "id"),
+        Index("ix_transactions_user_project_type_amount", "user_id", "project_id", "type", "amount"),
+        Index("ix_transactions_user_account_type_amount", "user_id", "account_id", "type", "amount"),
+        Index("ix_transactions_user_category_date", "user_id", "category_id", "transaction_date"),
+        Index("ix_transactions_user_type_date", "user_id", "type", "transaction_date"),
+    )
+
 
 class Tag(Base):
     __tablename__ = "tags"
 
     id = Column(Integer, primary_key=True, index=True)
-    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
     name = Column(String(50), nullable=False)
 
     # 关系
@@ -113,17 +180,163 @@ class TransactionTag(Base):
     transaction_id = Column(Integer, ForeignKey("transactions.id"), primary_key=True)
     tag_id = Column(Integer, ForeignKey("tags.id"), primary_key=True)
 
+    __table_args__ = (
+        Index("ix_transaction_tags_tag_transaction", "tag_id", "transaction_id"),
+    )
+
 
 class Budget(Base):
     __tablename__ = "budgets"
 
     id = Column(Integer, primary_key=True, index=True)
-    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False, index=True)
     category_id = Column(Integer, ForeignKey("categories.id"), nullable=True)  # NULL为总预算
-    amount = Column(DECIMAL(10, 2), nullable=False)
+    amount = Column(Money, nullable=False)
     period = Column(String(20), nullable=False)  # 'monthly', 'yearly', etc.
     start_date = Column(Date, nullable=False)
 
     # 关系
     user = relationship("User", back_populates="budgets")
     category = relationship("Category", back_populates="budgets")
+
+
+class MonthlyRollup(Base):
+    """按月预聚合的交易金额和笔数，由交易的增删改在同一事务中增量维护
+
+    主键列不能为 NULL，交易未关联分类或项目时 category_id、project_id 记为 0。
+    """
+    __tablename__ = "monthly_rollups"
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    month = Column(String(7), primary_key=True)  # 'YYYY-MM'
+    category_id = Column(Integer, primary_key=True, default=0)
+    project_id = Column(Integer, primary_key=True, default=0)
+    account_id = Column(Integer, primary_key=True)
+    type = Column(String(10), primary_key=True)
+    currency = Column(String(3), primary_key=True)
+    total = Column(Money, nullable=False, default=0)
+    transaction_count = Column(Integer, nullable=False, default=0)
+
+
+class DataVersion(Base):
+    """每个用户每类资源的数据版本号，资源的每次写入都在同一事务中递增
+
+    列表和详情接口据此生成 ETag，客户端数据未变化时直接返回 304。
+    """
+    __tablename__ = "data_versions"
+
+    user_id = Column(Integer, ForeignKey("users.id"), primary_key=True)
+    resource = Column(String(20), primary_key=True)  # 'transactions', 'accounts', 'projects'
+    version = Column(Integer, nullable=False, default=0)
+
+
+# 交易标题和备注的全文索引
+#
+# transactions_fts 是以 transactions 为外部内容表的 FTS5 虚拟表，只存索引不存原文，
+# 由触发器在 transactions 增删改时同步，所有写入路径（crud、批量导入、迁移）都无需额外处理。
+# trigram 分词按任意连续 3 个字符建索引，中文无需分词即可按子串匹配，英文同时支持前缀匹配。
+TRANSACTION_SEARCH_DDL = [
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS transactions_fts USING fts5(
+        title, notes, content='transactions', content_rowid='id', tokenize='trigram'
+    )
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS transactions_fts_insert AFTER INSERT ON transactions BEGIN
+        INSERT INTO transactions_fts(rowid, title, notes) VALUES (new.id, new.title, new.notes);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS transactions_fts_delete AFTER DELETE ON transactions BEGIN
+        INSERT INTO transactions_fts(transactions_fts, rowid, title, notes) VALUES ('delete', old.id, old.title, old.notes);
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS transactions_fts_update AFTER UPDATE OF title, notes ON transactions BEGIN
+        INSERT INTO transactions_fts(transactions_fts, rowid, title, notes) VALUES ('delete', old.id, old.title, old.notes);
+        INSERT INTO transactions_fts(rowid, title, notes) VALUES (new.id, new.title, new.notes);
+    END
+    """,
+]
+
+for _statement in TRANSACTION_SEARCH_DDL:
+    event.listen(Transaction.__table__, "after_create", DDL(_statement).execute_if(dialect="sqlite"))
+
+
+# 短词索引
+#
+# trigram 无法匹配不足 3 个字符的词（如最常见的两个汉字的词）。transactions_fts_bigram 是 unicode61 分词的
+# 无内容 FTS5 表：标题和备注每个位置上的 2 个字符（末尾为 1 个字符）以空格分隔后写入，两个字符的词按词条
+# 精确匹配，一个字符的词按前缀匹配（prefix='1' 为单字符前缀建索引）。触发器中不能使用递归 CTE，借助位置表 transactions_fts_positions
+# 逐位置取子串；超过 SEARCH_BIGRAM_MAX_LENGTH 个字符的文本只索引开头部分并额外写入 overflow 词条，
+# 搜索短词时总是包含这些交易，再由 LIKE 判断。
+SEARCH_BIGRAM_MAX_LENGTH = 4096
+
+
+def _bigram_text(prefix: str) -> str:
+    """生成标题和备注的短词索引内容的 SQL 表达式，prefix 为 new 或 old"""
+    parts = []
+    for column in ("title", "notes"):
+        value = f"{prefix}.{column}"
+        parts.append(
+            f"coalesce((SELECT group_concat(substr({value}, n, 2), ' ') FROM transactions_fts_positions "
+            f"WHERE n <= length({value})), '')"
+        )
+        parts.append(f"CASE WHEN length({value}) > {SEARCH_BIGRAM_MAX_LENGTH} THEN ' overflow' ELSE '' END")
+    return " || ' ' || ".join(parts)
+
+
+TRANSACTION_BIGRAM_DDL = [
+    "CREATE TABLE IF NOT EXISTS transactions_fts_positions (n INTEGER PRIMARY KEY)",
+    f"""
+    INSERT OR IGNORE INTO transactions_fts_positions (n)
+    WITH RECURSIVE positions(n) AS (SELECT 1 UNION ALL SELECT n + 1 FROM positions WHERE n < {SEARCH_BIGRAM_MAX_LENGTH})
+    SELECT n FROM positions
+    """,
+    """
+    CREATE VIRTUAL TABLE IF NOT EXISTS transactions_fts_bigram USING fts5(
+        grams, content='', tokenize='unicode61 remove_diacritics 0', prefix='1'
+    )
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS transactions_fts_bigram_insert AFTER INSERT ON transactions BEGIN
+        INSERT INTO transactions_fts_bigram(rowid, grams) VALUES (new.id, {_bigram_text("new")});
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS transactions_fts_bigram_delete AFTER DELETE ON transactions BEGIN
+        INSERT INTO transactions_fts_bigram(transactions_fts_bigram, rowid, grams) VALUES ('delete', old.id, {_bigram_text("old")});
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS transactions_fts_bigram_update AFTER UPDATE OF title, notes ON transactions BEGIN
+        INSERT INTO transactions_fts_bigram(transactions_fts_bigram, rowid, grams) VALUES ('delete', old.id, {_bigram_text("old")});
+        INSERT INTO transactions_fts_bigram(rowid, grams) VALUES (new.id, {_bigram_text("new")});
+    END
+    """,
+]
+# 从 transactions 重新写入短词索引，transactions_fts_bigram 需先清空
+TRANSACTION_BIGRAM_FILL = (
+    f"INSERT INTO transactions_fts_bigram(rowid, grams) SELECT id, {_bigram_text('transactions')} FROM transactions"
+)
+
+for _statement in TRANSACTION_BIGRAM_DDL:
+    event.listen(Transaction.__table__, "after_create", DDL(_statement).execute_if(dialect="sqlite"))
+
+# 只用于构造查询，不属于 Base.metadata，create_all 不会按普通表创建它
+transactions_fts = Table(
+    "transactions_fts", MetaData(),
+    Column("rowid", Integer, primary_key=True),
+    Column("transactions_fts", Text),  # 与表同名的隐藏列，用于 MATCH 和 rebuild 等命令
+    Column("title", Text),
+    Column("notes", Text),
+    Column("rank"),
+)
+
+transactions_fts_bigram = Table(
+    "transactions_fts_bigram", MetaData(),
+    Column("rowid", Integer, primary_key=True),
+    Column("transactions_fts_bigram", Text),
+    Column("grams", Text),
+    Column("rank"),
+)
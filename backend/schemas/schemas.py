@@ -1,6 +1,19 @@
-from pydantic import BaseModel
-from typing import Optional, List
+from pydantic import AfterValidator, BaseModel, Field
+from typing import Optional, List, Union
+from typing_extensions import Annotated
 from datetime import datetime, date
+from models.models import MAX_AMOUNT, to_cents
+
+
+def _round_to_cents(value: float) -> float:
+    return to_cents(value) / 100
+
+
+# 请求中的金额：绝对值小于 MAX_AMOUNT，按十进制四舍五入到分，与数据库中存储的整数分一致
+Amount = Annotated[float, Field(gt=-MAX_AMOUNT, lt=MAX_AMOUNT), AfterValidator(_round_to_cents)]
+
+# 请求中的币种：三个字母的 ISO 4217 代码，统一为大写，与汇率表一致
+CurrencyCode = Annotated[str, Field(pattern=r"^[A-Za-z]{3}$"), AfterValidator(str.upper)]
 
 
 # User schemas
@@ -11,13 +24,14 @@ class UserBase(BaseModel):
 
 
 class UserCreate(UserBase):
+    default_currency: CurrencyCode = "CNY"
     password: str
 
 
 class UserUpdate(BaseModel):
     username: Optional[str] = None
     email: Optional[str] = None
-    default_currency: Optional[str] = None
+    default_currency: Optional[CurrencyCode] = None
 
 
 class User(UserBase):
@@ -37,24 +51,46 @@ class AccountBase(BaseModel):
 
 
 class AccountCreate(AccountBase):
-    pass
+    initial_balance: Amount = 0.00
 
 
 class AccountUpdate(BaseModel):
     name: Optional[str] = None
     type: Optional[str] = None
-    initial_balance: Optional[float] = None
+    initial_balance: Optional[Amount] = None
     is_active: Optional[bool] = None
 
 
 class Account(AccountBase):
     id: int
     user_id: int
+    current_balance: float = 0.00
 
     class Config:
         from_attributes = True
 
 
+class AccountPage(BaseModel):
+    items: List[Account]
+    next_cursor: Optional[str] = None
+
+
+class AccountCurrentBalance(BaseModel):
+    account_id: int
+    balance: float
+
+
+class AccountBalance(BaseModel):
+    account_id: int
+    name: str
+    type: str
+    is_active: bool
+    initial_balance: float
+    total_income: float
+    total_expense: float
+    balance: float
+
+
 # Project schemas
 class ProjectBase(BaseModel):
     name: str
@@ -82,6 +118,20 @@ class Project(ProjectBase):
         from_attributes = True
 
 
+class ProjectPage(BaseModel):
+    items: List[Project]
+    next_cursor: Optional[str] = None
+
+
+class ProjectStats(BaseModel):
+    project_id: int
+    name: str
+    total_income: float
+    total_expense: float
+    net_amount: float
+    transaction_count: int
+
+
 # Category schemas
 class CategoryBase(BaseModel):
     name: str
@@ -109,6 +159,14 @@ class Category(CategoryBase):
         from_attributes = True
 
 
+class CategoryTreeNode(Category):
+    # with_totals 时才返回，包含所有子孙分类
+    income: Optional[float] = None
+    expense: Optional[float] = None
+    transaction_count: Optional[int] = None
+    children: List["CategoryTreeNode"] = []
+
+
 # Transaction schemas
 class TransactionBase(BaseModel):
     account_id: int
@@ -123,6 +181,8 @@ class TransactionBase(BaseModel):
 
 
 class TransactionCreate(TransactionBase):
+    amount: Amount
+    currency: CurrencyCode
     tag_ids: Optional[List[int]] = []
 
 
@@ -132,8 +192,8 @@ class TransactionUpdate(BaseModel):
     category_id: Optional[int] = None
     type: Optional[str] = None
     title: Optional[str] = None
-    amount: Optional[float] = None
-    currency: Optional[str] = None
+    amount: Optional[Amount] = None
+    currency: Optional[CurrencyCode] = None
     transaction_date: Optional[datetime] = None
     notes: Optional[str] = None
     tag_ids: Optional[List[int]] = None
@@ -148,6 +208,54 @@ class Transaction(TransactionBase):
         from_attributes = True
 
 
+class TransactionFilter(BaseModel):
+    """交易的筛选条件，列表、统计和导出共用
+
+    日期范围包含 start_date 和 end_date 当天；include_subcategories 时 category_id
+    同时匹配其所有子分类。
+    """
+    start_date: Optional[date] = None
+    end_date: Optional[date] = None
+    account_id: Optional[int] = None
+    category_id: Optional[int] = None
+    include_subcategories: bool = False
+    project_id: Optional[int] = None
+    type: Optional[str] = None
+    currency: Optional[CurrencyCode] = None
+    min_amount: Optional[Amount] = None
+    max_amount: Optional[Amount] = None
+
+
+class TransactionStats(BaseModel):
+    transaction_count: int
+    total_income: float
+    total_expense: float
+    net_amount: float
+    currency: str  # 金额换算后的币种，即用户的默认币种
+
+
+class TransactionRelation(BaseModel):
+    """交易列表 expand 参数展开的账户、分类、项目或标签"""
+    id: int
+    name: str
+
+
+class TransactionPage(BaseModel):
+    items: List[Transaction]
+    next_cursor: Optional[str] = None
+
+
+class TransactionImportError(BaseModel):
+    line: int
+    error: str
+
+
+class TransactionImportResult(BaseModel):
+    imported: int
+    failed: int
+    errors: List[TransactionImportError]
+
+
 # Tag schemas
 class TagBase(BaseModel):
     name: str
@@ -169,6 +277,25 @@ class Tag(TagBase):
         from_attributes = True
 
 
+class TagPage(BaseModel):
+    items: List[Tag]
+    next_cursor: Optional[str] = None
+
+
+class TagStats(BaseModel):
+    id: int
+    name: str
+    transaction_count: int
+    total_income: float
+    total_expense: float
+    net_amount: float
+
+
+class TagStatsPage(BaseModel):
+    items: List[TagStats]
+    next_cursor: Optional[str] = None
+
+
 # Budget schemas
 class BudgetBase(BaseModel):
     category_id: Optional[int] = None
@@ -178,12 +305,12 @@ class BudgetBase(BaseModel):
 
 
 class BudgetCreate(BudgetBase):
-    pass
+    amount: Amount
 
 
 class BudgetUpdate(BaseModel):
     category_id: Optional[int] = None
-    amount: Optional[float] = None
+    amount: Optional[Amount] = None
     period: Optional[str] = None
     start_date: Optional[date] = None
 
@@ -196,6 +323,85 @@ class Budget(BudgetBase):
         from_attributes = True
 
 
+class BudgetPage(BaseModel):
+    items: List[Budget]
+    next_cursor: Optional[str] = None
+
+
+class BudgetPeriodProgress(BaseModel):
+    start_date: date
+    end_date: date
+    spent: float
+    remaining: float
+    ratio: Optional[float] = None
+
+
+class BudgetProgress(BaseModel):
+    budget_id: int
+    category_id: Optional[int] = None
+    category_ids: Optional[List[int]] = None
+    period: str
+    amount: float
+    current: Optional[BudgetPeriodProgress] = None
+    periods: List[BudgetPeriodProgress]
+
+
+# Dashboard schemas
+class DashboardSummary(BaseModel):
+    total_income: float
+    total_expense: float
+    net_income: float
+    currency: str  # 总收支和项目统计换算后的币种
+    account_count: int
+    accounts: List[AccountBalance]
+    projects: List[ProjectStats]
+    recent_transactions: List[Transaction]
+
+
+# Report schemas
+class MonthlyReportItem(BaseModel):
+    month: str
+    type: str
+    currency: str
+    category_id: Optional[int] = None
+    project_id: Optional[int] = None
+    account_id: Optional[int] = None
+    total: float
+    transaction_count: int
+
+
+class CashflowSeries(BaseModel):
+    """按分类或账户拆分的收支，数组与 CashflowReport.buckets 一一对应"""
+    id: Optional[int] = None  # 为空表示未分类
+    name: Optional[str] = None
+    income: List[float]
+    expense: List[float]
+    net: List[float]
+    balance: Optional[List[float]] = None  # 仅按账户拆分时返回
+
+
+class CashflowReport(BaseModel):
+    bucket: str
+    currency: str  # 金额和余额换算后的币种
+    buckets: List[date]  # 每个周期的起始日
+    income: List[float]
+    expense: List[float]
+    net: List[float]
+    balance: List[float]  # 所有账户余额之和在每个周期末的值
+    series: List[CashflowSeries] = []
+
+
+class PivotReport(BaseModel):
+    rows: List[str]  # 行维度
+    columns: List[str]  # 列维度
+    measure: str
+    currency: str  # 金额换算后的币种
+    # 每项依次为各维度的取值，只包含有交易的组合
+    row_keys: List[List[Union[int, str, None]]]
+    column_keys: List[List[Union[int, str, None]]]
+    values: List[List[Union[int, float]]]  # values[i][j] 对应 row_keys[i] 与 column_keys[j]，笔数为整数
+
+
 # Authentication schemas
 class Token(BaseModel):
     access_token: str
@@ -204,3 +410,4 @@ class Token(BaseModel):
 
 class TokenData(BaseModel):
     username: Optional[str] = None
+    user_id: Optional[int] = None
@@ -0,0 +1,59 @@
+"""
+测试公共夹具
+
+导入 app 之前切换到临时目录，使用独立的 monika.db，不影响开发数据库。
+所有测试共用一个 TestClient，每个测试通过 register 注册各自的用户，数据按用户隔离。
+"""
+import itertools
+import os
+import sys
+import tempfile
+import pytest
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BACKEND_DIR not in sys.path:
+    sys.path.insert(0, BACKEND_DIR)
+os.chdir(tempfile.mkdtemp(prefix="monika-test-"))
+
+_usernames = (f"user{i}" for i in itertools.count(1))
+
+
+@pytest.fixture(scope="session")
+def client():
+    from fastapi.testclient import TestClient
+    from app.main import app
+
+    with TestClient(app) as test_client:
+        yield test_client
+
+
+@pytest.fixture
+def login(client):
+    """登录并返回认证请求头"""
+
+    def login_user(username: str, password: str = "secret") -> dict:
+        response = client.post("/auth/token/", data={"username": username, "password": password})
+        assert response.status_code == 200, response.text
+        return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+    return login_user
+
+
+@pytest.fixture
+def register(client, login):
+    """注册新用户并返回认证请求头，用户名不指定时自动生成"""
+
+    def register_user(username: str = None, password: str = "secret", **fields) -> dict:
+        username = username or next(_usernames)
+        response = client.post("/auth/register/", json={
+            "username": username, "email": f"{username}@example.com", "password": password, **fields
+        })
+        assert response.status_code == 200, response.text
+        return login(username, password)
+
+    return register_user
+
+
+@pytest.fixture
+def headers(register):
+    return register()
@@ -0,0 +1,50 @@
+"""金额的范围校验与按分存储"""
+import pytest
+
+
+@pytest.fixture
+def account_id(client, headers):
+    return client.post("/accounts", json={"name": "现金", "type": "cash", "initial_balance": 0}, headers=headers).json()["id"]
+
+
+def _transaction(account_id, amount):
+    return {
+        "account_id": account_id, "type": "expense", "amount": amount, "currency": "CNY",
+        "transaction_date": "2024-01-01T10:00:00"
+    }
+
+
+@pytest.mark.parametrize("amount", [1e20, -1e20, 1e12, "Infinity", "NaN"])
+def test_out_of_range_transaction_amount_is_rejected(client, headers, account_id, amount):
+    response = client.post("/transactions", json=_transaction(account_id, amount), headers=headers)
+    assert response.status_code == 422
+
+
+def test_out_of_range_update_is_rejected(client, headers, account_id):
+    transaction_id = client.post("/transactions", json=_transaction(account_id, 1), headers=headers).json()["id"]
+    response = client.put(f"/transactions/{transaction_id}", json={"amount": 1e20}, headers=headers)
+    assert response.status_code == 422
+
+
+def test_out_of_range_account_and_budget_amounts_are_rejected(client, headers, account_id):
+    assert client.post(
+        "/accounts", json={"name": "a", "type": "cash", "initial_balance": 1e20}, headers=headers
+    ).status_code == 422
+    assert client.put(f"/accounts/{account_id}", json={"initial_balance": -1e20}, headers=headers).status_code == 422
+    assert client.post(
+        "/budgets", json={"amount": 1e20, "period": "monthly", "start_date": "2024-01-01"}, headers=headers
+    ).status_code == 422
+
+
+def test_out_of_range_amount_filter_is_rejected(client, headers):
+    assert client.get("/transactions?min_amount=1e20", headers=headers).status_code == 422
+
+
+def test_amounts_are_rounded_to_cents(client, headers, account_id):
+    largest = 10 ** 12 - 0.01
+    response = client.post("/transactions", json=_transaction(account_id, largest), headers=headers)
+    assert response.status_code == 200
+    assert response.json()["amount"] == largest
+    client.post("/transactions", json=_transaction(account_id, 0.1 + 0.2), headers=headers)
+    stats = client.get("/transactions/stats?max_amount=1", headers=headers).json()
+    assert stats["total_expense"] == 0.3
@@ -0,0 +1,25 @@
+"""认证与用户缓存"""
+
+
+def test_token_issued_before_rename_does_not_authenticate_new_owner(client, register, login):
+    old_headers = register("alice")
+    assert client.get("/users/me", headers=old_headers).json()["username"] == "alice"
+
+    assert client.put("/users/me", json={"username": "bob"}, headers=old_headers).status_code == 200
+    register("alice", email="alice2@example.com")
+    # 新用户的 token 把 alice 对应的用户写入缓存
+    new_owner = client.get("/users/me", headers=login("alice")).json()
+    assert new_owner["username"] == "alice"
+
+    response = client.get("/users/me", headers=old_headers)
+    assert response.status_code == 401
+
+    renamed = client.get("/users/me", headers=login("bob")).json()
+    assert renamed["username"] == "bob"
+    assert renamed["id"] != new_owner["id"]
+
+
+def test_cached_user_reflects_profile_update(client, headers):
+    assert client.get("/users/me", headers=headers).json()["default_currency"] == "CNY"
+    client.put("/users/me", json={"default_currency": "usd"}, headers=headers)
+    assert client.get("/users/me", headers=headers).json()["default_currency"] == "USD"
@@ -0,0 +1,130 @@
+"""账户余额与月度汇总随交易增删改维护，与交易记录重新计算的结果一致"""
+import pytest
+from crud.crud import recompute_balances, recompute_monthly_rollups
+from database.database import SessionLocal
+from models.models import Account
+
+
+@pytest.fixture
+def user_id(client, headers):
+    return client.get("/users/me", headers=headers).json()["id"]
+
+
+def _post(client, headers, url, body):
+    response = client.post(url, json=body, headers=headers)
+    assert response.status_code == 200, response.text
+    return response.json()["id"]
+
+
+def _put(client, headers, url, body):
+    response = client.put(url, json=body, headers=headers)
+    assert response.status_code == 200, response.text
+
+
+def _assert_no_drift(user_id):
+    with SessionLocal() as db:
+        assert recompute_balances(db, user_id=user_id, fix=False) == []
+        assert recompute_monthly_rollups(db, user_id=user_id, fix=False) == []
+
+
+def _balances(client, headers, *account_ids):
+    return [client.get(f"/accounts/{account_id}/balance", headers=headers).json()["balance"] for account_id in account_ids]
+
+
+def _monthly(client, headers):
+    rows = client.get("/reports/monthly?group_by=category&group_by=account", headers=headers).json()
+    return sorted((row["month"], row["type"], row["category_id"], row["account_id"], row["total"], row["transaction_count"]) for row in rows)
+
+
+def test_transaction_changes_keep_derived_data_in_sync(client, headers, user_id):
+    cash = _post(client, headers, "/accounts", {"name": "现金", "type": "cash", "initial_balance": 100})
+    card = _post(client, headers, "/accounts", {"name": "银行卡", "type": "bank", "initial_balance": 0})
+    food = _post(client, headers, "/categories", {"name": "餐饮", "type": "expense"})
+    travel = _post(client, headers, "/categories", {"name": "旅行", "type": "expense"})
+    project = _post(client, headers, "/projects", {"name": "装修"})
+
+    first = _post(client, headers, "/transactions", {
+        "account_id": cash, "category_id": food, "type": "expense", "amount": 30.5, "currency": "CNY",
+        "transaction_date": "2024-01-15T10:00:00"
+    })
+    second = _post(client, headers, "/transactions", {
+        "account_id": card, "type": "income", "amount": 1000, "currency": "CNY",
+        "transaction_date": "2024-01-20T10:00:00", "project_id": project
+    })
+    _assert_no_drift(user_id)
+    assert _balances(client, headers, cash, card) == [69.5, 1000]
+
+    # 金额
+    _put(client, headers, f"/transactions/{first}", {"amount": 12.25})
+    _assert_no_drift(user_id)
+    assert _balances(client, headers, cash, card) == [87.75, 1000]
+
+    # 类型
+    _put(client, headers, f"/transactions/{second}", {"type": "expense"})
+    _assert_no_drift(user_id)
+    assert _balances(client, headers, cash, card) == [87.75, -1000]
+
+    # 账户和分类
+    _put(client, headers, f"/transactions/{first}", {"account_id": card, "category_id": travel})
+    _assert_no_drift(user_id)
+    assert _balances(client, headers, cash, card) == [100, -1012.25]
+
+    # 日期跨月
+    _put(client, headers, f"/transactions/{first}", {"transaction_date": "2024-03-01T08:00:00"})
+    _assert_no_drift(user_id)
+    assert _monthly(client, headers) == [
+        ("2024-01", "expense", None, card, 1000, 1),
+        ("2024-03", "expense", travel, card, 12.25, 1),
+    ]
+
+    # 同时修改多个字段
+    _put(client, headers, f"/transactions/{second}", {
+        "type": "income", "amount": 500, "account_id": cash, "transaction_date": "2024-02-10T08:00:00", "project_id": None
+    })
+    _assert_no_drift(user_id)
+    assert _balances(client, headers, cash, card) == [600, -12.25]
+
+    # 初始余额
+    _put(client, headers, f"/accounts/{cash}", {"initial_balance": 50})
+    _assert_no_drift(user_id)
+    assert _balances(client, headers, cash, card) == [550, -12.25]
+
+    assert client.delete(f"/transactions/{first}", headers=headers).status_code == 200
+    _assert_no_drift(user_id)
+    assert _balances(client, headers, cash, card) == [550, 0]
+    assert _monthly(client, headers) == [("2024-02", "income", None, cash, 500, 1)]
+
+    assert client.delete(f"/transactions/{second}", headers=headers).status_code == 200
+    _assert_no_drift(user_id)
+    assert _balances(client, headers, cash, card) == [50, 0]
+    assert _monthly(client, headers) == []
+
+
+def test_import_keeps_derived_data_in_sync(client, headers, user_id):
+    account_id = _post(client, headers, "/accounts", {"name": "现金", "type": "cash", "initial_balance": 10})
+    body = "account_id,type,amount,currency,transaction_date\n" + "".join(
+        f"{account_id},{'income' if i % 3 == 0 else 'expense'},{i + 0.5},CNY,2024-{i % 12 + 1:02d}-01\n" for i in range(30)
+    )
+    response = client.post(
+        "/transactions/import?chunk_size=7", headers=headers,
+        files={"file": ("transactions.csv", body.encode(), "text/csv")}
+    )
+    assert response.json()["imported"] == 30
+    _assert_no_drift(user_id)
+    expected = 10 + sum((i + 0.5) * (1 if i % 3 == 0 else -1) for i in range(30))
+    assert _balances(client, headers, account_id) == [expected]
+
+
+def test_drift_is_reported_and_fixed(client, headers, user_id):
+    account_id = _post(client, headers, "/accounts", {"name": "现金", "type": "cash", "initial_balance": 0})
+    _post(client, headers, "/transactions", {
+        "account_id": account_id, "type": "expense", "amount": 8, "currency": "CNY", "transaction_date": "2024-05-01T10:00:00"
+    })
+    with SessionLocal() as db:
+        db.get(Account, account_id).current_balance = 1
+        db.commit()
+        assert recompute_balances(db, user_id=user_id, fix=False) == [
+            {"account_id": account_id, "user_id": user_id, "stored": 1.0, "expected": -8.0}
+        ]
+        assert len(recompute_balances(db, user_id=user_id)) == 1
+    _assert_no_drift(user_id)
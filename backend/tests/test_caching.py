@@ -0,0 +1,82 @@
+"""ETag 与 If-None-Match"""
+import pytest
+
+
+@pytest.fixture
+def account_id(client, headers):
+    return client.post("/accounts", json={"name": "现金", "type": "cash", "initial_balance": 0}, headers=headers).json()["id"]
+
+
+def _get(client, headers, url, etag=None):
+    return client.get(url, headers={**headers, **({"If-None-Match": etag} if etag else {})})
+
+
+def _etag(client, headers, url):
+    response = _get(client, headers, url)
+    assert response.status_code == 200, response.text
+    return response.headers["ETag"]
+
+
+def _create_transaction(client, headers, account_id, **fields):
+    response = client.post("/transactions", json={
+        "account_id": account_id, "type": "expense", "amount": 1, "currency": "CNY",
+        "transaction_date": "2024-01-01T10:00:00", **fields
+    }, headers=headers)
+    assert response.status_code == 200, response.text
+    return response.json()["id"]
+
+
+def test_matching_etag_returns_304(client, headers, account_id):
+    etag = _etag(client, headers, "/transactions")
+
+    response = _get(client, headers, "/transactions", etag)
+    assert response.status_code == 304
+    assert response.headers["ETag"] == etag
+    assert response.content == b""
+    assert _get(client, headers, "/transactions", f'W/"other", {etag}').status_code == 304
+    assert _get(client, headers, "/transactions", 'W/"other"').status_code == 200
+
+
+def test_etag_is_per_user(client, register, headers):
+    etag = _etag(client, headers, "/accounts")
+    assert _get(client, register(), "/accounts", etag).status_code == 200
+
+
+def test_write_invalidates_etag(client, headers, account_id):
+    transactions = _etag(client, headers, "/transactions")
+    balance = _etag(client, headers, f"/accounts/{account_id}/balance")
+
+    _create_transaction(client, headers, account_id)
+    assert _get(client, headers, "/transactions", transactions).status_code == 200
+    assert _get(client, headers, f"/accounts/{account_id}/balance", balance).status_code == 200
+    assert _get(client, headers, "/transactions", _etag(client, headers, "/transactions")).status_code == 304
+
+
+def test_tag_rename_and_delete_invalidate_tag_filtered_lists(client, headers, account_id):
+    tag_id = client.post("/tags", json={"name": "餐饮"}, headers=headers).json()["id"]
+    _create_transaction(client, headers, account_id, tag_ids=[tag_id])
+    urls = ("/transactions?tags=餐饮", "/transactions?expand=tags", "/transactions/stats?tags=餐饮")
+
+    etags = [_etag(client, headers, url) for url in urls]
+    client.put(f"/tags/{tag_id}", json={"name": "吃饭"}, headers=headers)
+    for url, etag in zip(urls, etags):
+        assert _get(client, headers, url, etag).status_code == 200, url
+    assert client.get("/transactions?tags=餐饮", headers=headers).json() == []
+
+    etags = [_etag(client, headers, url) for url in urls]
+    client.delete(f"/tags/{tag_id}", headers=headers)
+    for url, etag in zip(urls, etags):
+        assert _get(client, headers, url, etag).status_code == 200, url
+
+
+def test_tag_create_and_budget_writes_keep_etags(client, headers, account_id):
+    _create_transaction(client, headers, account_id)
+    urls = ("/transactions?tags=新标签", "/transactions?expand=tags", "/dashboard/summary")
+    etags = [_etag(client, headers, url) for url in urls]
+
+    client.post("/tags", json={"name": "新标签"}, headers=headers)
+    budget = client.post("/budgets", json={"amount": 100, "period": "monthly", "start_date": "2024-01-01"}, headers=headers)
+    assert budget.status_code == 200, budget.text
+    client.put(f"/budgets/{budget.json()['id']}", json={"amount": 200}, headers=headers)
+    for url, etag in zip(urls, etags):
+        assert _get(client, headers, url, etag).status_code == 304, url
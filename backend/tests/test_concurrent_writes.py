@@ -0,0 +1,114 @@
+"""
+并发写入：sync 与 async 两种 DATABASE_MODE、default 与 production 两种连接档位下，
+交易与项目的写入混合进行、一部分交易违反外键约束时，其余写入都不因 database is locked 失败，
+账户余额与成功写入的金额一致
+
+每种组合使用单独的数据库文件，替换 database.database 中的会话工厂后在进程内并发请求。
+"""
+import asyncio
+import httpx
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+from auth.auth import create_access_token
+from database import database, write_queue
+from database.migrations import init_db
+from models.models import Account, Project, User
+
+REQUESTS = 200
+CONCURRENCY = 100
+# 每 INVALID_EVERY 个写入中有一个交易引用不存在的账户、一个是新建项目
+INVALID_EVERY = 10
+
+
+@pytest.fixture
+def isolated_database(request, tmp_path, monkeypatch):
+    """按 (mode, profile) 建立独立的数据库和会话工厂"""
+    mode, profile = request.param
+    monkeypatch.setattr(database, "SQLITE_PROFILE", database.SQLITE_PROFILES[profile])
+    monkeypatch.setattr(database, "_release_limiter", None)
+    # asyncio.Lock 绑定首次使用它的事件循环，每个测试各自运行事件循环
+    monkeypatch.setattr(write_queue, "_async_write_lock", asyncio.Lock())
+
+    url = f"sqlite:///{tmp_path}/monika.db"
+    options = database._engine_options(url)
+    engine = create_engine(url, connect_args={"check_same_thread": False}, **options)
+    event.listen(engine, "connect", database.set_sqlite_pragma)
+    init_db(engine)
+    monkeypatch.setattr(database, "SessionLocal", sessionmaker(autocommit=False, autoflush=False, bind=engine))
+    # WRITE_BATCHING 开启时写线程使用的引擎
+    monkeypatch.setattr(write_queue.write_queue, "engine", engine)
+
+    async_engine = None
+    if mode == "async":
+        async_engine = create_async_engine(
+            url.replace("sqlite://", "sqlite+aiosqlite://", 1), poolclass=AsyncAdaptedQueuePool, **options
+        )
+        event.listen(async_engine.sync_engine, "connect", database.set_sqlite_pragma)
+        monkeypatch.setattr(database, "AsyncSessionLocal", async_sessionmaker(
+            async_engine, autocommit=False, autoflush=False, expire_on_commit=False
+        ))
+    else:
+        monkeypatch.setattr(database, "AsyncSessionLocal", None)
+
+    yield mode
+    if async_engine is not None:
+        asyncio.run(async_engine.dispose())
+    engine.dispose()
+
+
+def _create_user_and_account(username: str) -> dict:
+    with database.SessionLocal() as db:
+        user = User(username=username, email=f"{username}@example.com", password_hash="-")
+        db.add(user)
+        db.flush()
+        db.add(Account(user_id=user.id, name="现金", type="cash", initial_balance=0, current_balance=0))
+        db.commit()
+        token = create_access_token({"sub": user.username, "uid": user.id})
+    return {"Authorization": f"Bearer {token}"}
+
+
+async def _post_concurrently(headers: dict, account_id: int) -> list:
+    from app.main import app
+
+    # 违反外键约束的写入返回 500，不把异常抛给客户端
+    transport = httpx.ASGITransport(app=app, raise_app_exceptions=False)
+    semaphore = asyncio.Semaphore(CONCURRENCY)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test", timeout=None) as client:
+        async def post(i: int):
+            kind = {0: "invalid", INVALID_EVERY // 2: "project"}.get(i % INVALID_EVERY, "transaction")
+            async with semaphore:
+                if kind == "project":
+                    response = await client.post("/projects", headers=headers, json={"name": f"项目 {i}"})
+                else:
+                    response = await client.post("/transactions", headers=headers, json={
+                        "account_id": 999999 if kind == "invalid" else account_id, "type": "expense",
+                        "amount": i % 100 + 1, "currency": "CNY",
+                        "transaction_date": f"2024-{i % 12 + 1:02d}-{i % 28 + 1:02d}T12:00:00"
+                    })
+            return i, kind, response
+
+        return await asyncio.gather(*(post(i) for i in range(REQUESTS)))
+
+
+@pytest.mark.parametrize(
+    "isolated_database",
+    [(mode, profile) for mode in ("sync", "async") for profile in ("default", "production")],
+    indirect=True, ids=lambda param: "-".join(param)
+)
+def test_concurrent_writes_with_failures(isolated_database):
+    headers = _create_user_and_account(f"writer-{isolated_database}")
+    with database.SessionLocal() as db:
+        account_id = db.query(Account.id).order_by(Account.id.desc()).scalar()
+
+    results = asyncio.run(_post_concurrently(headers, account_id))
+
+    failed = [(i, response.status_code, response.text) for i, kind, response in results
+              if response.status_code != (500 if kind == "invalid" else 200)]
+    assert failed == []
+    expected_balance = -sum(i % 100 + 1 for i, kind, _ in results if kind == "transaction")
+    with database.SessionLocal() as db:
+        assert db.get(Account, account_id).current_balance == expected_balance
+        assert db.query(Project).count() == REQUESTS // INVALID_EVERY
@@ -0,0 +1,62 @@
+"""交易批量导入"""
+import pytest
+from sqlalchemy import text
+from database.database import engine
+
+
+@pytest.fixture
+def account_id(client, headers):
+    return client.post("/accounts", json={"name": "现金", "type": "cash", "initial_balance": 0}, headers=headers).json()["id"]
+
+
+@pytest.fixture
+def failing_title():
+    """标题为 boom 的交易在数据库中写入失败，模拟通过校验后仍写入失败的行"""
+    with engine.begin() as connection:
+        connection.execute(text(
+            "CREATE TRIGGER fail_import BEFORE INSERT ON transactions WHEN NEW.title = 'boom' "
+            "BEGIN SELECT RAISE(ABORT, 'boom'); END"
+        ))
+    yield "boom"
+    with engine.begin() as connection:
+        connection.execute(text("DROP TRIGGER fail_import"))
+
+
+def _import(client, headers, lines, chunk_size=2):
+    body = "account_id,type,amount,currency,transaction_date,title,tags\n" + "\n".join(lines) + "\n"
+    response = client.post(
+        f"/transactions/import?chunk_size={chunk_size}", headers=headers,
+        files={"file": ("transactions.csv", body.encode(), "text/csv")}
+    )
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def test_failed_chunk_does_not_poison_new_tag(client, headers, account_id, failing_title):
+    result = _import(client, headers, [
+        f"{account_id},expense,1,CNY,2024-01-01,{failing_title},新标签",
+        f"{account_id},expense,2,CNY,2024-01-02,a,新标签",
+        f"{account_id},expense,3,CNY,2024-01-03,b,新标签",
+        f"{account_id},expense,4,CNY,2024-01-04,c,新标签",
+    ])
+    # 第一块中只有写入失败的那一行计入错误，后一块复用同一个新标签
+    assert result == {"imported": 3, "failed": 1, "errors": [{"line": 2, "error": "写入失败"}]}
+
+    tags = client.get("/tags", headers=headers).json()
+    assert [tag["name"] for tag in tags] == ["新标签"]
+    transactions = client.get("/transactions?tags=新标签", headers=headers).json()
+    assert sorted(transaction["title"] for transaction in transactions) == ["a", "b", "c"]
+    assert client.get(f"/accounts/{account_id}/balance", headers=headers).json()["balance"] == -9
+
+
+def test_invalid_rows_are_reported_individually(client, headers, account_id):
+    result = _import(client, headers, [
+        f"{account_id},expense,1e20,CNY,2024-01-01,a,x",
+        f"{account_id},expense,2,CNY,2024-01-02,b,x",
+        "999999,expense,3,CNY,2024-01-03,c,x",
+        f"{account_id},expense,4,CNY,2024-01-04,d,x",
+    ])
+    assert result["imported"] == 2
+    assert [error["line"] for error in result["errors"]] == [2, 4]
+    assert result["errors"][0]["error"].startswith("amount:")
+    assert result["errors"][1]["error"] == "account_id: Account not found"
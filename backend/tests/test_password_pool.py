@@ -0,0 +1,22 @@
+"""密码哈希进程池的耗时指标"""
+from collections import deque
+from auth.password_pool import _summary
+
+
+def test_percentiles_use_nearest_rank():
+    summary = _summary(deque([0.001 * value for value in (406, 401, 450, 398, 500)]))
+    assert summary["p50"] == 406.0
+    assert summary["p95"] == 500.0
+    assert summary["p99"] == 500.0
+
+
+def test_percentiles_are_ordered_for_any_sample_size():
+    for size in range(1, 205):
+        summary = _summary(deque(0.001 * value for value in range(size, 0, -1)))
+        assert summary["p50"] <= summary["p95"] <= summary["p99"] <= size
+        assert summary["p50"] == (size + 1) // 2
+        assert summary["p99"] == (size if size < 100 else size - size // 100)
+
+
+def test_empty_summary():
+    assert _summary(deque()) == {"mean": 0.0, "p50": 0.0, "p95": 0.0, "p99": 0.0}
@@ -0,0 +1,237 @@
+"""
+检查 crud 查询的执行计划
+
+在内存数据库上依次调用 crud/crud.py 中的函数，记录其发出的每条
+SELECT/UPDATE/DELETE 语句，并用 EXPLAIN QUERY PLAN 检查是否存在
+全表扫描（SCAN <table>）。CHECKS 中的每个调用是一个测试用例，按顺序执行，
+靠后的删除操作会修改前面用例依赖的数据。
+
+crud 新增查询函数时，需要在 CHECKS 中补充对应的调用。交易筛选条件的
+所有组合（TransactionFilter 的每个子集）都会分别按日期和金额排序检查一遍。
+"""
+import re
+from itertools import combinations
+from datetime import date, datetime
+from typing import Callable, List, Tuple
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import Session, sessionmaker
+from sqlalchemy.pool import StaticPool
+from models.models import Base, User, Account, Project, Category, Transaction, Tag, Budget
+from schemas.schemas import (
+    UserUpdate, AccountUpdate, ProjectUpdate, CategoryUpdate,
+    TransactionCreate, TransactionUpdate, TagUpdate, BudgetUpdate, TransactionFilter
+)
+from crud import crud
+from crud.pagination import encode_cursor
+from crud.category_tree import invalidate_category_tree
+from crud import pivot
+
+SCAN_PATTERN = re.compile(r"^SCAN (\w+)")
+
+
+def _seed(db: Session) -> None:
+    user = User(username="plan", email="plan@example.com", password_hash="x")
+    db.add(user)
+    db.flush()
+    account = Account(user_id=user.id, name="cash", type="cash", initial_balance=0)
+    project = Project(user_id=user.id, name="project")
+    category = Category(user_id=user.id, name="food", type="expense")
+    tag = Tag(user_id=user.id, name="tag")
+    db.add_all([account, project, category, tag])
+    db.flush()
+    db.add(Budget(user_id=user.id, category_id=category.id, amount=100, period="monthly", start_date=date(2024, 1, 1)))
+    db.add(Budget(user_id=user.id, category_id=None, amount=700, period="weekly", start_date=date(2024, 1, 1)))
+    db.add(Budget(user_id=user.id, category_id=category.id, amount=1200, period="yearly", start_date=date(2023, 1, 1)))
+    transaction = Transaction(
+        user_id=user.id, account_id=account.id, project_id=project.id, category_id=category.id,
+        type="expense", amount=10, currency="CNY", transaction_date=datetime(2024, 1, 1)
+    )
+    transaction.tags.append(tag)
+    db.add(transaction)
+    # 外币交易使汇总查询走换算路径
+    foreign = Transaction(
+        user_id=user.id, account_id=account.id, project_id=project.id, category_id=category.id,
+        type="expense", amount=5, currency="USD", transaction_date=datetime(2024, 1, 2)
+    )
+    foreign.tags.append(tag)
+    db.add(foreign)
+    db.commit()
+    crud.rebuild_monthly_rollups(db, user_id=user.id)
+
+
+# 交易筛选条件：名称 -> TransactionFilter 参数
+FILTER_OPTIONS = {
+    "date": {"start_date": date(2024, 1, 1), "end_date": date(2024, 12, 31)},
+    "account": {"account_id": 1},
+    "category": {"category_id": 1, "include_subcategories": True},
+    "project": {"project_id": 1},
+    "type": {"type": "expense"},
+    "currency": {"currency": "CNY"},
+    "amount": {"min_amount": 1, "max_amount": 100},
+}
+
+
+def _filter_checks() -> List[Tuple[str, Callable[[Session], object]]]:
+    checks = []
+    for size in range(len(FILTER_OPTIONS) + 1):
+        for names in combinations(FILTER_OPTIONS, size):
+            filters = TransactionFilter(**{key: value for name in names for key, value in FILTER_OPTIONS[name].items()})
+            label = ",".join(names) or "none"
+            checks.append((f"get_transactions_page[{label}; date asc]", lambda db, filters=filters: crud.get_transactions_page(
+                db, user_id=1, after=encode_cursor([datetime(2024, 1, 1), 0]), filters=filters
+            )))
+            checks.append((f"get_transactions_page[{label}; amount desc]", lambda db, filters=filters: crud.get_transactions_page(
+                db, user_id=1, after=encode_cursor([50, 0]), filters=filters, sort="amount", order="desc"
+            )))
+    all_filters = TransactionFilter(**{key: value for option in FILTER_OPTIONS.values() for key, value in option.items()})
+    checks += [
+        ("get_transaction_rows_filtered", lambda db: crud.get_transaction_rows(
+            db, user_id=1, filters=all_filters, sort="amount", expand=crud.TRANSACTION_EXPANSIONS
+        )),
+        ("get_transaction_stats", lambda db: crud.get_transaction_stats(db, user_id=1)),
+        ("get_transaction_stats_filtered", lambda db: crud.get_transaction_stats(
+            db, user_id=1, tags=["tag"], filters=all_filters
+        )),
+        ("iter_transaction_export_filtered", lambda db: list(crud.iter_transaction_export(db, user_id=1, filters=all_filters))),
+        ("get_project_stats_filtered", lambda db: crud.get_project_stats(db, user_id=1, filters=all_filters)),
+        ("get_tag_stats_filtered", lambda db: crud.get_tag_stats(db, user_id=1, filters=all_filters)),
+    ]
+    return checks
+
+
+CHECKS: List[Tuple[str, Callable[[Session], object]]] = [
+    ("get_data_versions", lambda db: crud.get_data_versions(db, user_id=1, resources=crud.DATA_RESOURCES)),
+    ("get_user", lambda db: crud.get_user(db, 1)),
+    ("get_user_by_email", lambda db: crud.get_user_by_email(db, "plan@example.com")),
+    ("get_user_by_username", lambda db: crud.get_user_by_username(db, "plan")),
+    ("update_user", lambda db: crud.update_user(db, 1, UserUpdate(default_currency="CNY"))),
+    ("get_accounts", lambda db: crud.get_accounts(db, user_id=1)),
+    ("get_accounts_page", lambda db: crud.get_accounts_page(db, user_id=1, after=encode_cursor([0]))),
+    ("get_account", lambda db: crud.get_account(db, 1, 1)),
+    ("update_account", lambda db: crud.update_account(db, 1, 1, AccountUpdate(name="cash"))),
+    ("get_projects", lambda db: crud.get_projects(db, user_id=1)),
+    ("get_projects_page", lambda db: crud.get_projects_page(db, user_id=1, after=encode_cursor([0]))),
+    ("get_account_balance", lambda db: crud.get_account_balance(db, 1, 1)),
+    ("get_account_balances", lambda db: crud.get_account_balances(db, user_id=1)),
+    ("recompute_balances", lambda db: crud.recompute_balances(db, user_id=1, fix=False)),
+    ("get_project", lambda db: crud.get_project(db, 1, 1)),
+    ("update_project", lambda db: crud.update_project(db, 1, 1, ProjectUpdate(name="project"))),
+    ("get_project_transactions", lambda db: crud.get_project_transactions(db, project_id=1, user_id=1)),
+    ("get_project_stats", lambda db: crud.get_project_stats(db, user_id=1)),
+    ("get_project_stats_by_ids", lambda db: crud.get_project_stats(db, user_id=1, project_ids=[1], start_date=date(2024, 1, 1))),
+    ("get_categories", lambda db: crud.get_categories(db, user_id=1)),
+    ("get_category_tree_nodes", lambda db: crud.get_category_tree_nodes(db, user_id=1, with_totals=True, start_month="2024-01")),
+    ("get_category", lambda db: crud.get_category(db, 1, 1)),
+    ("update_category", lambda db: crud.update_category(db, 1, 1, CategoryUpdate(name="food"))),
+    ("get_transactions", lambda db: crud.get_transactions(db, user_id=1)),
+    ("get_transactions_page", lambda db: crud.get_transactions_page(db, user_id=1, after=encode_cursor([datetime(2024, 1, 1), 0]))),
+    ("search_transactions", lambda db: crud.search_transactions(db, user_id=1, q="coffee 早餐 午")),
+    ("search_transactions_by_date", lambda db: crud.search_transactions(db, user_id=1, q="coffee", sort="date")),
+    ("search_transactions_short_terms", lambda db: crud.search_transactions(db, user_id=1, q="午餐")),
+    ("search_transactions_single_char", lambda db: crud.search_transactions(db, user_id=1, q="午", sort="date")),
+    ("rebuild_transaction_search", lambda db: crud.rebuild_transaction_search(db)),
+    ("iter_transaction_export", lambda db: list(crud.iter_transaction_export(db, user_id=1))),
+    ("iter_transaction_export_by_tags", lambda db: list(crud.iter_transaction_export(db, user_id=1, tags=["tag", "other"], match="all"))),
+    ("get_transaction", lambda db: crud.get_transaction(db, 1, 1)),
+    ("create_transaction", lambda db: crud.create_transaction(db, TransactionCreate(
+        account_id=1, type="income", amount=1, currency="USD", transaction_date=datetime(2024, 2, 1), tag_ids=[1]
+    ), user_id=1)),
+    ("import_transactions", lambda db: crud.import_transactions(db, user_id=1, rows=iter([
+        (1, {"account_id": 1, "type": "expense", "amount": 1, "currency": "CNY", "transaction_date": "2024-03-01", "tags": ["tag", "new"]}),
+        (2, {"account_id": 1, "type": "income", "amount": 2, "currency": "CNY", "transaction_date": "2024-03-02"}),
+    ]))),
+    ("update_transaction", lambda db: crud.update_transaction(db, 1, 1, TransactionUpdate(amount=5, tag_ids=[1]))),
+    ("delete_transaction", lambda db: crud.delete_transaction(db, 2, 1)),
+    ("get_tags", lambda db: crud.get_tags(db, user_id=1)),
+    ("get_tags_page", lambda db: crud.get_tags_page(db, user_id=1, after=encode_cursor([0]))),
+    ("get_tag", lambda db: crud.get_tag(db, 1, 1)),
+    ("get_tag_stats", lambda db: crud.get_tag_stats(db, user_id=1, start_date=date(2024, 1, 1))),
+    ("get_tag_stats_page", lambda db: crud.get_tag_stats_page(db, user_id=1, after=encode_cursor([0]))),
+    ("get_transactions_by_tags_any", lambda db: crud.get_transactions(db, user_id=1, tags=["tag", "other"])),
+    ("get_transactions_page_by_tags_all", lambda db: crud.get_transactions_page(
+        db, user_id=1, after=encode_cursor([datetime(2024, 1, 1), 0]), tags=["tag", "other"], match="all"
+    )),
+    ("get_transaction_rows", lambda db: crud.get_transaction_rows(db, user_id=1)),
+    ("get_transaction_rows_page", lambda db: crud.get_transaction_rows_page(db, user_id=1, after=encode_cursor([datetime(2024, 1, 1), 0]))),
+    ("get_project_transaction_rows", lambda db: crud.get_project_transaction_rows(db, project_id=1, user_id=1)),
+    ("get_transaction_rows_expanded", lambda db: crud.get_transaction_rows(
+        db, user_id=1, fields=["amount"], expand=crud.TRANSACTION_EXPANSIONS
+    )),
+    ("get_project_transaction_rows_expanded", lambda db: crud.get_project_transaction_rows(
+        db, project_id=1, user_id=1, expand=crud.TRANSACTION_EXPANSIONS
+    )),
+    ("update_tag", lambda db: crud.update_tag(db, 1, 1, TagUpdate(name="tag"))),
+    ("get_budgets", lambda db: crud.get_budgets(db, user_id=1)),
+    ("get_budgets_page", lambda db: crud.get_budgets_page(db, user_id=1, after=encode_cursor([0]))),
+    ("get_budget", lambda db: crud.get_budget(db, 1, 1)),
+    ("update_budget", lambda db: crud.update_budget(db, 1, 1, BudgetUpdate(amount=200))),
+    ("get_dashboard_summary", lambda db: crud.get_dashboard_summary(db, user_id=1)),
+    ("get_monthly_report", lambda db: crud.get_monthly_report(db, user_id=1, start_month="2024-01", end_month="2024-12")),
+    ("get_monthly_report_grouped", lambda db: crud.get_monthly_report(db, user_id=1, group_by=["category", "account"], project_id=1)),
+    ("get_cashflow_day", lambda db: crud.get_cashflow(db, user_id=1, bucket="day", start_date=date(2024, 1, 1), end_date=date(2024, 12, 31))),
+    ("get_cashflow_week_category", lambda db: crud.get_cashflow(db, user_id=1, bucket="week", split="category")),
+    ("get_cashflow_month_account", lambda db: crud.get_cashflow(
+        db, user_id=1, bucket="month", start_date=date(2024, 1, 15), end_date=date(2024, 6, 10), split="account"
+    )),
+    ("get_pivot", lambda db: pivot.get_pivot(db, user_id=1, rows=["category"], columns=["month"])),
+    ("get_budget_progress", lambda db: crud.get_budget_progress(db, user_id=1, today=date(2024, 6, 15))),
+    ("recompute_monthly_rollups", lambda db: crud.recompute_monthly_rollups(db, user_id=1, fix=False)),
+    ("rebuild_monthly_rollups", lambda db: crud.rebuild_monthly_rollups(db, user_id=1)),
+    *_filter_checks(),
+    ("delete_budget", lambda db: crud.delete_budget(db, 1, 1)),
+    ("delete_tag", lambda db: crud.delete_tag(db, 1, 1)),
+    ("delete_project", lambda db: crud.delete_project(db, 1, 1)),
+    ("delete_category", lambda db: crud.delete_category(db, 1, 1)),
+]
+
+
+@pytest.fixture(scope="module")
+def plan_database():
+    """已写入示例数据的内存数据库，返回 (引擎, 会话工厂, 语句记录)"""
+    engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+    Base.metadata.create_all(bind=engine)
+    SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+
+    with SessionLocal() as db:
+        _seed(db)
+    # 分类树和交易列缓存以 user_id 为键，清空后才会检查加载它们的查询
+    invalidate_category_tree()
+    pivot.invalidate_transaction_columns()
+
+    statements = []
+
+    @event.listens_for(engine, "before_cursor_execute")
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith(("SELECT", "UPDATE", "DELETE")):
+            statements.append((statement, parameters[0] if executemany else parameters))
+
+    yield engine, SessionLocal, statements
+    invalidate_category_tree()
+    pivot.invalidate_transaction_columns()
+    engine.dispose()
+
+
+@pytest.mark.parametrize("call", [call for _, call in CHECKS], ids=[name for name, _ in CHECKS])
+def test_query_uses_index(plan_database, call):
+    engine, SessionLocal, statements = plan_database
+    tables = set(Base.metadata.tables)
+    statements.clear()
+    with SessionLocal() as db:
+        call(db)
+    captured = list(statements)
+
+    scans = []
+    raw = engine.raw_connection()
+    try:
+        cursor = raw.cursor()
+        for statement, parameters in captured:
+            cursor.execute(f"EXPLAIN QUERY PLAN {statement}", parameters)
+            for row in cursor.fetchall():
+                match = SCAN_PATTERN.match(row[3])
+                if match and match.group(1) in tables:
+                    scans.append(f"{row[3]}\n    {' '.join(statement.split())}")
+    finally:
+        raw.close()
+    assert scans == []
+
@@ -0,0 +1,94 @@
+"""交易全文搜索"""
+import pytest
+from sqlalchemy import text
+from database.database import engine
+
+
+@pytest.fixture
+def account_id(client, headers):
+    return client.post("/accounts", json={"name": "现金", "type": "cash", "initial_balance": 0}, headers=headers).json()["id"]
+
+
+def _create(client, headers, account_id, title, notes=None, day=1):
+    response = client.post("/transactions", json={
+        "account_id": account_id, "type": "expense", "amount": 1, "currency": "CNY",
+        "transaction_date": f"2024-01-{day:02d}T10:00:00", "title": title, "notes": notes
+    }, headers=headers)
+    assert response.status_code == 200, response.text
+    return response.json()["id"]
+
+
+def _bigram_hits(term):
+    """直接查询短词索引，不经过 LIKE 确认"""
+    with engine.connect() as connection:
+        return set(connection.execute(text(
+            "SELECT rowid FROM transactions_fts_bigram WHERE transactions_fts_bigram MATCH :term"
+        ), {"term": f'"{term}"'}).scalars())
+
+
+def _search(client, headers, q, **params):
+    response = client.get("/transactions/search", params={"q": q, **params}, headers=headers)
+    assert response.status_code == 200, response.text
+    return [transaction["title"] for transaction in response.json()]
+
+
+def test_relevance_and_date_order(client, headers, account_id):
+    _create(client, headers, account_id, "starbucks", "starbucks starbucks", day=1)
+    _create(client, headers, account_id, "午餐", "楼下 starbucks 旁边", day=2)
+    _create(client, headers, account_id, "房租", day=3)
+
+    assert _search(client, headers, "starbucks") == ["starbucks", "午餐"]
+    assert _search(client, headers, "starbucks", sort="date") == ["午餐", "starbucks"]
+    assert _search(client, headers, "STARBUCKS 旁边") == ["午餐"]
+
+
+def test_short_terms(client, headers, account_id):
+    _create(client, headers, account_id, "咖啡", "拿铁", day=1)
+    _create(client, headers, account_id, "电费", day=2)
+    _create(client, headers, account_id, "电影票", "tv 套餐", day=3)
+
+    assert _search(client, headers, "电") == ["电费", "电影票"]
+    assert _search(client, headers, "电费") == ["电费"]
+    assert _search(client, headers, "啡") == ["咖啡"]
+    assert _search(client, headers, "TV 套餐") == ["电影票"]
+    assert _search(client, headers, "咖啡 电费") == []
+    assert _search(client, headers, "咖啡", sort="date") == ["咖啡"]
+
+
+def test_short_terms_with_punctuation_fall_back_to_like(client, headers, account_id):
+    _create(client, headers, account_id, "a-b", day=1)
+    _create(client, headers, account_id, "ab", day=2)
+
+    assert _search(client, headers, "a-") == ["a-b"]
+    assert _search(client, headers, "%") == []
+
+
+def test_long_notes_are_searchable(client, headers, account_id):
+    _create(client, headers, account_id, "年度", "记录" * 3000 + "尾注")
+
+    assert _search(client, headers, "尾注") == ["年度"]
+    assert _search(client, headers, "记录尾注") == ["年度"]
+
+
+def test_index_follows_update_and_delete(client, headers, account_id):
+    transaction_id = _create(client, headers, account_id, "咖啡", "早餐 bagel")
+    deleted_id = _create(client, headers, account_id, "地铁", "通勤 metro")
+
+    client.put(f"/transactions/{transaction_id}", json={"title": "奶茶", "notes": "午后 waffle"}, headers=headers)
+    assert client.delete(f"/transactions/{deleted_id}", headers=headers).status_code == 200
+
+    for q in ("咖啡", "bagel", "早餐", "地铁", "metro", "通勤"):
+        assert _search(client, headers, q) == [], q
+    assert _search(client, headers, "奶茶") == ["奶茶"]
+    assert _search(client, headers, "waffle") == ["奶茶"]
+    assert _search(client, headers, "午后") == ["奶茶"]
+    assert {transaction_id, deleted_id}.isdisjoint(_bigram_hits("咖啡") | _bigram_hits("地铁"))
+    assert transaction_id in _bigram_hits("奶茶")
+
+
+def test_search_is_scoped_to_user(client, register, headers, account_id):
+    _create(client, headers, account_id, "咖啡 starbucks")
+    other = register()
+
+    assert _search(client, other, "咖啡") == []
+    assert _search(client, other, "starbucks") == []
@@ -0,0 +1,52 @@
+"""标签统计"""
+import pytest
+
+
+@pytest.fixture
+def account_id(client, headers):
+    return client.post("/accounts", json={"name": "现金", "type": "cash", "initial_balance": 0}, headers=headers).json()["id"]
+
+
+def _create(client, headers, account_id, tag_id, **fields):
+    body = {
+        "account_id": account_id, "type": "expense", "amount": 1, "currency": "CNY",
+        "transaction_date": "2024-02-01T10:00:00", "tag_ids": [tag_id], **fields
+    }
+    response = client.post("/transactions", json=body, headers=headers)
+    assert response.status_code == 200, response.text
+
+
+def _tag(client, headers, name):
+    return client.post("/tags", json={"name": name}, headers=headers).json()["id"]
+
+
+def test_stats_convert_foreign_currency(client, headers, account_id):
+    travel = _tag(client, headers, "旅行")
+    _create(client, headers, account_id, travel, amount=100)
+    _create(client, headers, account_id, travel, amount=10, currency="USD")
+    _create(client, headers, account_id, travel, type="income", amount=20, currency="USD")
+
+    expected = {
+        "id": travel, "name": "旅行", "transaction_count": 3,
+        "total_income": 142.0, "total_expense": 171.0, "net_amount": -29.0
+    }
+    assert client.get("/tags/stats", headers=headers).json() == [expected]
+    page = client.get("/tags/stats?after=", headers=headers).json()
+    assert page == {"items": [expected], "next_cursor": None}
+
+
+def test_stats_without_exchange_rate(client, headers, account_id):
+    _create(client, headers, account_id, _tag(client, headers, "瑞士"), amount=10, currency="CHF")
+
+    for url in ("/tags/stats", "/tags/stats?after="):
+        response = client.get(url, headers=headers)
+        assert response.status_code == 400
+        assert response.json() == {"detail": "No exchange rate for CHF"}
+
+
+def test_stats_invalid_cursor(client, headers, account_id):
+    _create(client, headers, account_id, _tag(client, headers, "日常"))
+
+    response = client.get("/tags/stats?after=not-a-cursor", headers=headers)
+    assert response.status_code == 400
+    assert response.json() == {"detail": "Invalid cursor"}
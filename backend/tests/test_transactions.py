@@ -0,0 +1,75 @@
+"""交易列表、统计与导出"""
+import csv
+import io
+import json
+import pytest
+
+
+@pytest.fixture
+def account_id(client, headers):
+    return client.post("/accounts", json={"name": "现金", "type": "cash", "initial_balance": 0}, headers=headers).json()["id"]
+
+
+def _create(client, headers, account_id, **fields):
+    body = {
+        "account_id": account_id, "type": "expense", "amount": 1, "currency": "CNY",
+        "transaction_date": "2024-01-01T10:00:00", **fields
+    }
+    response = client.post("/transactions", json=body, headers=headers)
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def test_currency_filter_is_case_insensitive(client, headers, account_id):
+    _create(client, headers, account_id, currency="USD", amount=2)
+    _create(client, headers, account_id, currency="CNY", amount=3)
+
+    for currency in ("usd", "USD", "Usd"):
+        rows = client.get(f"/transactions?currency={currency}", headers=headers).json()
+        assert [row["currency"] for row in rows] == ["USD"]
+    assert client.get("/transactions/stats?currency=cny", headers=headers).json()["transaction_count"] == 1
+    assert client.get("/transactions?currency=US1", headers=headers).status_code == 422
+
+
+def _export(client, headers, **params):
+    response = client.get("/transactions/export", params=params, headers=headers)
+    assert response.status_code == 200, response.text
+    if params.get("format") == "ndjson":
+        return [json.loads(line) for line in response.text.splitlines()]
+    return list(csv.DictReader(io.StringIO(response.text)))
+
+
+def test_export_accepts_tag_filters(client, headers, account_id):
+    tag_ids = {
+        name: client.post("/tags", json={"name": name}, headers=headers).json()["id"]
+        for name in ("餐饮", "报销", "旅行")
+    }
+    _create(client, headers, account_id, title="午餐, \"公司\"", notes="第一行\n第二行", tag_ids=[tag_ids["餐饮"], tag_ids["报销"]])
+    _create(client, headers, account_id, title="机票", tag_ids=[tag_ids["旅行"], tag_ids["报销"]])
+    _create(client, headers, account_id, title="房租", amount=3)
+
+    rows = _export(client, headers, tags="餐饮,报销", match="all")
+    assert len(rows) == 1
+    row = rows[0]
+    assert row["title"] == '午餐, "公司"'
+    assert row["notes"] == "第一行\n第二行"
+    assert sorted(row["tags"].split("|")) == ["报销", "餐饮"]
+    assert row["amount"] == "1.0"
+
+    assert [row["title"] for row in _export(client, headers, tags="报销")] == ['午餐, "公司"', "机票"]
+    assert [row["title"] for row in _export(client, headers, tags="旅行", format="ndjson")] == ["机票"]
+    untagged = _export(client, headers, min_amount=2)
+    assert [(row["title"], row["tags"]) for row in untagged] == [("房租", "")]
+
+
+def test_export_round_trips_through_import(client, headers, account_id):
+    tag_id = client.post("/tags", json={"name": "出差"}, headers=headers).json()["id"]
+    _create(client, headers, account_id, title='引号"和,逗号', tag_ids=[tag_id])
+    exported = client.get("/transactions/export", headers=headers).content
+
+    response = client.post(
+        "/transactions/import", headers=headers, files={"file": ("transactions.csv", exported, "text/csv")}
+    )
+    assert response.json()["imported"] == 1
+    rows = _export(client, headers, tags="出差")
+    assert [(row["title"], row["tags"]) for row in rows] == [('引号"和,逗号', "出差")] * 2